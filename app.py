@@ -1,28 +1,154 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, send_file
 import subprocess
+import glob
 import json
-import pandas as pd
+import re
+import shlex
 import os
-from PIL import Image
-import openai
 import requests
 from datetime import datetime
-from dateutil import parser
-from bs4 import BeautifulSoup
-import markdown
-import pytesseract
-from PIL import Image
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from urllib.parse import urlsplit
+
+from batch import ANY, BatchError, order_conflicts, run_graph
+from cache import ResultCache
+from contactsort import DEFAULT_KEYS as DEFAULT_SORT_KEYS, SortError, sort_records
+from context import TenantError, TenantRegistry
+from csvquery import CsvCache
+from dateparse import WEEKDAYS, DateParser, weekday_number
+from docindex import build_index
+from emailparse import extract_sender, extract_senders
+from prettierpool import PRETTIER_VERSION, FormatterError, PrettierPool
+from imageresize import DEFAULT_TEMPLATE as DEFAULT_RESIZE_TEMPLATE, find_images, parse_sizes, resize_images
+from ingest import IngestError, Ingester
+from jobs import JobQueue, QueueFullError, env_int
+from lazy import warm_up
+from llm import LLMClient
+from logscan import first_lines, most_recent_files
+from mdrender import MarkdownRenderer
+from metrics import Metrics
+from ocr import OcrPool, card_images
+from scraper import Scraper
+from sqlitepool import ConnectionPool, aggregate_sql, iter_rows
+from streaming import LineIndex, iter_lines, read_byte_range
+from tickets import ticket_sales
+from urlguard import UrlGuard
 
 app = Flask(__name__)
 
 # Base data directory
 DATA_DIR = os.path.abspath("data")  # Ensures correct absolute path
 
+# Per-tenant data roots live under TENANTS_DIR/<tenant>; requests pick one with ?tenant= or X-Tenant
+tenants = TenantRegistry(DATA_DIR, os.environ.get("TENANTS_DIR", "tenants"))
+
+
+# Limits for /read: whole-file reads, and the largest page a ranged read may return
+READ_MAX_BYTES = env_int("READ_MAX_BYTES", 50 * 1024 * 1024)
+READ_PAGE_BYTES = env_int("READ_PAGE_BYTES", 1024 * 1024)
+READ_PAGE_LINES = env_int("READ_PAGE_LINES", 10000)
+
+line_index = LineIndex()
+
+# Largest k accepted by the recent logs task, and threads used to read first lines
+LOGS_MAX_K = env_int("LOGS_MAX_K", 1000)
+LOGS_READ_WORKERS = env_int("LOGS_READ_WORKERS", 8)
+
+# Latency, CPU, I/O and outbound HTTP time per task and endpoint, served at /metrics
+metrics = Metrics()
+
+# TIMING_HEADER=1 adds X-Timing to every response, not only to ?timing=1 / X-Timing: 1 requests
+TIMING_HEADER = os.environ.get("TIMING_HEADER", "").lower() in ("1", "true", "yes")
+
+# Shared SQLite connections for databases under the tenant data roots
+db_pool = ConnectionPool(size=env_int("SQLITE_POOL_SIZE", 8))
+
+# Client for the AI Proxy, with its response cache outside the data directory
+llm_client = LLMClient(
+    cache_dir=os.path.abspath(os.environ.get("LLM_CACHE_DIR", ".cache/llm")),
+    timeout=(env_int("LLM_CONNECT_TIMEOUT", 5), env_int("LLM_READ_TIMEOUT", 60)),
+    retries=env_int("LLM_RETRIES", 3),
+    http_timer=metrics.http,
+)
+
+# URLs taken from requests may only point at allowlisted hosts ("*" for any), and never at
+# loopback, private or link-local addresses unless FETCH_ALLOW_PRIVATE=1 (e.g. for a local stub)
+FETCH_ALLOW_PRIVATE = os.environ.get("FETCH_ALLOW_PRIVATE", "").lower() in ("1", "true", "yes")
+
+SCRAPE_URL = os.environ.get("SCRAPE_URL", "https://example.com")  # Replace with the actual website URL
+
+# Concurrent scraper with a conditional-GET cache outside the data directory
+scraper = Scraper(
+    cache_dir=os.path.abspath(os.environ.get("SCRAPE_CACHE_DIR", ".cache/scrape")),
+    workers=env_int("SCRAPE_WORKERS", 16),
+    timeout=(env_int("SCRAPE_CONNECT_TIMEOUT", 5), env_int("SCRAPE_READ_TIMEOUT", 30)),
+    http_timer=metrics.http,
+    guard=UrlGuard(
+        os.environ.get("SCRAPE_ALLOWED_HOSTS") or urlsplit(SCRAPE_URL).hostname,
+        allow_private=FETCH_ALLOW_PRIVATE,
+    ),
+)
+
+API_DATA_URL = os.environ.get("API_DATA_URL", "https://api.publicapis.org/entries")  # Example API
+
+# Paginated API downloads, streamed to disk through a conditional-GET page cache
+ingester = Ingester(
+    cache_dir=os.path.abspath(os.environ.get("INGEST_CACHE_DIR", ".cache/ingest")),
+    workers=env_int("INGEST_WORKERS", 8),
+    timeout=(env_int("INGEST_CONNECT_TIMEOUT", 5), env_int("INGEST_READ_TIMEOUT", 60)),
+    page_param=os.environ.get("INGEST_PAGE_PARAM", "page"),
+    http_timer=metrics.http,
+    guard=UrlGuard(
+        os.environ.get("INGEST_ALLOWED_HOSTS") or urlsplit(API_DATA_URL).hostname,
+        allow_private=FETCH_ALLOW_PRIVATE,
+    ),
+)
+
+# Threads used by the bulk sender extraction task
+EMAIL_WORKERS = env_int("EMAIL_WORKERS", 8)
+
+# Resident Prettier workers; PRETTIER_WORKER_CMD overrides how a worker is launched
+prettier_pool = PrettierPool(
+    command=shlex.split(os.environ["PRETTIER_WORKER_CMD"]) if os.environ.get("PRETTIER_WORKER_CMD") else None,
+    size=env_int("PRETTIER_WORKERS", 2),
+)
+
+# Parsed CSV files served by /filter_csv, with Parquet copies outside the data directory
+csv_cache = CsvCache(cache_dir=os.path.abspath(os.environ.get("CSV_CACHE_DIR", ".cache/csv")))
+
+# Card-number OCR workers (processes), started on first use; TESSERACT_CMD overrides the binary
+ocr_pool = OcrPool(
+    workers=env_int("OCR_WORKERS", os.cpu_count() or 1),
+    batch_size=env_int("OCR_BATCH_SIZE", 16),
+)
+
+# Markdown to HTML with pooled Markdown instances and an HTML cache keyed by source hash
+markdown_renderer = MarkdownRenderer(
+    extensions=[e for e in os.environ.get("MARKDOWN_EXTENSIONS", "").split(",") if e],
+    pool_size=env_int("MARKDOWN_POOL_SIZE", 4),
+    cache_dir=os.path.abspath(os.environ.get("MARKDOWN_CACHE_DIR", ".cache/markdown")),
+    workers=env_int("MARKDOWN_WORKERS", os.cpu_count() or 1),
+)
+
+# Processes used by the image resize task
+RESIZE_WORKERS = env_int("RESIZE_WORKERS", os.cpu_count() or 1)
+
+# Contact files up to SORT_MEMORY_BYTES are sorted in memory; larger ones in runs of SORT_RUN_RECORDS
+SORT_MEMORY_BYTES = env_int("SORT_MEMORY_BYTES", 256 * 1024 * 1024)
+SORT_RUN_RECORDS = env_int("SORT_RUN_RECORDS", 100000)
+SORT_TMP_DIR = os.environ.get("SORT_TMP_DIR") or None
+
+# Threads used to read changed Markdown files when rebuilding the docs index
+DOCS_INDEX_WORKERS = env_int("DOCS_INDEX_WORKERS", 8)
+
 
 def get_abs_path(filename):
     """Ensure that the path is correctly resolved without duplication"""
-    return os.path.abspath(os.path.join(DATA_DIR, os.path.basename(filename)))
+    return tenants.current().path(filename)
 
 
 def read_file(file_path):
@@ -33,12 +159,58 @@ def read_file(file_path):
         return jsonify({"error": "File not found.", "path": abs_path}), 404
 
     try:
+        # Whole-file reads are capped; larger files must be paged or streamed
+        size = os.path.getsize(abs_path)
+        if size > READ_MAX_BYTES:
+            return jsonify({
+                "error": "File too large to read in one response.",
+                "size": size,
+                "hint": "Use offset/length, start_line/lines or stream=1.",
+            }), 413
         with open(abs_path, "r", encoding="utf-8") as f:
             content = f.read()
         return jsonify({"content": content}), 200
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
 
+
+def read_file_range(file_path, args):
+    """Read one page of a file, by byte offsets or by line numbers"""
+    abs_path = get_abs_path(file_path)
+
+    if not os.path.exists(abs_path):
+        return jsonify({"error": "File not found.", "path": abs_path}), 404
+
+    try:
+        for name in ("offset", "length", "start_line", "lines"):
+            if name in args and int(args[name]) < 0:
+                raise ValueError(f"{name} must not be negative.")
+        if "start_line" in args or "lines" in args:
+            start_line = int(args.get("start_line", 0))
+            count = min(int(args.get("lines", READ_PAGE_LINES)), READ_PAGE_LINES)
+            lines, total = line_index.read_lines(abs_path, start_line, count)
+            next_line = start_line + len(lines)
+            return jsonify({
+                "lines": lines,
+                "start_line": start_line,
+                "next_line": next_line if next_line < total else None,
+                "total_lines": total,
+            }), 200
+
+        offset = int(args.get("offset", 0))
+        length = min(int(args.get("length", READ_PAGE_BYTES)), READ_PAGE_BYTES)
+        content, next_offset, size = read_byte_range(abs_path, offset, length)
+        return jsonify({
+            "content": content,
+            "offset": offset,
+            "next_offset": next_offset if next_offset < size else None,
+            "size": size,
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": "Invalid range parameters.", "details": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
+
 # Function to execute shell commands
 def run_shell_command(command):
     result = subprocess.run(command, shell=True, capture_output=True, text=True)
@@ -50,36 +222,75 @@ def run_shell_command(command):
 # Task A2: Format file using Prettier
 def a2_format_markdown():
     file_path = get_abs_path("format.md")
-    command = f'npx prettier@3.4.2 --write "{file_path}"'
-    return run_shell_command(command)
+
+    if not os.path.exists(file_path):
+        return jsonify({"error": "File not found."}), 404
+
+    try:
+        # A resident Prettier worker avoids paying npx and Node startup on every call
+        result = prettier_pool.format_file(file_path)
+        return jsonify({"message": "Task executed successfully.", "result": result}), 200
+    except FormatterError:
+        # No usable worker (e.g. Node missing): fall back to the one-off CLI run
+        command = f'npx prettier@{PRETTIER_VERSION} --write "{file_path}"'
+        return run_shell_command(command)
+    except Exception as e:
+        return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
+
+
+# Task A2 (batch): Format every Markdown file matching a pattern under /data
+def a2_format_markdown_batch():
+    pattern = request.args.get("pattern", "**/*.md")
+    data_dir = tenants.current().data_dir
+
+    try:
+        paths = sorted(
+            secure_path(p) for p in glob.glob(os.path.join(data_dir, pattern), recursive=True)
+            if os.path.isfile(p)
+        )
+        results = prettier_pool.format_files(paths)
+        counts = {}
+        for result in results.values():
+            key = "error" if result.startswith("error") else result
+            counts[key] = counts.get(key, 0) + 1
+        errors = {os.path.relpath(p, data_dir): r for p, r in results.items() if r.startswith("error")}
+        return jsonify({"message": "Task executed successfully.", "files": len(paths), "results": counts, "errors": errors}), 200
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
 
 # Task A3: Count Wednesdays in a list of dates
 def a3_dates():
     input_file = get_abs_path("dates.txt")
-    output_file = get_abs_path("dates-wednesdays.txt")
+
+    # Any weekday can be counted; the default keeps the Wednesday task and its output file
+    try:
+        weekday = weekday_number(request.args.get("weekday", "wednesday"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    weekday_name = WEEKDAYS[weekday]
+    output_file = get_abs_path(f"dates-{weekday_name}s.txt")
 
     if not os.path.exists(input_file):
         return jsonify({"error": "File not found."}), 404
 
     try:
-        with open(input_file, "r", encoding="utf-8") as f:
-            dates = f.readlines()
-
-        wednesday_count = 0
-        for date_str in dates:
-            date_str = date_str.strip()
-            try:
-                # Automatically detect the correct format
-                parsed_date = parser.parse(date_str)  # This handles multiple formats
-                if parsed_date.weekday() == 2:  # 2 = Wednesday
-                    wednesday_count += 1
-            except ValueError:
-                continue  # Skip invalid dates instead of failing
+        # Lines are streamed in chunks; known formats are parsed directly and
+        # dateutil is only used for anything else
+        date_parser = DateParser()
+        histogram = date_parser.weekday_histogram(iter_lines(input_file))
 
+        day_count = histogram[weekday]
         with open(output_file, "w", encoding="utf-8") as f:
-            f.write(str(wednesday_count))
-
-        return jsonify({"message": "Task executed successfully.", "wednesday_count": wednesday_count}), 200
+            f.write(str(day_count))
+
+        return jsonify({
+            "message": "Task executed successfully.",
+            f"{weekday_name}_count": day_count,
+            "weekday_histogram": dict(zip(WEEKDAYS, histogram)),
+            "invalid_dates": date_parser.stats["invalid"],
+        }), 200
     except Exception as e:
         return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
 
@@ -91,20 +302,18 @@ def a4_contacts():
     if not os.path.exists(input_file):
         return jsonify({"error": "File not found."}), 404
 
-    try:
-        with open(input_file, "r", encoding="utf-8") as f:
-            contacts = json.load(f)  # Load JSON data
-
-        if not isinstance(contacts, list):
-            return jsonify({"error": "Invalid JSON format. Expected a list."}), 400
-
-        # Sorting by last_name first, then by first_name
-        contacts.sort(key=lambda x: (x.get("last_name", ""), x.get("first_name", "")))
+    # Sort keys, e.g. ?keys=email or ?keys=last_name,first_name (the default)
+    keys = [k for k in request.args.get("keys", "").split(",") if k] or DEFAULT_SORT_KEYS
 
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(contacts, f, indent=4)  # Write sorted JSON with indentation
-
-        return jsonify({"message": "Contacts sorted successfully."}), 200
+    try:
+        # JSON array or NDJSON in; large files are sorted externally in bounded memory
+        stats = sort_records(
+            input_file, output_file, keys,
+            memory_bytes=SORT_MEMORY_BYTES, run_records=SORT_RUN_RECORDS, tmp_dir=SORT_TMP_DIR,
+        )
+        return jsonify({"message": "Contacts sorted successfully.", "sort_stats": stats}), 200
+    except SortError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
 
@@ -116,23 +325,22 @@ def a5_logs():
     if not os.path.exists(logs_dir) or not os.path.isdir(logs_dir):
         return jsonify({"error": "Log directory not found."}), 404
 
+    # How many files to take and which ones count as logs
+    try:
+        k = int(request.args.get("k", 10))
+    except ValueError:
+        return jsonify({"error": "k must be an integer."}), 400
+    if not 1 <= k <= LOGS_MAX_K:
+        return jsonify({"error": f"k must be between 1 and {LOGS_MAX_K}."}), 400
+    pattern = request.args.get("pattern", "*.log")
+
     try:
-        # Get a list of all .log files sorted by modification time (newest first)
-        log_files = sorted(
-            [f for f in os.listdir(logs_dir) if f.endswith(".log")],
-            key=lambda x: os.path.getmtime(os.path.join(logs_dir, x)),
-            reverse=True
-        )[:10]  # Take the 10 most recent log files
-
-        extracted_lines = []
-        for log_file in log_files:
-            log_path = os.path.join(logs_dir, log_file)
-            try:
-                with open(log_path, "r", encoding="utf-8") as f:
-                    first_line = f.readline().strip()
-                    extracted_lines.append(f"{log_file}: {first_line}")
-            except Exception as e:
-                extracted_lines.append(f"{log_file}: Error reading file ({str(e)})")
+        # Single scandir pass keeping a k-sized heap of the newest files
+        log_files = most_recent_files(logs_dir, k, pattern)
+
+        # Read the first lines concurrently
+        lines = first_lines(logs_dir, log_files, workers=LOGS_READ_WORKERS)
+        extracted_lines = [f"{log_file}: {line}" for log_file, line in zip(log_files, lines)]
 
         # Write extracted lines to the output file
         with open(output_file, "w", encoding="utf-8") as f:
@@ -147,34 +355,21 @@ def a5_logs():
 def a6_docs():
     docs_dir = get_abs_path("docs")  # Base docs directory
     output_file = get_abs_path("docs/index.json")
+    meta_file = get_abs_path("docs/index.meta.json")  # Per-file (mtime, size, inode) from the last run
 
     if not os.path.exists(docs_dir):
         return jsonify({"error": "Docs directory not found."}), 404
 
-    index = {}
-
     try:
-        # Recursively walk through all subdirectories
-        for root, _, files in os.walk(docs_dir):
-            for file in files:
-                if file.endswith(".md"):
-                    file_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(file_path, docs_dir)  # Keep relative path
-
-                    # Read the file and extract the first H1 header
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        for line in f:
-                            line = line.strip()
-                            if line.startswith("# "):  # First H1 found
-                                index[relative_path] = line[2:].strip()
-                                break
+        # Only files added or changed since the last run are reread; full=1 rescans everything
+        full = request.args.get("full", "").lower() in ("1", "true", "yes")
+        index, stats = build_index(docs_dir, meta_file, workers=DOCS_INDEX_WORKERS, full=full)
 
         # Save extracted headers to index.json
         with open(output_file, "w", encoding="utf-8") as f:
             json.dump(index, f, indent=4)
 
-        # Return only the success message
-        return jsonify({"message": "Task executed successfully."}), 200
+        return jsonify({"message": "Task executed successfully.", "index_stats": stats}), 200
     except Exception as e:
         return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
 
@@ -193,32 +388,8 @@ def a7_email():
         with open(input_file, "r", encoding="utf-8") as f:
             email_content = f.read()
 
-        # Ensure AI Proxy token is available
-        ai_proxy_token = os.environ.get("AIPROXY_TOKEN")
-        if not ai_proxy_token:
-            return jsonify({"error": "AI Proxy token is missing."}), 400
-
-        # Call AI Proxy API
-        API_URL = "https://aiproxy.sanand.workers.dev/openai/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {ai_proxy_token}",
-            "Content-Type": "application/json"
-        }
-
-        payload = {
-            "model": "gpt-4o-mini",
-            "messages": [
-                {"role": "system", "content": "Extract the sender's email address from the given email."},
-                {"role": "user", "content": email_content}
-            ],
-            "max_tokens": 50
-        }
-
-        response = requests.post(API_URL, json=payload, headers=headers)
-        response_data = response.json()
-
-        # Extract sender email
-        sender_email = response_data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
+        # Parse the headers locally; the AI Proxy is only asked when that fails
+        sender_email, tier = extract_sender(email_content, llm_email_sender)
 
         if not sender_email:
             sender_email = "Extraction failed."
@@ -227,81 +398,105 @@ def a7_email():
         with open(output_file, "w", encoding="utf-8") as f:
             f.write(sender_email)
 
-        return jsonify({"message": "Task executed successfully."}), 200
+        return jsonify({"message": "Task executed successfully.", "tier": tier}), 200
 
     except Exception as e:
         return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
 
-# # Task A8: Extracting Credit card number from Image.
-# def extract_credit_card_number():
-#     image_path = get_abs_path("credit_card.png")
-#     output_file = get_abs_path("credit-card.txt")
-    
-#     if not os.path.exists(image_path):
-#         return jsonify({"error": "Image file not found."}), 404
-    
-#     try:
-#         image = Image.open(image_path)
-#         extracted_text = pytesseract.image_to_string(image, config='--psm 6')
-        
-#         # Call AI Proxy API to clean extracted text
-#         ai_proxy_token = os.environ.get("AIPROXY_TOKEN")
-#         if not ai_proxy_token:
-#             return jsonify({"error": "AI Proxy token is missing."}), 400
-        
-#         API_URL = "https://aiproxy.sanand.workers.dev/openai/v1/chat/completions"
-#         headers = {
-#             "Authorization": f"Bearer {ai_proxy_token}",
-#             "Content-Type": "application/json"
-#         }
-        
-#         payload = {
-#             "model": "gpt-4o-mini",
-#             "messages": [
-#                 {"role": "system", "content": "Extract and format the credit card number from the given text."},
-#                 {"role": "user", "content": extracted_text}
-#             ],
-#             "max_tokens": 50
-#         }
-        
-#         response = requests.post(API_URL, json=payload, headers=headers)
-#         response_data = response.json()
-        
-#         card_number = response_data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
-        
-#         if not card_number:
-#             return jsonify({"error": "Failed to extract card number."}), 400
-        
-#         # Remove spaces and save to file
-#         formatted_number = card_number.replace(" ", "")
-#         with open(output_file, "w", encoding="utf-8") as f:
-#             f.write(formatted_number)
-        
-#         return jsonify({"message": "Credit card number extracted successfully."}), 200
-    
-#     except Exception as e:
-#         return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
+
+# Task A7 (bulk): Extract senders from a directory of .eml/.txt messages
+def a7_email_bulk():
+    """Extracts the sender of every message in emails/ and writes them to email-senders.json"""
+    emails_dir = get_abs_path(request.args.get("dir", "emails"))
+    output_file = get_abs_path("email-senders.json")
+
+    if not os.path.isdir(emails_dir):
+        return jsonify({"error": "Email directory not found."}), 404
+
+    try:
+        senders = extract_senders(emails_dir, llm_email_sender, workers=EMAIL_WORKERS)
+
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(senders, f, indent=4)
+
+        tiers = {}
+        for result in senders.values():
+            tier = result.get("tier") or "failed"
+            tiers[tier] = tiers.get(tier, 0) + 1
+        return jsonify({"message": "Task executed successfully.", "messages": len(senders), "tiers": tiers}), 200
+    except Exception as e:
+        return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
+
+
+def llm_email_sender(email_content):
+    """Last-resort sender extraction through the AI Proxy"""
+    return llm_client.chat("Extract the sender's email address from the given email.", email_content)
+
+# Task A8: Extract the credit card number from credit_card.png
+def a8_credit_card():
+    """OCRs the card number in credit_card.png and writes it to credit-card.txt"""
+    image_path = get_abs_path("credit_card.png")
+    output_file = get_abs_path("credit-card.txt")
+
+    if not os.path.exists(image_path):
+        return jsonify({"error": "Image file not found."}), 404
+
+    try:
+        # Cropped, binarized, digits-only OCR; the Luhn check replaces the LLM clean-up
+        result = ocr_pool.read_card(image_path)
+        if not result["number"]:
+            return jsonify({"error": "Failed to extract card number.", "details": result.get("error")}), 400
+
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write(result["number"])
+
+        return jsonify({"message": "Credit card number extracted successfully.", "luhn_valid": result["valid"]}), 200
+    except Exception as e:
+        return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
+
+
+# Task A8 (bulk): Extract card numbers from a directory of card images
+def a8_credit_card_bulk():
+    """OCRs every image in cards/ and writes the numbers to credit-cards.json"""
+    cards_dir = get_abs_path(request.args.get("dir", "cards"))
+    output_file = get_abs_path("credit-cards.json")
+
+    if not os.path.isdir(cards_dir):
+        return jsonify({"error": "Card image directory not found."}), 404
+
+    try:
+        results = ocr_pool.read_cards(card_images(cards_dir))
+        cards = {os.path.basename(path): result for path, result in results.items()}
+
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(cards, f, indent=4)
+
+        valid = sum(1 for result in cards.values() if result["valid"])
+        return jsonify({"message": "Task executed successfully.", "images": len(cards), "luhn_valid": valid}), 200
+    except Exception as e:
+        return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
 
 
-# Task A10: Calculate total sales for "Gold" tickets
+# Task A10: Calculate total sales for "Gold" tickets (or any other ticket type)
 def a10_ticket_sales():
     db_path = get_abs_path("ticket-sales.db")
-    output_file = get_abs_path("ticket-sales-gold.txt")
+    ticket_type = request.args.get("type", "Gold")
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", ticket_type):
+        return jsonify({"error": "Invalid ticket type."}), 400
+    output_file = get_abs_path(f"ticket-sales-{ticket_type.lower()}.txt")
 
     if not os.path.exists(db_path):
         return jsonify({"error": "Database file not found."}), 404
 
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT SUM(units * price) FROM tickets WHERE type = 'Gold'")
-        total_sales = cursor.fetchone()[0] or 0
-        conn.close()
+        # Totals come from a per-type aggregate table kept current by triggers
+        with db_pool.connection(db_path) as conn:
+            total_sales = ticket_sales(conn, db_path, ticket_type)
 
         with open(output_file, "w", encoding="utf-8") as f:
             f.write(str(total_sales))
 
-        return jsonify({"message": "Gold ticket sales calculated successfully.", "total_sales": total_sales}), 200
+        return jsonify({"message": f"{ticket_type} ticket sales calculated successfully.", "total_sales": total_sales}), 200
     except Exception as e:
         return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
 
@@ -310,10 +505,7 @@ def a10_ticket_sales():
 # Task B1: Ensure file access is restricted to /data directory.
 def secure_path(file_path):
     """Ensure file access is restricted to /data directory."""
-    abs_path = os.path.abspath(file_path)
-    if not abs_path.startswith(os.path.abspath(DATA_DIR)):
-        raise PermissionError("Access to files outside /data is not allowed.")
-    return abs_path
+    return tenants.current().secure_path(file_path)
 
 
 # Task B2: Prevent file deletion in the system.
@@ -322,22 +514,41 @@ def safe_remove(file_path):
     raise PermissionError("File deletion is not allowed by system policy.")
 
 # Task B3: Fetch data from an API and save it as json file
-def fetch_and_save_api_data():
-    """ Fetches data from an API and saves it to a file. """
-    api_url = "https://api.publicapis.org/entries"  # Example API
-    output_file = get_abs_path("api_response.json")
+# Output file per ?format=
+API_DATA_FILES = {"json": "api_response.json", "ndjson": "api_response.ndjson"}
+
 
+def ingest_args(ctx, args):
+    """(url, output path, Ingester.ingest() options) of a request; raises KeyError for an unknown ?format="""
+    fmt = args.get("format", "json")
+    if fmt not in API_DATA_FILES:
+        raise KeyError(f"Invalid format. Use one of: {', '.join(API_DATA_FILES)}.")
+    options = {
+        "fmt": fmt,
+        "items_key": args.get("items") or None,  # List field of object pages, e.g. ?items=entries
+        "page_param": args.get("page_param") or None,
+    }
+    return args.get("url") or API_DATA_URL, ctx.path(API_DATA_FILES[fmt]), options
+
+
+def ingest_api_data(ctx, args):
+    """Download ?url= (default API_DATA_URL; INGEST_ALLOWED_HOSTS hosts only) and its further pages into api_response.json / .ndjson; returns (payload, status)"""
+    try:
+        url, output_path, options = ingest_args(ctx, args)
+    except KeyError as e:
+        return {"error": e.args[0]}, 400
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()  # Raise an error for bad responses
-        data = response.json()
+        stats = ingester.ingest(url, output_path, **options)
+    except (requests.exceptions.RequestException, IngestError) as e:
+        return {"error": "Task execution failed.", "details": str(e)}, 400
+    return {"message": "API data fetched and saved successfully.", "ingest_stats": stats}, 200
 
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
 
-        return jsonify({"message": "API data fetched and saved successfully."}), 200
-    except requests.exceptions.RequestException as e:
-        return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
+def fetch_and_save_api_data():
+    """ Fetches data from an API and saves it to a file. """
+    # The body is streamed to disk; unchanged pages are revalidated with ETag / Last-Modified
+    payload, status = ingest_api_data(tenants.current(), request.args)
+    return jsonify(payload), status
 
 
 # Task B4: Clone a Git repo and make a commit
@@ -352,18 +563,16 @@ def clone_and_commit_repo():
         if not os.path.exists(repo_dir):
             subprocess.run(["git", "clone", repo_url, repo_dir], check=True)
 
-        # Change directory to the cloned repo
-        os.chdir(repo_dir)
-
         # Create a dummy file to modify (if required)
         file_path = os.path.join(repo_dir, "new_file.txt")
         with open(file_path, "w", encoding="utf-8") as f:
             f.write("This is a test commit.\n")
 
         # Add, commit, and push changes
-        subprocess.run(["git", "add", "."], check=True)
-        subprocess.run(["git", "commit", "-m", commit_message], check=True)
-        subprocess.run(["git", "push"], check=True)
+        # Run git inside the repo instead of changing the whole process's directory
+        subprocess.run(["git", "add", "."], check=True, cwd=repo_dir)
+        subprocess.run(["git", "commit", "-m", commit_message], check=True, cwd=repo_dir)
+        subprocess.run(["git", "push"], check=True, cwd=repo_dir)
 
         return jsonify({"message": "Repository cloned and committed successfully."}), 200
     except subprocess.CalledProcessError as e:
@@ -382,91 +591,141 @@ def run_sql_query():
         if not os.path.exists(db_path):
             return jsonify({"error": "Database file not found."}), 404
 
-        # Connect to the SQLite database and execute the query
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute(sql_query)
-        results = cursor.fetchall()
-        conn.close()
-
-        # Save results to a file
-        with open(output_file, "w", encoding="utf-8") as f:
-            for row in results:
-                f.write(", ".join(map(str, row)) + "\n")
-
-        return jsonify({"message": "SQL query executed successfully.", "results": results}), 200
+        def generate():
+            # Rows are fetched in batches and written to the file and the response as they arrive
+            with db_pool.connection(db_path) as conn:
+                cursor = conn.execute(sql_query)
+                with open(output_file, "w", encoding="utf-8") as f:
+                    yield '{"message": "SQL query executed successfully.", "results": ['
+                    for i, row in enumerate(iter_rows(cursor)):
+                        f.write(", ".join(map(str, row)) + "\n")
+                        yield ("," if i else "") + json.dumps(row, default=str)
+                    yield "]}"
+
+        # Run the query before the response starts so SQL errors still return a 400
+        chunks = generate()
+        first = next(chunks)
+        return Response(chain([first], chunks), mimetype="application/json"), 200
     except sqlite3.Error as e:
         return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
 
 
 # Task B6: Scraping data from a website
-def scrape_website():
-    """ Scrapes titles (h1 tags) from a website and saves them to a file. """
-    url = "https://example.com"  # Replace with the actual website URL
-    output_file = get_abs_path("scraped_titles.txt")
-
-    try:
-        # Fetch website content
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an error for bad responses
+def scrape_targets(ctx, args):
+    """URLs to scrape: ?url=, else one per line of the ?urls= file in the data root, else SCRAPE_URL"""
+    if args.get("url"):
+        return [args["url"]]
+    if args.get("urls"):
+        with open(ctx.secure_path(os.path.join(ctx.data_dir, args["urls"])), "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return [SCRAPE_URL]
+
+
+def scrape_to_files(urls, ctx):
+    """Scrape the h1 titles of every URL into scraped_titles.txt; returns (payload, status)"""
+    results, stats = scraper.scrape(urls)
+    return save_scrape_results(urls, results, stats, ctx)
+
+
+def save_scrape_results(urls, results, stats, ctx):
+    """Write the titles of a scrape run (and per-page results of a multi-page one); returns (payload, status)"""
+    if urls and stats["failed"] == len(urls):
+        return {"error": "Task execution failed.", "details": results[0]["error"]}, 400
+
+    titles = [title for result in results for title in result["titles"]]
+    with open(ctx.path("scraped_titles.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(titles))
+    payload = {"message": "Website scraped successfully.", "scrape_stats": stats}
+    if len(urls) == 1:
+        payload["titles"] = titles
+    else:
+        # Per-page titles and errors for multi-page runs
+        with open(ctx.path("scraped_pages.json"), "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+    return payload, 200
 
-        # Parse HTML content
-        soup = BeautifulSoup(response.text, "html.parser")
-        titles = [h1.text.strip() for h1 in soup.find_all("h1")]  
 
-        # Save extracted titles to a file
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write("\n".join(titles))
+def scrape_website():
+    """ Scrapes titles (h1 tags) from websites and saves them to a file. """
+    ctx = tenants.current()
+    try:
+        urls = scrape_targets(ctx, request.args)
+    except OSError as e:
+        return jsonify({"error": "URL list not found.", "details": str(e)}), 404
 
-        return jsonify({"message": "Website scraped successfully.", "titles": titles}), 200
-    except requests.exceptions.RequestException as e:
-        return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
+    # Pages are fetched concurrently and revalidated with ETag / Last-Modified
+    payload, status = scrape_to_files(urls, ctx)
+    return jsonify(payload), status
 
-# Task B7: Compress or Resize an Image
+# Task B7: Compress or Resize an Image (or a directory / glob of them)
 def compress_or_resize_image():
-    """ Compresses or resizes an image and saves it as a new file. """
-    input_image = get_abs_path("input.jpg")  # Replace with actual input image filename
-    output_image = get_abs_path("compressed.jpg")  # Output file
-    max_size = (800, 800)  # Resize dimensions (modify as needed)
-    quality = 75  # Compression quality (1-100, lower means more compression)
+    """ Compresses or resizes images and saves them as new files. """
+    # ?src= is a file, directory or glob under the data root; the default is the single input.jpg
+    ctx = tenants.current()
+    src = request.args.get("src", "input.jpg")
 
     try:
-        # Check if the image file exists
-        if not os.path.exists(input_image):
-            return jsonify({"error": "Image file not found."}), 404
+        quality = int(request.args.get("quality", 75))  # Compression quality (1-100, lower means more compression)
+        sizes = parse_sizes(request.args.get("sizes", "800x800"))  # Resize dimensions, e.g. 800x800,200x200
+        if not 1 <= quality <= 100:
+            raise ValueError("quality must be between 1 and 100.")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        # Open the image
-        img = Image.open(input_image)
-
-        # Resize the image while maintaining aspect ratio
-        img.thumbnail(max_size)
-
-        # Save the compressed/resized image
-        img.save(output_image, "JPEG", quality=quality)
+    try:
+        sources = [ctx.secure_path(path) for path in find_images(os.path.join(ctx.data_dir, src))]
+        if not sources:
+            return jsonify({"error": "Image file not found."}), 404
 
-        return jsonify({"message": "Image compressed and resized successfully."}), 200
+        if src == "input.jpg" and "sizes" not in request.args:
+            # The original single-image task: data/compressed.jpg
+            dest_dir, template = ctx.data_dir, "compressed.jpg"
+        else:
+            dest_dir = ctx.secure_path(os.path.join(ctx.data_dir, request.args.get("out", "resized")))
+            template = DEFAULT_RESIZE_TEMPLATE
+
+        # Draft-mode decodes on a process pool; sources whose hash is unchanged are skipped
+        _, stats = resize_images(sources, dest_dir, sizes, quality, template, workers=RESIZE_WORKERS)
+        return jsonify({"message": "Image compressed and resized successfully.", "resize_stats": stats}), 200
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400  # Sources whose outputs would overwrite each other
     except Exception as e:
         return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
 
-# Task B9: Convert Markdown to HTML
+# Task B9: Convert Markdown to HTML (one file, or a whole tree such as docs/)
 def convert_markdown_to_html():
     """ Converts Markdown content to HTML. """
-    input_file = get_abs_path("sample.md")  # Path to the Markdown file
-    output_file = get_abs_path("output.html")  # Output HTML file
+    ctx = tenants.current()
 
     try:
+        # ?src=docs renders every .md file under data/docs to the same paths under ?out= (default site/)
+        if "src" in request.args:
+            src_dir = ctx.secure_path(os.path.join(ctx.data_dir, request.args["src"]))
+            out_dir = ctx.secure_path(os.path.join(ctx.data_dir, request.args.get("out", "site")))
+            if not os.path.isdir(src_dir):
+                return jsonify({"error": "Markdown directory not found."}), 404
+            stats = markdown_renderer.render_tree(src_dir, out_dir)
+            return jsonify({"message": "Markdown converted to HTML successfully.", "render_stats": stats}), 200
+
+        input_file = get_abs_path("sample.md")  # Path to the Markdown file
+        output_file = get_abs_path("output.html")  # Output HTML file
+
         # Read the Markdown file
         with open(input_file, "r", encoding="utf-8") as f:
             md_content = f.read()
 
-        # Convert Markdown to HTML
-        html_content = markdown.markdown(md_content)
+        # Convert Markdown to HTML with a pooled, cached renderer
+        html_content = markdown_renderer.render(md_content)
 
         # Save the HTML output
         with open(output_file, "w", encoding="utf-8") as f:
             f.write(html_content)
 
         return jsonify({"message": "Markdown converted to HTML successfully."}), 200
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
     except Exception as e:
         return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
 
@@ -477,25 +736,37 @@ def filter_csv():
     csv_file = get_abs_path("data.csv")  # Replace with your CSV file path
 
     try:
-        # Load the CSV into a DataFrame
-        df = pd.read_csv(csv_file)
+        # The parsed CSV stays in memory until the file changes
+        table = csv_cache.get(csv_file)
+        df = table.df
 
-        # Get filter parameters from request
+        # Get filter parameters from request: column/value plus any where.<column>=<value>
+        predicates = {k[len("where."):]: v for k, v in request.args.items() if k.startswith("where.")}
         column = request.args.get("column")  # Column name
         value = request.args.get("value")  # Value to filter
+        if column and value:
+            predicates[column] = value
 
         # Validate parameters
-        if not column or not value:
+        if not predicates:
             return jsonify({"error": "Missing required parameters: column and value."}), 400
-        
-        # Apply filter
-        if column not in df.columns:
-            return jsonify({"error": f"Column '{column}' not found in CSV."}), 400
 
-        filtered_df = df[df[column].astype(str) == value]  # Convert to string for comparison
+        # Optional projection and pagination
+        columns = [c for c in request.args.get("columns", "").split(",") if c]
+        offset = int(request.args.get("offset", 0))
+        limit = int(request.args["limit"]) if "limit" in request.args else None
+        if offset < 0 or (limit is not None and limit < 0):
+            return jsonify({"error": "offset and limit must not be negative."}), 400
 
-        # Convert to JSON and return
-        return jsonify(filtered_df.to_dict(orient="records")), 200
+        for name in list(predicates) + columns:
+            if name not in df.columns:
+                return jsonify({"error": f"Column '{name}' not found in CSV."}), 400
+
+        # Look up matching rows through the per-column hash indexes
+        total, records = table.query(predicates, columns, offset, limit)
+
+        # Convert to JSON and return; the total match count goes in a header
+        return jsonify(records), 200, {"X-Total-Count": str(total)}
 
     except Exception as e:
         return jsonify({"error": "Task execution failed.", "details": str(e)}), 400
@@ -503,15 +774,243 @@ def filter_csv():
 # Dictionary to map task descriptions to functions
 TASKS = {
     "format_with_prettier": a2_format_markdown,
+    "format_markdown_files": a2_format_markdown_batch,
     "count_wednesdays": a3_dates,
     "sort_contacts": a4_contacts,
     "extract_recent_logs": a5_logs,
     "extract_markdown_headers": a6_docs,
     "extract_email_sender": a7_email,
+    "extract_email_senders": a7_email_bulk,
+    "extract_credit_card_number": a8_credit_card,
+    "extract_credit_card_numbers": a8_credit_card_bulk,
+    "compress_or_resize_image": compress_or_resize_image,
+    "resize_images": compress_or_resize_image,
+    "convert_markdown_to_html": convert_markdown_to_html,
+    "render_markdown": convert_markdown_to_html,
     "calculate_gold_ticket_sales": a10_ticket_sales,
+    "calculate_ticket_sales": a10_ticket_sales,
+    "fetch_api_data": fetch_and_save_api_data,
+    "scrape_website": scrape_website,
+
+}
+
+# Data files each task reads and writes, relative to /data. Used by the result
+# cache and to order conflicting tasks in a batch. Entries that depend on the
+# task arguments are given as a function of them; "*" means anything in /data.
+TASK_IO = {
+    "format_with_prettier": {"inputs": ["format.md"], "outputs": ["format.md"]},
+    "format_markdown_files": {"inputs": ["*"], "outputs": ["*"]},
+    "count_wednesdays": {
+        "inputs": ["dates.txt"],
+        "outputs": lambda args: [f"dates-{WEEKDAYS[weekday_number(args.get('weekday', 'wednesday'))]}s.txt"],
+    },
+    "sort_contacts": {"inputs": ["contacts.json"], "outputs": ["contacts-sorted.json"]},
+    "extract_recent_logs": {"inputs": ["logs"], "outputs": ["logs-recent.txt"]},
+    "extract_markdown_headers": {"inputs": ["docs"], "outputs": ["docs/index.json", "docs/index.meta.json"]},
+    "extract_email_sender": {"inputs": ["email.txt"], "outputs": ["email-sender.txt"]},
+    "extract_email_senders": {"inputs": lambda args: [args.get("dir", "emails")], "outputs": ["email-senders.json"]},
+    "extract_credit_card_number": {"inputs": ["credit_card.png"], "outputs": ["credit-card.txt"]},
+    "extract_credit_card_numbers": {"inputs": lambda args: [args.get("dir", "cards")], "outputs": ["credit-cards.json"]},
+    "calculate_gold_ticket_sales": {
+        "inputs": ["ticket-sales.db"],
+        "outputs": lambda args: [f"ticket-sales-{args.get('type', 'Gold').lower()}.txt"],
+    },
+    "calculate_ticket_sales": {
+        "inputs": ["ticket-sales.db"],
+        "outputs": lambda args: [f"ticket-sales-{args.get('type', 'Gold').lower()}.txt"],
+    },
+    "compress_or_resize_image": {"inputs": ["*"], "outputs": ["*"]},
+    "resize_images": {"inputs": ["*"], "outputs": ["*"]},
+    "convert_markdown_to_html": {"inputs": ["*"], "outputs": ["*"]},
+    "render_markdown": {"inputs": ["*"], "outputs": ["*"]},
+    "fetch_api_data": {"inputs": [], "outputs": list(API_DATA_FILES.values())},
+    "scrape_website": {"inputs": lambda args: [args["urls"]] if args.get("urls") else [],
+                       "outputs": ["scraped_titles.txt", "scraped_pages.json"]},
+}
+
+# Idempotent tasks whose results can be served from the result cache
+CACHEABLE_TASKS = {
+    "count_wednesdays",
+    "sort_contacts",
+    "extract_markdown_headers",
+    "calculate_gold_ticket_sales",
+    "calculate_ticket_sales",
+}
+
+
+def task_io(task_name, args):
+    """Absolute (input paths, output paths) of a task; raises ValueError on bad arguments"""
+    spec = TASK_IO.get(task_name, {"inputs": ["*"], "outputs": ["*"]})
+    paths = []
+    for key in ("inputs", "outputs"):
+        names = spec[key](args) if callable(spec[key]) else spec[key]
+        paths.append([name if name == ANY else get_abs_path(name) for name in names])
+    return paths[0], paths[1]
 
+
+# Query parameters that control dispatch rather than the task itself
+CONTROL_ARGS = {"task", "async", "nocache", "tenant", "tenants", "timing"}
+
+result_cache = ResultCache(
+    max_entries=env_int("CACHE_MAX_ENTRIES", 256),
+    max_bytes=env_int("CACHE_MAX_BYTES", 64 * 1024 * 1024),
+    mode=os.environ.get("CACHE_FINGERPRINT", "stat"),
+)
+
+
+def dispatch_task(task_name):
+    """Run a task from TASKS, answering from the result cache when its inputs are unchanged"""
+    with metrics.track("task", task_name) as span:
+        response, status = run_cached_task(task_name)
+        span.status = status
+        return response, status
+
+
+def run_cached_task(task_name):
+    """Run a task, or replay its cached result and outputs"""
+    if task_name not in CACHEABLE_TASKS or request.args.get("nocache", "").lower() in ("1", "true", "yes"):
+        return TASKS[task_name]()
+
+    args = {k: v for k, v in request.args.items() if k not in CONTROL_ARGS}
+    try:
+        input_paths, output_paths = task_io(task_name, args)
+    except ValueError:
+        return TASKS[task_name]()  # Let the task report the bad argument
+
+    if not all(os.path.exists(p) for p in input_paths):
+        return TASKS[task_name]()  # Let the task report the missing input
+
+    key = result_cache.key(task_name, input_paths, args, exclude=output_paths)
+    entry = result_cache.get(key)
+    if entry is not None:
+        result_cache.restore_outputs(entry)
+        return jsonify(entry["payload"]), entry["status"]
+
+    response, status = TASKS[task_name]()
+    if status == 200:
+        result_cache.put(key, response.get_json(), status, output_paths)
+    return response, status
+
+
+# Tasks that wait on the network or a subprocess run on their own lane of the job queue
+SLOW_TASKS = {
+    "format_with_prettier",
+    "format_markdown_files",
+    "extract_email_sender",
+    "extract_email_senders",
+    "extract_credit_card_number",
+    "extract_credit_card_numbers",
+    "compress_or_resize_image",
+    "resize_images",
+    "fetch_api_data",
+    "scrape_website",
 }
 
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def normalize_task_name(task_name):
+    """Normalize a task description to a TASKS key"""
+    return task_name.lower().replace(" ", "_")
+
+
+def execute_task(task_name, args=None):
+    """Run a task outside of the request that asked for it and return (payload, status)"""
+    with app.test_request_context("/run", query_string=args or {}):
+        response, status = dispatch_task(task_name)
+        return response.get_json(), status
+
+
+def get_job_queue():
+    """Create the background job queue on first use"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                execute_task,
+                lanes={"fast": env_int("JOB_WORKERS", 4), "slow": env_int("JOB_SLOW_WORKERS", 2)},
+                queue_size=env_int("JOB_QUEUE_SIZE", 100),
+                executor=os.environ.get("JOB_EXECUTOR", "thread"),
+            )
+        return _job_queue
+
+
+def submit_job(task_name, args):
+    """Queue a task on the job queue and return the 202 response with its job id"""
+    args = {**args, **tenants.current().args()}  # The job runs in this request's tenant
+    lane = "slow" if task_name in SLOW_TASKS else "fast"
+    try:
+        job = get_job_queue().submit(task_name, args, lane)
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"message": "Task queued.", "job_id": job.id, "status_url": f"/jobs/{job.id}"}), 202
+
+
+def fan_out(task_name, tenant_list):
+    """Run one task over many tenant data roots in parallel and collect the results"""
+    names = tenants.tenants() if tenant_list == "*" else [t for t in tenant_list.split(",") if t]
+    for name in names:
+        tenants.context_for(name)  # Reject unknown tenants before running anything
+    args = {k: v for k, v in request.args.items() if k not in ("tenant", "tenants", "async")}
+
+    def run(name):
+        started = time.perf_counter()
+        payload, status = execute_task(task_name, {**args, "tenant": name})
+        return {"status_code": status, "result": payload, "seconds": round(time.perf_counter() - started, 6)}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=env_int("FANOUT_WORKERS", 8)) as pool:
+        results = dict(zip(names, pool.map(run, names)))
+    failed = sum(1 for r in results.values() if r["status_code"] >= 400)
+    return jsonify({
+        "message": "Task executed for all tenants.",
+        "failed": failed,
+        "total_seconds": round(time.perf_counter() - started, 6),
+        "tenants": results,
+    }), 200
+
+
+# Every endpoint call is timed; the span is closed once the response is built,
+# so streamed bodies are measured up to their first chunk
+@app.before_request
+def start_request_span():
+    g.request_span = metrics.start("endpoint", request.url_rule.rule if request.url_rule else "unmatched")
+
+
+@app.after_request
+def finish_request_span(response):
+    span = metrics.finish(g.pop("request_span", None), response.status_code)
+    if span is not None and timing_requested(request.args, request.headers):
+        response.headers["X-Timing"] = timing_header(span)
+    return response
+
+
+def timing_requested(args, headers):
+    """Whether a response gets an X-Timing header: TIMING_HEADER, ?timing=1 or an X-Timing: 1 request header"""
+    return TIMING_HEADER or args.get("timing", "").lower() in ("1", "true", "yes") \
+        or headers.get("X-Timing", "").lower() in ("1", "true", "yes")
+
+
+def timing_header(span):
+    """X-Timing value of a finished endpoint span and the task spans inside it"""
+    return ", ".join([span.timing()] + [child.timing() for child in span.children])
+
+
+@app.teardown_request
+def abandon_request_span(exc):
+    # after_request is skipped when a handler raises
+    span = g.pop("request_span", None)
+    if span is not None:
+        metrics.finish(span, 500)
+
+
+# Unknown or malformed tenants get a JSON error like every other failure
+@app.errorhandler(TenantError)
+def tenant_error(e):
+    return jsonify({"error": str(e)}), e.status
+
+
 # API endpoint to execute tasks
 @app.route('/run', methods=['GET', 'POST'])
 def run_task():
@@ -519,20 +1018,177 @@ def run_task():
     if not task_name:
         return jsonify({"error": "Missing task description."}), 400
 
-    task_function = TASKS.get(task_name.lower().replace(" ", "_"))  # Normalize task name
-    if task_function:
-        return task_function()
-    else:
+    task_name = normalize_task_name(task_name)
+    task_function = TASKS.get(task_name)
+    if not task_function:
         return jsonify({"error": "Invalid task description."}), 400
 
+    # tenants=a,b,c (or *) runs the task once per tenant data root, in parallel
+    if request.args.get('tenants'):
+        return fan_out(task_name, request.args.get('tenants'))
+
+    # async=1 queues the task and returns a job id right away
+    if request.args.get('async', '').lower() in ("1", "true", "yes"):
+        return submit_job(task_name, request.args.to_dict())
+    return dispatch_task(task_name)
+
+# API endpoint to run many tasks in one request
+@app.route('/run_batch', methods=['POST'])
+def run_batch():
+    """Run a list of tasks, concurrently where they do not conflict.
+
+    The body is {"tasks": [...]} where each item is a task name or an object
+    {"task", "id", "args", "after"}. Tasks that touch the same data files run in
+    list order; "after" adds explicit dependencies and skips a task whose
+    dependency failed. Returns per-task results and timings.
+    """
+    body = request.get_json(silent=True)
+    items = body.get("tasks") if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Body must be a JSON object with a non-empty 'tasks' list."}), 400
+
+    nodes = []
+    seen = {}
+    for item in items:
+        if isinstance(item, str):
+            item = {"task": item}
+        if not isinstance(item, dict) or not isinstance(item.get("task"), str):
+            return jsonify({"error": "Each batch item must be a task name or an object with a 'task'."}), 400
+        task_name = normalize_task_name(item["task"])
+        if task_name not in TASKS:
+            return jsonify({"error": f"Invalid task description: {item['task']}"}), 400
+        args = item.get("args") or {}
+        if not isinstance(args, dict):
+            return jsonify({"error": f"'args' of {item['task']} must be an object."}), 400
+        if "tenant" in args or "tenants" in args:
+            # Every node runs in the batch request's tenant, the one its conflicts were ordered in
+            return jsonify({"error": f"'args' of {item['task']} cannot select a tenant; set it on the batch request."}), 400
+        args = {k: str(v) for k, v in args.items()}
+        seen[task_name] = seen.get(task_name, 0) + 1
+        node_id = str(item.get("id") or (task_name if seen[task_name] == 1 else f"{task_name}#{seen[task_name]}"))
+        try:
+            reads, writes = task_io(task_name, args)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid arguments for {node_id}: {e}"}), 400
+        after = item.get("after") or []
+        if isinstance(after, (str, int)):
+            after = [after]
+        if not isinstance(after, list) or not all(isinstance(a, (str, int)) and not isinstance(a, bool) for a in after):
+            return jsonify({"error": f"'after' of {node_id} must be a task id or a list of them."}), 400
+        nodes.append({
+            "id": node_id, "task": task_name, "args": args, "reads": reads, "writes": writes,
+            "after": [str(a) for a in after],
+        })
+
+    tenant_args = tenants.current().args()
+    try:
+        results, total_seconds = run_graph(
+            order_conflicts(nodes),
+            lambda node: execute_task(node["task"], {**node["args"], **tenant_args}),
+            workers=env_int("BATCH_WORKERS", 4),
+        )
+    except BatchError as e:
+        return jsonify({"error": str(e)}), 400
+
+    failed = sum(1 for r in results if r["status"] != "done")
+    return jsonify({"message": "Batch executed.", "failed": failed, "total_seconds": total_seconds, "results": results}), 200
+
+# API endpoint to check on a queued task
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(job.to_dict()), 200
+
+# API endpoint for job queue depth and throughput
+@app.route('/jobs', methods=['GET'])
+def job_stats():
+    return jsonify(get_job_queue().stats()), 200
+
+# API endpoint for aggregate queries on a SQLite database under /data
+@app.route('/sql', methods=['GET'])
+def sql_aggregate():
+    db_path = get_abs_path(request.args.get('db', 'ticket-sales.db'))
+    if not os.path.exists(db_path):
+        return jsonify({"error": "Database file not found."}), 404
+
+    table = request.args.get('table')
+    if not table:
+        return jsonify({"error": "Missing required parameter: table."}), 400
+    # Equality filters are passed as where.<column>=<value>
+    filters = {k[len("where."):]: v for k, v in request.args.items() if k.startswith("where.")}
+    group_by = request.args.get('group_by')
+
+    try:
+        with db_pool.connection(db_path) as conn:
+            sql, params = aggregate_sql(
+                conn, table, request.args.get('agg', 'count').lower(), request.args.get('expr', '*'), filters, group_by
+            )
+            rows = conn.execute(sql, params).fetchall()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except sqlite3.Error as e:
+        return jsonify({"error": "Query failed.", "details": str(e)}), 400
+
+    if group_by:
+        return jsonify({"sql": sql, "groups": [{"group": g, "value": v} for g, v in rows]}), 200
+    return jsonify({"sql": sql, "result": rows[0][0]}), 200
+
+# API endpoint for result cache hits and misses
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(result_cache.stats()), 200
+
+# API endpoint for Prometheus scraping
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4"), 200
+
+# API endpoint to render Markdown sent in the request body
+@app.route('/markdown', methods=['POST'])
+def render_markdown_endpoint():
+    text = request.get_data(as_text=True)
+    if not text:
+        return jsonify({"error": "Missing Markdown content."}), 400
+    return Response(markdown_renderer.render(text), mimetype="text/html"), 200
+
 # API endpoint to read file contents
 @app.route('/read', methods=['GET'])
 def read_file_endpoint():
     file_path = request.args.get('path')
     if not file_path:
         return jsonify({"error": "Missing file path."}), 400
+
+    # stream=1 sends the raw file in chunks and honours HTTP Range headers
+    if request.args.get('stream', '').lower() in ("1", "true", "yes"):
+        abs_path = get_abs_path(file_path)
+        if not os.path.isfile(abs_path):
+            return jsonify({"error": "File not found.", "path": abs_path}), 404
+        return send_file(abs_path, mimetype="text/plain", conditional=True)
+
+    if any(k in request.args for k in ("offset", "length", "start_line", "lines")):
+        return read_file_range(file_path, request.args)
     return read_file(file_path)
 
-# Run Flask app
+def shutdown():
+    """Drain queued background jobs and release pooled workers and connections"""
+    with _job_queue_lock:
+        job_queue = _job_queue
+    if job_queue is not None:
+        job_queue.shutdown(wait=True)
+    prettier_pool.close()
+    ocr_pool.close()
+    scraper.close()
+    ingester.close()
+    db_pool.close()
+
+
+# PRELOAD_MODULES=1 imports every lazy module up front, e.g. in a server master before it forks
+if os.environ.get("PRELOAD_MODULES", "").lower() in ("1", "true", "yes"):
+    warm_up()
+
+
+# Run Flask app (development server; use serve.py in production)
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000, debug=True)
@@ -0,0 +1,111 @@
+# ASGI entry point: `uvicorn asgi:application` or `python serve.py --asgi`.
+#
+# The network-bound tasks (fetch_api_data, scrape_website) run natively on the
+# event loop through the app's ingester and scraper and their shared
+# httpx.AsyncClient, so any number of them can wait on remote servers at once
+# without holding a thread each. Without httpx they fall back to the blocking
+# clients on a worker thread. They are timed like any /run request and task.
+# Every other route is served by the Flask app through asgiref's WSGI adapter.
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+import requests
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.datastructures import Headers
+
+import app as service
+import asyncfetch
+from context import TenantError
+from ingest import IngestError
+
+wsgi_app = WsgiToAsgi(service.app)
+
+
+async def fetch_api_data(ctx, args):
+    if not asyncfetch.HAS_HTTPX:
+        return await asyncio.to_thread(service.ingest_api_data, ctx, args)
+    try:
+        url, output_path, options = service.ingest_args(ctx, args)
+    except KeyError as e:
+        return {"error": e.args[0]}, 400
+    try:
+        stats = await service.ingester.aingest(url, output_path, **options)
+    except (requests.exceptions.RequestException, IngestError) as e:
+        return {"error": "Task execution failed.", "details": str(e)}, 400
+    return {"message": "API data fetched and saved successfully.", "ingest_stats": stats}, 200
+
+
+async def scrape_website(ctx, args):
+    try:
+        urls = service.scrape_targets(ctx, args)
+    except OSError as e:
+        return {"error": "URL list not found.", "details": str(e)}, 404
+    if not asyncfetch.HAS_HTTPX:
+        return await asyncio.to_thread(service.scrape_to_files, urls, ctx)
+    results, stats = await service.scraper.ascrape(urls)
+    return await asyncio.to_thread(service.save_scrape_results, urls, results, stats, ctx)
+
+
+ASYNC_TASKS = {
+    "fetch_api_data": fetch_api_data,
+    "scrape_website": scrape_website,
+}
+
+
+async def send_json(send, payload, status, headers=()):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        + [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # The server has stopped taking requests; finish background jobs before exiting
+            await service.scraper.aclose()
+            await service.ingester.aclose()
+            await asyncio.to_thread(service.shutdown)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+
+    if scope["type"] == "http" and scope["path"] == "/run":
+        args = {k: v[0] for k, v in parse_qs(scope["query_string"].decode("latin-1")).items()}
+        task_name = service.normalize_task_name(args.get("task", ""))
+        # async=1 and tenants= fan-out keep going through the Flask app
+        if task_name in ASYNC_TASKS and "async" not in args and "tenants" not in args:
+            headers = Headers([(k.decode("latin-1"), v.decode("latin-1")) for k, v in scope["headers"]])
+            # The same endpoint and task spans as the Flask route, so /metrics and X-Timing cover this path
+            span = service.metrics.start("endpoint", "/run")
+            try:
+                try:
+                    ctx = service.tenants.context_for(args.get("tenant") or headers.get("X-Tenant"))
+                except TenantError as e:
+                    payload, status = {"error": str(e)}, e.status
+                else:
+                    with service.metrics.track("task", task_name) as task_span:
+                        payload, status = await ASYNC_TASKS[task_name](ctx, args)
+                        task_span.status = status
+            except BaseException:
+                service.metrics.finish(span, 500)
+                raise
+            service.metrics.finish(span, status)
+            timing = []
+            if service.timing_requested(args, headers):
+                timing.append(("X-Timing", service.timing_header(span)))
+            return await send_json(send, payload, status, timing)
+
+    await wsgi_app(scope, receive, send)
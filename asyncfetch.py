@@ -0,0 +1,70 @@
+import asyncio
+import importlib.util
+
+from lazy import lazy_import
+
+# Native async HTTP for the ASGI server, imported on first use; without it the
+# ASGI tasks fall back to the blocking clients on worker threads
+httpx = lazy_import("httpx")
+HAS_HTTPX = importlib.util.find_spec("httpx") is not None
+
+# Responses retried with backoff, as the blocking clients' urllib3 Retry does
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class PeerCheckedBackend:
+    """Wraps an httpcore network backend: every new TCP connection's peer address is checked with guard."""
+
+    def __init__(self, backend, guard):
+        self.backend = backend
+        self.guard = guard
+
+    async def connect_tcp(self, host, port, *args, **kwargs):
+        stream = await self.backend.connect_tcp(host, port, *args, **kwargs)
+        peer = stream.get_extra_info("server_addr")
+        try:
+            self.guard.check_peer(host, peer[0] if peer else "")
+        except BaseException:
+            await stream.aclose()
+            raise
+        return stream
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+def async_client(guard=None, max_connections=16, timeout=(5, 30), retries=2):
+    """An httpx.AsyncClient that follows redirects and checks every hop against guard first.
+
+    Each new connection's peer address is checked too (see UrlGuard). Connection
+    failures are retried by the transport; see send() for status retries.
+    """
+
+    async def check(request):
+        # Resolving the host blocks, like every getaddrinfo; keep it off the event loop
+        await asyncio.to_thread(guard.check, str(request.url))
+
+    connect, read = timeout
+    transport = httpx.AsyncHTTPTransport(
+        retries=retries,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+    )
+    if guard is not None:
+        # httpx has no public hook for the connection's address; httpcore's pool takes a network backend
+        transport._pool._network_backend = PeerCheckedBackend(transport._pool._network_backend, guard)
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(read, connect=connect),
+        transport=transport,
+        follow_redirects=True,
+        event_hooks={"request": [check] if guard is not None else []},
+    )
+
+
+async def send(client, url, headers=None, retries=2, backoff=0.5, stream=False):
+    """GET url, retrying 429 / 5xx responses with exponential backoff; the last response is returned."""
+    for attempt in range(retries + 1):
+        response = await client.send(client.build_request("GET", url, headers=headers), stream=stream)
+        if response.status_code not in RETRY_STATUSES or attempt == retries:
+            return response
+        await response.aclose()
+        await asyncio.sleep(backoff * 2 ** attempt)
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Resource name standing for "anything under the data directory"
+ANY = "*"
+
+# Node states
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class BatchError(ValueError):
+    """Raised for a malformed batch: unknown dependencies or a cycle."""
+
+
+def paths_overlap(a, b):
+    """True when two resource paths are the same or one contains the other."""
+    if a == ANY or b == ANY:
+        return True
+    return a == b or a.startswith(b.rstrip(os.sep) + os.sep) or b.startswith(a.rstrip(os.sep) + os.sep)
+
+
+def conflicts(reads_a, writes_a, reads_b, writes_b):
+    """Two tasks must not overlap when either one writes something the other touches."""
+    return any(paths_overlap(w, r) for w in writes_a for r in list(reads_b) + list(writes_b)) or \
+        any(paths_overlap(w, r) for w in writes_b for r in reads_a)
+
+
+def order_conflicts(nodes):
+    """Add implicit dependencies so conflicting nodes run in list order.
+
+    Each node is a dict with "id", "reads", "writes" and "after" (explicit
+    dependency ids). Conflict ordering goes into a separate "waits_for" list,
+    because unlike "after" it does not skip the node when the earlier one fails.
+    """
+    for i, node in enumerate(nodes):
+        node["waits_for"] = [
+            earlier["id"] for earlier in nodes[:i]
+            if conflicts(earlier["reads"], earlier["writes"], node["reads"], node["writes"])
+        ]
+    return nodes
+
+
+def check_graph(nodes):
+    """Validate dependency ids and reject cycles (Kahn's algorithm)."""
+    ids = {node["id"] for node in nodes}
+    if len(ids) != len(nodes):
+        raise BatchError("Batch task ids must be unique.")
+    for node in nodes:
+        unknown = [d for d in node["after"] if d not in ids]
+        if unknown:
+            raise BatchError(f"Task '{node['id']}' depends on unknown task(s): {', '.join(unknown)}.")
+    remaining = {node["id"]: set(node["after"]) | set(node.get("waits_for", [])) for node in nodes}
+    while remaining:
+        ready = [node_id for node_id, deps in remaining.items() if not deps]
+        if not ready:
+            raise BatchError(f"Dependency cycle between: {', '.join(sorted(remaining))}.")
+        for node_id in ready:
+            del remaining[node_id]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def run_graph(nodes, runner, workers=4):
+    """Run every node as soon as its dependencies have finished.
+
+    runner(node) returns (payload, status_code). Returns one result dict per
+    node, in input order, with its status and timings relative to the start.
+    """
+    check_graph(nodes)
+    start = time.perf_counter()
+    results = {}
+    pending = {node["id"]: node for node in nodes}
+    lock = threading.Lock()
+
+    def run(node):
+        started = time.perf_counter()
+        try:
+            payload, status_code = runner(node)
+        except Exception as e:
+            payload, status_code = {"error": "Task execution failed.", "details": str(e)}, 500
+        finished = time.perf_counter()
+        with lock:
+            results[node["id"]] = {
+                "id": node["id"],
+                "task": node["task"],
+                "status": DONE if status_code < 400 else FAILED,
+                "status_code": status_code,
+                "result": payload,
+                "started_at": round(started - start, 6),
+                "seconds": round(finished - started, 6),
+            }
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        running = {}
+        while pending or running:
+            for node_id, node in list(pending.items()):
+                deps = node["after"] + node.get("waits_for", [])
+                if any(d not in results for d in deps):
+                    continue
+                del pending[node_id]
+                failed = [d for d in node["after"] if results[d]["status"] != DONE]
+                if failed:
+                    results[node_id] = {
+                        "id": node_id, "task": node["task"], "status": SKIPPED,
+                        "status_code": None, "result": {"error": f"Skipped because {', '.join(failed)} did not succeed."},
+                        "started_at": None, "seconds": None,
+                    }
+                    continue
+                running[pool.submit(run, node)] = node_id
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                del running[future]
+
+    return [results[node["id"]] for node in nodes], round(time.perf_counter() - start, 6)
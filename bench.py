@@ -0,0 +1,224 @@
+# Benchmark suite: times every TASKS entry and /filter_csv on datagen data at several scales.
+#
+#   python bench.py --scale 1,10,100                    # in-process and over HTTP, JSON to bench-results.json
+#   python bench.py --scale 1000 --mode inprocess --tasks count_wednesdays,sort_contacts
+#   python bench.py --compare bench-baseline.json       # flag tasks that got slower than the baseline
+#
+# Each scale gets its own tenant data root (<root>/tenants/scale-<N>) generated by
+# datagen.py's seeded generators, so results are reproducible for a given --email.
+# With --url the HTTP runs go to that server instead of one started in-process; it
+# must be started with TENANTS_DIR=<root>/tenants.
+import argparse
+import csv
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Tasks that talk to remote servers; they only measure the network, so they are opt-in
+NETWORK_TASKS = {"fetch_api_data", "scrape_website"}
+
+MAX_SCALE = 10000
+
+
+def generate(data_dir, email, scale):
+    """Write a datagen dataset at the given scale, plus data.csv for /filter_csv."""
+    import datagen
+
+    os.makedirs(data_dir, exist_ok=True)
+    datagen.config.update({"root": data_dir, "email": email, "scale": scale})
+    datagen.a2_format_markdown()
+    datagen.a3_dates()
+    datagen.a5_logs()
+    datagen.a6_docs()
+    datagen.a7_email()
+    datagen.a8_credit_card_image()
+    datagen.a9_comments()
+    datagen.a10_ticket_sales()
+
+    # One contact list feeds both sort_contacts and /filter_csv
+    contacts = datagen.get_contacts(email, scale)
+    with open(os.path.join(data_dir, "contacts.json"), "w", encoding="utf-8") as f:
+        json.dump(contacts, f)
+    with open(os.path.join(data_dir, "data.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["first_name", "last_name", "email"])
+        writer.writeheader()
+        writer.writerows(contacts)
+    return contacts[0]["last_name"]
+
+
+def summarize(samples):
+    return {
+        "min": round(min(samples), 6),
+        "median": round(statistics.median(samples), 6),
+        "mean": round(statistics.fmean(samples), 6),
+        "max": round(max(samples), 6),
+    }
+
+
+def time_calls(call, repeat, warmup):
+    """Run call() warmup + repeat times; returns (last status, seconds of the timed runs)."""
+    status = None
+    for _ in range(warmup):
+        status = call()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        status = call()
+        samples.append(time.perf_counter() - started)
+    return status, samples
+
+
+def start_server(flask_app):
+    """Serve the app on a free local port in a background thread; returns (url, server)."""
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # No access log line per request
+    server = make_server("127.0.0.1", 0, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """Print benchmarks whose median is more than threshold times the baseline's."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["scale"], r["mode"], r["name"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        before = baseline.get((r["scale"], r["mode"], r["name"]))
+        if not before or not before["seconds"]["median"]:
+            continue
+        ratio = r["seconds"]["median"] / before["seconds"]["median"]
+        if ratio > threshold:
+            regressions.append({**r, "baseline_median": before["seconds"]["median"], "ratio": round(ratio, 3)})
+    for r in regressions:
+        print(f"REGRESSION {r['name']} ({r['mode']}, scale {r['scale']}): "
+              f"{r['baseline_median']:.4f}s -> {r['seconds']['median']:.4f}s ({r['ratio']}x)")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every task on generated data.")
+    parser.add_argument("--email", default="bench@example.com", help="seed for the datagen generators")
+    parser.add_argument("--scale", default="1,10", help=f"comma-separated scale factors (1 to {MAX_SCALE})")
+    parser.add_argument("--root", default=os.path.join(ROOT, ".bench"), help="where generated data is kept")
+    parser.add_argument("--mode", choices=("inprocess", "http", "both"), default="both")
+    parser.add_argument("--url", help="benchmark this running server instead of an in-process one")
+    parser.add_argument("--tasks", help="comma-separated task names (default: every local task)")
+    parser.add_argument("--network", action="store_true", help="also run tasks that call remote servers")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--regenerate", action="store_true", help="rebuild data that already exists")
+    parser.add_argument("--json", default="bench-results.json", help="results file")
+    parser.add_argument("--compare", help="baseline results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+    args.scales = [int(s) for s in args.scale.split(",") if s]
+    if not all(1 <= s <= MAX_SCALE for s in args.scales):
+        parser.error(f"scale factors must be between 1 and {MAX_SCALE}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    tenants_dir = os.path.abspath(os.path.join(args.root, "tenants"))
+    os.environ["TENANTS_DIR"] = tenants_dir  # Read by app at import time
+    sys.path.insert(0, ROOT)
+    import app
+
+    task_names = args.tasks.split(",") if args.tasks else [
+        name for name in app.TASKS if args.network or name not in NETWORK_TASKS
+    ]
+    modes = ["inprocess", "http"] if args.mode == "both" else [args.mode]
+    url, server = (args.url, None) if args.url or "http" not in modes else start_server(app.app)
+    session = requests.Session()
+
+    results = []
+    for scale in args.scales:
+        tenant = f"scale-{scale}"
+        data_dir = os.path.join(tenants_dir, tenant)
+        marker = os.path.join(data_dir, ".bench.json")
+        try:
+            with open(marker, "r", encoding="utf-8") as f:
+                generated = json.load(f)
+        except (OSError, ValueError):
+            generated = {}
+        if args.regenerate or generated.get("email") != args.email:
+            started = time.perf_counter()
+            generated = {"email": args.email, "scale": scale, "filter_value": generate(data_dir, args.email, scale)}
+            with open(marker, "w", encoding="utf-8") as f:
+                json.dump(generated, f)
+            print(f"scale {scale}: generated data in {time.perf_counter() - started:.2f}s")
+        filter_value = generated["filter_value"]
+
+        # (name, in-process call, HTTP path); every call returns the status code
+        filter_query = {"column": "last_name", "value": filter_value, "tenant": tenant}
+        client = app.app.test_client()
+        benchmarks = [
+            (name, lambda name=name: app.execute_task(name, {"tenant": tenant, "nocache": "1"})[1],
+             ("/run", {"task": name, "tenant": tenant, "nocache": "1"}))
+            for name in task_names
+        ]
+        benchmarks.append(("/filter_csv", lambda: client.get("/filter_csv", query_string=filter_query).status_code,
+                           ("/filter_csv", filter_query)))
+
+        for name, local_call, (path, params) in benchmarks:
+            for mode in modes:
+                if mode == "inprocess":
+                    call = local_call
+                else:
+                    def call(path=path, params=params):
+                        return session.get(url + path, params=params, timeout=600).status_code
+                status, samples = time_calls(call, args.repeat, args.warmup)
+                result = {"scale": scale, "mode": mode, "name": name, "status": status,
+                          "seconds": summarize(samples)}
+                results.append(result)
+                print(f"scale {scale:>5} {mode:<9} {name:<28} {status} "
+                      f"median {result['seconds']['median'] * 1000:10.2f} ms")
+
+    if server is not None:
+        server.shutdown()
+    app.shutdown()
+
+    report = {
+        "meta": {
+            "email": args.email,
+            "scales": args.scales,
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "revision": git_revision(),
+            "url": args.url,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    print(f"Results written to {args.json}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
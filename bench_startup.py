@@ -0,0 +1,94 @@
+# Startup-time benchmark built on `python -X importtime`.
+#
+#   python bench_startup.py                  # median import time of app over 5 fresh interpreters
+#   python bench_startup.py --preload        # same, with PRELOAD_MODULES=1 (lazy modules warmed)
+#   python bench_startup.py --json out.json  # also write the results for comparison between runs
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into {module: (self_us, cumulative_us, depth)}."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            depth = (len(name) - len(name.lstrip())) // 2
+            modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+        except ValueError:
+            continue  # Header line
+    return modules
+
+
+def measure(module, preload=False):
+    """Import module in a fresh interpreter. Returns (wall seconds, importtime records)."""
+    env = dict(os.environ)
+    if preload:
+        env["PRELOAD_MODULES"] = "1"
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return wall, parse_importtime(result.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the cold-start import time of the app.")
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="heaviest top-level imports to list")
+    parser.add_argument("--preload", action="store_true", help="set PRELOAD_MODULES=1")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    walls, totals, runs = [], [], []
+    for _ in range(args.runs):
+        wall, modules = measure(args.module, args.preload)
+        walls.append(wall)
+        totals.append(modules.get(args.module, (0, 0, 0))[1])
+        runs.append(modules)
+
+    # Heaviest imports triggered directly by the module, by median cumulative time
+    last = runs[-1]
+    direct = [name for name, (_, _, depth) in last.items() if depth == 1]
+    heaviest = sorted(
+        ((name, statistics.median(r.get(name, (0, 0, 0))[1] for r in runs)) for name in direct),
+        key=lambda item: item[1], reverse=True,
+    )[:args.top]
+
+    results = {
+        "module": args.module,
+        "preload": args.preload,
+        "runs": args.runs,
+        "python": sys.version.split()[0],
+        "wall_seconds_median": round(statistics.median(walls), 4),
+        "import_ms_median": round(statistics.median(totals) / 1000, 2),
+        "import_ms_min": round(min(totals) / 1000, 2),
+        "heaviest_imports_ms": {name: round(us / 1000, 2) for name, us in heaviest},
+    }
+
+    print(f"{args.module}: import {results['import_ms_median']} ms median "
+          f"(min {results['import_ms_min']} ms), process {results['wall_seconds_median']} s, {args.runs} runs")
+    for name, ms in results["heaviest_imports_ms"].items():
+        print(f"  {ms:9.2f} ms  {name}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# SQLite write-ahead log next to a database in WAL mode
+WAL_SUFFIX = "-wal"
+
+
+def file_fingerprint(path, mode="stat"):
+    """Fingerprint one file by (mtime, size), or by a sha256 of its content in "hash" mode.
+
+    A SQLite database in WAL mode keeps committed writes in its -wal file until
+    a checkpoint, so that file is fingerprinted along with the database.
+    """
+    fingerprint = _single_fingerprint(path, mode)
+    if os.path.isfile(path + WAL_SUFFIX):
+        return [fingerprint, _single_fingerprint(path + WAL_SUFFIX, mode)]
+    return fingerprint
+
+
+def _single_fingerprint(path, mode):
+    st = os.stat(path)
+    if mode == "hash":
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    return [st.st_mtime_ns, st.st_size]
+
+
+def path_fingerprint(path, mode="stat", exclude=()):
+    """Fingerprint a file, or every file under a directory in a stable order."""
+    if not os.path.isdir(path):
+        return file_fingerprint(path, mode)
+    entries = []
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            if file_path in exclude:
+                continue
+            entries.append([os.path.relpath(file_path, path), file_fingerprint(file_path, mode)])
+    return entries
+
+
+class ResultCache:
+    """LRU cache of task results keyed on the fingerprints of the task's inputs.
+
+    Besides the JSON payload, each entry keeps a copy of the output files the
+    task wrote, so a hit can put a deleted or modified output back in place
+    without running the task again. Entries are evicted least recently used
+    first once either ``max_entries`` or ``max_bytes`` is exceeded.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, mode="stat"):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def key(self, task_name, input_paths, args=None, exclude=()):
+        """Build the cache key for a task run over the given inputs and arguments."""
+        material = {
+            "task": task_name,
+            "args": sorted((args or {}).items()),
+            "inputs": [[p, path_fingerprint(p, self.mode, exclude)] for p in input_paths],
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, payload, status, output_paths):
+        """Remember a result along with the current contents of its output files."""
+        outputs = {}
+        size = len(json.dumps(payload))
+        for path in output_paths:
+            if not os.path.isfile(path):
+                continue
+            if size + os.path.getsize(path) > self.max_bytes:
+                return  # Too large to be worth keeping; checked before reading, outputs can be huge
+            with open(path, "rb") as f:
+                data = f.read()
+            outputs[path] = (data, file_fingerprint(path))
+            size += len(data)
+        if size > self.max_bytes:
+            return
+        entry = {"payload": payload, "status": status, "outputs": outputs, "size": size}
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)["size"]
+            self.entries[key] = entry
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted["size"]
+                self.evictions += 1
+
+    def restore_outputs(self, entry):
+        """Rewrite any output file that has gone missing or changed since it was cached."""
+        restored = []
+        for path, (data, fingerprint) in entry["outputs"].items():
+            if os.path.isfile(path) and file_fingerprint(path) == fingerprint:
+                continue
+            with open(path, "wb") as f:
+                f.write(data)
+            entry["outputs"][path] = (data, file_fingerprint(path))
+            restored.append(path)
+        return restored
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "fingerprint": self.mode,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
@@ -0,0 +1,256 @@
+import heapq
+import json
+import os
+import re
+import shutil
+import tempfile
+from itertools import chain, islice
+from json.encoder import encode_basestring_ascii
+
+DEFAULT_KEYS = ("last_name", "first_name")
+
+WHITESPACE = re.compile(r"\s*")
+
+# Output templates per field layout, see _format_record
+_templates = {}
+MAX_TEMPLATES = 1024
+
+
+class SortError(ValueError):
+    """Raised when the input is not a JSON array (or NDJSON stream) of objects."""
+
+
+def _array_records(f, buf, chunk_size):
+    """Yield the elements of a JSON array one at a time, reading f in chunks."""
+    decoder = json.JSONDecoder()
+    eof = False
+    pos = buf.index("[") + 1
+    first = True
+    while True:
+        pos = WHITESPACE.match(buf, pos).end()
+        if pos == len(buf):
+            if eof:
+                raise SortError("Invalid JSON format. Unterminated array.")
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        if buf[pos] == "]":
+            if buf[pos + 1:].strip() or f.read().strip():
+                raise SortError("Invalid JSON format. Extra data after the array.")
+            return
+        start = pos
+        if not first:
+            if buf[pos] != ",":
+                raise SortError("Invalid JSON format. Expected ',' between records.")
+            start = WHITESPACE.match(buf, pos + 1).end()
+        try:
+            record, end = decoder.raw_decode(buf, start)
+            truncated = end == len(buf) and not eof  # A number could continue in the next chunk
+        except json.JSONDecodeError:
+            if eof:
+                raise SortError("Invalid JSON format.") from None
+            truncated = True
+        if truncated:
+            # The record runs past the buffer: keep it and read more
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        yield record
+        first = False
+        pos = end
+
+
+def iter_records(path, chunk_size=1024 * 1024):
+    """Stream the records of a JSON array file or an NDJSON file (one object per line)."""
+    yield from _checked(_iter_records(path, chunk_size))
+
+
+def iter_json_array(path, chunk_size=1024 * 1024):
+    """Stream the elements of a JSON array file, whatever their type."""
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(chunk_size)
+        while buf and not buf.strip():
+            buf = f.read(chunk_size)
+        if buf.lstrip()[:1] != "[":
+            raise SortError("Invalid JSON format. Expected a list.")
+        yield from _array_records(f, buf, chunk_size)
+
+
+def load_records(path):
+    """All records of a JSON array or NDJSON file at once; faster than iter_records when they fit in memory."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    start = text.lstrip()[:1]
+    if start == "[":
+        try:
+            records = json.loads(text)
+        except json.JSONDecodeError:
+            raise SortError("Invalid JSON format.") from None
+    elif start == "{":
+        records = _ndjson_records(iter(()), text)
+    elif not start:
+        records = []
+    else:
+        raise SortError("Invalid JSON format. Expected a list.")
+    return list(_checked(records))
+
+
+def _checked(records):
+    for record in records:
+        if not isinstance(record, dict):
+            raise SortError("Invalid JSON format. Expected a list of objects.")
+        yield record
+
+
+def _iter_records(path, chunk_size):
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(chunk_size)
+        while buf and not buf.strip():
+            buf = f.read(chunk_size)
+        start = buf.lstrip()[:1]
+        if start == "[":
+            records = _array_records(f, buf, chunk_size)
+        elif start == "{":
+            records = _ndjson_records(f, buf)
+        elif not start:
+            return
+        else:
+            raise SortError("Invalid JSON format. Expected a list.")
+        yield from records
+
+
+def _ndjson_records(f, buf):
+    lines = (buf + next(f, "")).split("\n")  # Finish the partial last line of the first chunk
+    for number, line in enumerate(chain(lines, f), start=1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                raise SortError(f"Invalid JSON format. Expected a list (NDJSON line {number}).") from None
+
+
+def record_key(keys):
+    """Key function for sorting records by the given fields; missing or null fields sort as "".
+
+    The fields are joined with NUL into one string, which orders like the tuple
+    of fields (for values without NUL) but compares about twice as fast.
+    """
+    keys = tuple(keys)
+
+    def field(record, name):
+        value = record.get(name)
+        return value if isinstance(value, str) else ("" if value is None else str(value))
+
+    if len(keys) == 1:
+        return lambda record: field(record, keys[0])
+    return lambda record: "\0".join([field(record, name) for name in keys])
+
+
+def _format_record(record):
+    """A record as json.dump(..., indent=4) writes it inside the top-level array."""
+    layout = tuple(record)
+    template = _templates.get(layout)
+    if template is None and layout:
+        template = "    {\n" + ",\n".join(
+            "        " + encode_basestring_ascii(k).replace("%", "%%") + ": %s" for k in layout
+        ) + "\n    }"
+        if len(_templates) < MAX_TEMPLATES:
+            _templates[layout] = template
+    if template is not None:
+        # Records whose values are all strings (the usual contact) skip the Python indent encoder
+        try:
+            return template % tuple(map(encode_basestring_ascii, record.values()))
+        except TypeError:
+            pass
+    return "    " + json.dumps(record, indent=4).replace("\n", "\n    ")
+
+
+def write_json_array(records, f):
+    """Stream records to f as an indented JSON array, identical to json.dump(list, f, indent=4)."""
+    count = 0
+    for record in records:
+        f.write(",\n" if count else "[\n")
+        f.write(_format_record(record))
+        count += 1
+    f.write("\n]" if count else "[]")
+    return count
+
+
+def _write_run(records, tmp_dir):
+    fd, path = tempfile.mkstemp(suffix=".ndjson", dir=tmp_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(record) + "\n" for record in records)
+    return path
+
+
+def _read_run(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def sort_records(input_path, output_path, keys=DEFAULT_KEYS, memory_bytes=256 * 1024 * 1024,
+                 run_records=100000, fan_in=64, tmp_dir=None):
+    """Sort a contact file into output_path by keys.
+
+    Files up to memory_bytes are loaded and sorted in memory. Larger ones are
+    streamed into sorted runs of run_records records, spilled to temporary
+    NDJSON files and k-way merged, at most fan_in runs at a time. The sort is
+    stable, like list.sort. Returns stats about the sort.
+    """
+    key = record_key(keys)
+    if os.path.getsize(input_path) <= memory_bytes:
+        records = load_records(input_path)
+        records.sort(key=key)
+        _write_output(records, output_path)
+        return {"records": len(records), "runs": 1, "merge_passes": 0, "external": False}
+
+    records = iter_records(input_path)
+    first_run = list(islice(records, run_records))
+    first_run.sort(key=key)
+    next_record = next(records, None)
+    if next_record is None:
+        _write_output(first_run, output_path)
+        return {"records": len(first_run), "runs": 1, "merge_passes": 0, "external": False}
+
+    work_dir = tempfile.mkdtemp(prefix="contactsort-", dir=tmp_dir)
+    try:
+        runs = [_write_run(first_run, work_dir)]
+        total = len(first_run)
+        del first_run
+        pending = [next_record]
+        while pending:
+            pending.extend(islice(records, run_records - 1))
+            pending.sort(key=key)
+            runs.append(_write_run(pending, work_dir))
+            total += len(pending)
+            nxt = next(records, None)
+            pending = [nxt] if nxt is not None else []
+        run_count = len(runs)
+
+        # Merge passes until one pass can merge everything; runs are merged in order to stay stable
+        passes = 0
+        while len(runs) > fan_in:
+            merged = []
+            for i in range(0, len(runs), fan_in):
+                group = runs[i:i + fan_in]
+                merged.append(_write_run(heapq.merge(*map(_read_run, group), key=key), work_dir))
+                for path in group:
+                    os.remove(path)
+            runs = merged
+            passes += 1
+
+        _write_output(heapq.merge(*map(_read_run, runs), key=key), output_path)
+        return {"records": total, "runs": run_count, "merge_passes": passes + 1, "external": True}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _write_output(records, output_path):
+    """Write through a temporary file so readers never see a half-written result."""
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        write_json_array(records, f)
+    os.replace(tmp_path, output_path)
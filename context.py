@@ -0,0 +1,82 @@
+import os
+import re
+
+from flask import g, has_request_context, request
+
+TENANT_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9._@+-]*")
+
+
+class TenantError(Exception):
+    """Raised when a request names a tenant that is invalid or has no data root."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class TaskContext:
+    """Where a task reads and writes its data: one tenant's data root.
+
+    Tasks resolve every path through the context of the request they run in,
+    so several tenants can be served concurrently by one process without any
+    shared mutable state such as a global data directory or the process cwd.
+    """
+
+    def __init__(self, data_dir, tenant=None):
+        self.data_dir = os.path.abspath(data_dir)
+        self.tenant = tenant
+
+    def path(self, filename):
+        """Resolve a file name inside the data root (directories in the name are dropped)."""
+        return os.path.abspath(os.path.join(self.data_dir, os.path.basename(filename)))
+
+    def secure_path(self, file_path):
+        """Resolve a path and refuse anything outside the data root."""
+        abs_path = os.path.abspath(file_path)
+        if os.path.commonpath([abs_path, self.data_dir]) != self.data_dir:
+            raise PermissionError("Access to files outside /data is not allowed.")
+        return abs_path
+
+    def args(self):
+        """Query arguments that recreate this context for work run outside the request."""
+        return {"tenant": self.tenant} if self.tenant else {}
+
+
+class TenantRegistry:
+    """Maps tenant names to data roots: <tenants_dir>/<tenant>.
+
+    Requests without a tenant use the default data directory.
+    """
+
+    def __init__(self, default_dir, tenants_dir):
+        self.default = TaskContext(default_dir)
+        self.tenants_dir = os.path.abspath(tenants_dir)
+
+    def context_for(self, tenant):
+        if not tenant:
+            return self.default
+        if not TENANT_NAME.fullmatch(tenant):
+            raise TenantError(f"Invalid tenant name: {tenant}")
+        data_dir = os.path.join(self.tenants_dir, tenant)
+        if not os.path.isdir(data_dir):
+            raise TenantError(f"Unknown tenant: {tenant}", status=404)
+        return TaskContext(data_dir, tenant)
+
+    def tenants(self):
+        """All tenants that have a data root, sorted by name."""
+        if not os.path.isdir(self.tenants_dir):
+            return []
+        return sorted(
+            entry.name for entry in os.scandir(self.tenants_dir)
+            if entry.is_dir() and TENANT_NAME.fullmatch(entry.name)
+        )
+
+    def current(self):
+        """The context of the current request (?tenant= or X-Tenant), or the default."""
+        if not has_request_context():
+            return self.default
+        ctx = g.get("task_context")
+        if ctx is None:
+            tenant = request.args.get("tenant") or request.headers.get("X-Tenant")
+            ctx = g.task_context = self.context_for(tenant)
+        return ctx
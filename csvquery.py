@@ -0,0 +1,110 @@
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# pyarrow is only needed for the Parquet reload cache; look for it without importing it
+HAS_PARQUET = importlib.util.find_spec("pyarrow") is not None
+
+
+class CsvTable:
+    """A CSV file held in memory with lazily built per-column hash indexes.
+
+    Values are indexed by their string form, matching how /filter_csv has always
+    compared them. Each index maps a value to the row positions holding it, so a
+    predicate is a dict lookup and several predicates are an intersection.
+    """
+
+    def __init__(self, df, fingerprint):
+        self.df = df
+        self.fingerprint = fingerprint
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def index(self, column):
+        with self.lock:
+            idx = self.indexes.get(column)
+            if idx is None:
+                values = self.df[column].astype(str)
+                idx = self.indexes[column] = values.groupby(values, sort=False).indices
+            return idx
+
+    def query(self, predicates, columns=None, offset=0, limit=None):
+        """Return (matching row count, records for the requested page)."""
+        positions = None
+        for column, value in predicates.items():
+            rows = self.index(column).get(value, np.empty(0, dtype=np.intp))
+            positions = rows if positions is None else np.intersect1d(positions, rows, assume_unique=True)
+        if positions is None:
+            positions = np.arange(len(self.df))
+        positions = np.sort(positions)
+        total = len(positions)
+        end = None if limit is None else offset + limit
+        page = self.df.iloc[positions[offset:end]]
+        if columns:
+            page = page[columns]
+        return total, page.to_dict(orient="records")
+
+
+class CsvCache:
+    """Keeps parsed CSV files in memory until their (mtime, size) changes.
+
+    When pyarrow is installed and cache_dir is given, a Parquet copy of each
+    CSV is kept there along with the (mtime, size) of the CSV it was made
+    from, so a restarted process reloads an unchanged table without parsing
+    the CSV again.
+    """
+
+    def __init__(self, cache_dir=None, use_parquet=True):
+        self.cache_dir = cache_dir
+        self.use_parquet = use_parquet and HAS_PARQUET and cache_dir is not None
+        self.tables = {}
+        self.lock = threading.Lock()
+        if self.use_parquet:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def parquet_path(self, csv_path):
+        key = hashlib.sha256(os.path.abspath(csv_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def _load(self, csv_path, fingerprint):
+        if not self.use_parquet:
+            return pd.read_csv(csv_path)
+        parquet_file = self.parquet_path(csv_path)
+        meta_file = f"{parquet_file}.json"
+        try:
+            with open(meta_file, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("source") == os.path.abspath(csv_path) and tuple(meta.get("fingerprint", ())) == fingerprint:
+                return pd.read_parquet(parquet_file)
+        except (OSError, ValueError):
+            pass
+        df = pd.read_csv(csv_path)
+        try:
+            # Drop the old fingerprint first, so a crash mid-write never pairs it with a new copy
+            if os.path.exists(meta_file):
+                os.remove(meta_file)
+            tmp_suffix = f".{os.getpid()}.tmp"  # Worker processes may share the cache directory
+            df.to_parquet(parquet_file + tmp_suffix)
+            os.replace(parquet_file + tmp_suffix, parquet_file)
+            with open(meta_file + tmp_suffix, "w", encoding="utf-8") as f:
+                json.dump({"source": os.path.abspath(csv_path), "fingerprint": list(fingerprint)}, f)
+            os.replace(meta_file + tmp_suffix, meta_file)
+        except Exception:
+            pass  # The cache is an optimization; mixed-type columns may not convert
+        return df
+
+    def get(self, csv_path):
+        st = os.stat(csv_path)
+        fingerprint = (st.st_mtime_ns, st.st_size)
+        with self.lock:
+            table = self.tables.get(csv_path)
+            if table is None or table.fingerprint != fingerprint:
+                table = self.tables[csv_path] = CsvTable(self._load(csv_path, fingerprint), fingerprint)
+            return table
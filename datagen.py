@@ -1,6 +1,6 @@
 # DISCLAIMER: THIS SCRIPT WILL CHANGE BEFORE THE EVALUATION. TREAT THIS AS A GUIDE.
 
-# Usage: uv run datagen.py <email>
+# Usage: uv run datagen.py <email> [<email> ...] [--scale N] [--workers N]
 
 # /// script
 # requires-python = ">=3.13"
@@ -17,21 +17,36 @@ import os
 import random
 import sqlite3
 import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain
 from PIL import Image, ImageDraw, ImageFont
 from faker import Faker
 
-config = {"root": "/data"}
+config = {"root": "/data", "scale": 1}
 
 
 def num(str):
     return int(hashlib.sha256(str.encode()).hexdigest(), 16) % (2**32)
 
 
-def write_file(path, content):
-    with open(os.path.join(config["root"], path), "w", encoding="utf-8") as f:
+def write_file(path, content, root=None):
+    with open(os.path.join(root or config["root"], path), "w", encoding="utf-8") as f:
         f.write(content)
 
 
+# Scaled data is generated in shards of the default size. Every shard has its own
+# seed, so shards can be generated in any order or process and still produce the
+# same bytes. Shard 0 keeps the original seed: scale 1 output is unchanged.
+def shard_seed(key, shard):
+    return key if shard == 0 else f"{key}:{shard}"
+
+
+def map_shards(mapper, fn, scale):
+    """Run fn(shard) for every shard with mapper (map or a process pool's map), in shard order"""
+    return mapper(fn, range(scale))
+
+
 def get_markdown(email):
     return f"""#Unformatted Markdown
 
@@ -56,8 +71,12 @@ def a2_format_markdown():
     write_file("format.md", get_markdown(config["email"]))
 
 
-def get_dates(email):
-    random.seed(f"{email}:a3", version=2)
+def get_dates(email, scale=1):
+    return list(chain.from_iterable(map_shards(map, partial(get_dates_shard, email), scale)))
+
+
+def get_dates_shard(email, shard):
+    random.seed(shard_seed(f"{email}:a3", shard), version=2)
     start_date = datetime.datetime(2000, 1, 1)
     end_date = datetime.datetime(2024, 12, 31)
     formats = [
@@ -72,7 +91,7 @@ def get_dates(email):
     ]
 
 
-def a3_dates():
+def a3_dates(mapper=map):
     """Save 1,000 random non-unique dates between 2000-01-01 and 2024-12-31 at dates.txt
 
     Generates dates in various unambiguous formats:
@@ -81,30 +100,38 @@ def a3_dates():
     - MMM dd, yyyy
     - yyyy/mm/dd HH:MM:SS
     """
-    dates = get_dates(config["email"])
-    write_file("dates.txt", "\n".join(dates))
+    shards = map_shards(mapper, partial(get_dates_shard, config["email"]), config["scale"])
+    write_file("dates.txt", "\n".join(chain.from_iterable(shards)))
+
 
+def get_contacts(email, scale=1):
+    return list(chain.from_iterable(map_shards(map, partial(get_contacts_shard, email), scale)))
 
-def get_contacts(email):
+
+def get_contacts_shard(email, shard):
     fake = Faker()
-    fake.seed_instance(num(f"{email}:a4"))
+    fake.seed_instance(num(shard_seed(f"{email}:a4", shard)))
     return [
         {"first_name": fake.first_name(), "last_name": fake.last_name(), "email": fake.email()}
         for _ in range(100)
     ]
 
 
-def a4_contacts():
+def a4_contacts(mapper=map):
     """Generate a JSON with 100 contacts with random first_name, last_name, and email"""
-    contacts = get_contacts(config["email"])
-    write_file("contacts.json", json.dumps(contacts))
+    shards = map_shards(mapper, partial(get_contacts_shard, config["email"]), config["scale"])
+    write_file("contacts.json", json.dumps(list(chain.from_iterable(shards))))
+
 
+def get_logs(email, scale=1):
+    return list(chain.from_iterable(map_shards(map, partial(get_logs_shard, email), scale)))
 
-def get_logs(email):
+
+def get_logs_shard(email, shard):
     files = []
-    random.seed(f"{email}:a5", version=2)
+    random.seed(shard_seed(f"{email}:a5", shard), version=2)
     fake = Faker()
-    fake.seed_instance(num(f"{email}:a5"))
+    fake.seed_instance(num(shard_seed(f"{email}:a5", shard)))
     for i in range(50):
         text = "\n".join([fake.text() for _ in range(10)])
         age = random.randint(1, 24 * 60 * 60 * 365)
@@ -112,23 +139,33 @@ def get_logs(email):
     return files
 
 
-def a5_logs():
+def write_logs_shard(root, email, now, shard):
+    for i, (age, text) in enumerate(get_logs_shard(email, shard), start=shard * 50):
+        write_file(f"logs/log-{i}.log", text, root)
+        os.utime(os.path.join(root, f"logs/log-{i}.log"), (now - age, now - age))
+
+
+def a5_logs(mapper=map):
     """Generate 50 log files with 10 lines each of random content at logs/"""
-    email = config["email"]
     os.makedirs(os.path.join(config["root"], "logs"), exist_ok=True)
-    now = time.time()
-    for i, (age, text) in enumerate(get_logs(email)):
-        write_file(f"logs/log-{i}.log", text)
-        os.utime(os.path.join(config["root"], f"logs/log-{i}.log"), (now - age, now - age))
+    write = partial(write_logs_shard, config["root"], config["email"], time.time())
+    for _ in map_shards(mapper, write, config["scale"]):
+        pass
+
+
+def get_docs(email, scale=1):
+    return list(chain.from_iterable(map_shards(map, partial(get_docs_shard, email), scale)))
 
 
-def get_docs(email):
+def get_docs_shard(email, shard):
     files = []
-    random.seed(f"{email}:a6", version=2)
+    random.seed(shard_seed(f"{email}:a6", shard), version=2)
     fake = Faker()
-    fake.seed_instance(num(f"{email}:a6"))
+    fake.seed_instance(num(shard_seed(f"{email}:a6", shard)))
+    suffix_name = f"-{shard}" if shard else ""  # Shards share directory names, never file names
     for dir in fake.words(10):
         for file in fake.words(10):
+            file += suffix_name
             prefix = "\n".join([fake.text() for _ in range(random.randint(0, 10))])
             heading = f"# {fake.sentence()}"
             suffix = "\n".join([fake.text() for _ in range(random.randint(0, 10))])
@@ -137,15 +174,21 @@ def get_docs(email):
     return files
 
 
-def a6_docs():
+def write_docs_shard(root, email, shard):
+    created = set()
+    for dir, file, text in get_docs_shard(email, shard):
+        dirname = os.path.join(root, "docs", dir)
+        if dirname not in created:
+            os.makedirs(dirname, exist_ok=True)
+            created.add(dirname)
+        write_file(os.path.join(dirname, f"{file}.md"), text, root)
+
+
+def a6_docs(mapper=map):
     """Generate 10 Markdown files each under 10 random subdirectories with random content."""
-    email = config["email"]
-    docs = get_docs(email)
     os.makedirs(os.path.join(config["root"], "docs"), exist_ok=True)
-    for dir, file, text in docs:
-        dirname = os.path.join(config["root"], "docs", dir)
-        os.makedirs(dirname, exist_ok=True)
-        write_file(os.path.join(dirname, f"{file}.md"), text)
+    for _ in map_shards(mapper, partial(write_docs_shard, config["root"], config["email"]), config["scale"]):
+        pass
 
 
 def get_email(email):
@@ -155,7 +198,8 @@ def get_email(email):
         "recipient": fake.email(),
         "from_name": fake.name(),
         "from_email": fake.email(),
-        "date": fake.date_time().strftime("%a, %d %b %Y %H:%M:%S +0000"),
+        # A fixed end date; the default (now) made the file differ from run to run
+        "date": fake.date_time(end_datetime=datetime.datetime(2025, 1, 1)).strftime("%a, %d %b %Y %H:%M:%S +0000"),
         "subject": fake.sentence(),
         "recipient_name": fake.name(),
         "cc_1_name": fake.name(),
@@ -241,8 +285,12 @@ def a9_comments():
     write_file("comments.txt", "\n".join(get_comments(config["email"])))
 
 
-def get_tickets(email):
-    random.seed(f"{email}:a10", version=2)
+def get_tickets(email, scale=1):
+    return list(chain.from_iterable(map_shards(map, partial(get_tickets_shard, email), scale)))
+
+
+def get_tickets_shard(email, shard):
+    random.seed(shard_seed(f"{email}:a10", shard), version=2)
     ticket_types = ["Gold", "Silver", "Bronze"]
     return [
         (random.choice(ticket_types), random.randint(1, 10), round(random.uniform(50, 150), 2))
@@ -250,50 +298,136 @@ def get_tickets(email):
     ]
 
 
-def a10_ticket_sales():
+TICKETS_TABLE = """
+    CREATE TABLE IF NOT EXISTS tickets (
+        type TEXT NOT NULL,
+        units INTEGER NOT NULL,
+        price DECIMAL(10,2) NOT NULL
+    )
+"""
+
+
+def sqlite_wal_mode(path):
+    """Whether the SQLite database at path is in WAL mode (file format version 2 in its header)"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(20)
+    except FileNotFoundError:
+        return False
+    return len(header) == 20 and header[18] == 2
+
+
+def swap_in_database(tmp_path, target):
+    """Make the database built at tmp_path the target, atomically for readers.
+
+    A target in WAL mode keeps committed pages in target-wal, which SQLite would
+    lay over any file moved into its place; so its rows are replaced in place in
+    one transaction instead, through its own journal. Deleting and inserting the
+    rows (rather than dropping the table) keeps triggers such as the app's
+    ticket_totals aggregate current.
+    """
+    if not sqlite_wal_mode(target):
+        os.replace(tmp_path, target)
+        return
+    conn = sqlite3.connect(target, isolation_level=None)
+    try:
+        conn.execute("ATTACH DATABASE ? AS fresh", (tmp_path,))
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(TICKETS_TABLE.replace("tickets", "main.tickets", 1))
+        conn.execute("DELETE FROM main.tickets")
+        conn.execute("INSERT INTO main.tickets (type, units, price) SELECT type, units, price FROM fresh.tickets")
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE fresh")
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+    finally:
+        conn.close()
+    os.remove(tmp_path)
+
+
+def a10_ticket_sales(mapper=map):
     """Generate ticket-sales.db with a tickets(type, units, price) table. 1 row per ticket"""
     target = os.path.join(config["root"], "ticket-sales.db")
-    if os.path.exists(target):
-        os.remove(target)
-    conn = sqlite3.connect(target)
+    # Build a fresh file next to the target and swap it in, so readers never see a partial database
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path, isolation_level=None)
+    # Bulk load: no rollback journal or fsyncs (a crash just leaves a temp file behind)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+    conn.execute("PRAGMA cache_size = -65536")
     cursor = conn.cursor()
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS tickets (
-            type TEXT NOT NULL,
-            units INTEGER NOT NULL,
-            price DECIMAL(10,2) NOT NULL
-        )
-    """
-    )
-    cursor.executemany("INSERT INTO tickets VALUES (?, ?, ?)", get_tickets(config["email"]))
-    conn.commit()
+    cursor.execute(TICKETS_TABLE)
+    cursor.execute("BEGIN")
+    for rows in map_shards(mapper, partial(get_tickets_shard, config["email"]), config["scale"]):
+        cursor.executemany("INSERT INTO tickets VALUES (?, ?, ?)", rows)
+    cursor.execute("COMMIT")
     conn.close()
+    swap_in_database(tmp_path, target)
+
+
+GENERATORS = [
+    a2_format_markdown,
+    a3_dates,
+    a4_contacts,
+    a5_logs,
+    a6_docs,
+    a7_email,
+    a8_credit_card_image,
+    a9_comments,
+    a10_ticket_sales,
+]
+
+# Generators whose output is split into shards; the rest are a single small file
+SHARDED = {a3_dates, a4_contacts, a5_logs, a6_docs, a10_ticket_sales}
+
+
+def generate_email(email, root, scale=1, mapper=map):
+    """Write every file for one email; mapper spreads the shards of large files over processes"""
+    config.update({"email": email, "root": root, "scale": scale})
+    os.makedirs(root, exist_ok=True)
+    for generator in GENERATORS:
+        if generator in SHARDED:
+            generator(mapper)
+        else:
+            generator()
+    return email
+
+
+def generate(emails, root, scale=1, workers=1):
+    """Generate the data of every email, under root/<email>/ when there is more than one.
+
+    The output does not depend on workers: with many emails, whole emails run in
+    parallel; with few, the shards of each file do.
+    """
+    roots = [root] if len(emails) == 1 else [os.path.join(root, email) for email in emails]
+    if workers <= 1:
+        for email, email_root in zip(emails, roots):
+            generate_email(email, email_root, scale)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if len(emails) >= workers:
+            list(pool.map(generate_email, emails, roots, [scale] * len(emails)))
+        else:
+            for email, email_root in zip(emails, roots):
+                generate_email(email, email_root, scale, mapper=pool.map)
 
 
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser()
-    parser.add_argument("email")
+    parser.add_argument("email", nargs="+")
     parser.add_argument("--root", default="/data")
+    parser.add_argument("--scale", type=int, default=1, help="multiply the number of dates, contacts, logs, docs and tickets")
+    parser.add_argument("--workers", type=int, default=1, help="processes to generate with (output is identical)")
     args = parser.parse_args()
-    config["email"] = args.email
-    config["root"] = os.path.abspath(args.root)
-
-    os.makedirs(config["root"], exist_ok=True)
+    root = os.path.abspath(args.root)
 
     print("DISCLAIMER: THIS SCRIPT WILL CHANGE BEFORE THE EVALUATION. TREAT THIS AS A GUIDE.")
-    print("Files created at", config["root"])
-
-    a2_format_markdown()
-    a3_dates()
-    a4_contacts()
-    a5_logs()
-    a6_docs()
-    a7_email()
-    a8_credit_card_image()
-    a9_comments()
-    a10_ticket_sales()
+    print("Files created at", root)
+
+    generate(args.email, root, args.scale, args.workers)
 
 # DISCLAIMER: THIS SCRIPT WILL CHANGE BEFORE THE EVALUATION. TREAT THIS AS A GUIDE.
@@ -0,0 +1,105 @@
+import re
+from datetime import date
+
+from lazy import lazy_import
+
+# Only needed for lines in none of the known formats
+parser = lazy_import("dateutil.parser")
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+MONTHS = {m: i for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1
+)}
+
+# Upper bound on memoized date strings, to keep memory flat on huge inputs
+MEMO_LIMIT = 1_000_000
+
+# The formats datagen.get_dates emits, most specific first. Each regex pulls out
+# year, month and day so no strptime call is needed on the fast path.
+KNOWN_FORMATS = [
+    ("%Y-%m-%d", re.compile(r"(?P<y>\d{4})-(?P<m>\d{1,2})-(?P<d>\d{1,2})")),
+    ("%d-%b-%Y", re.compile(r"(?P<d>\d{1,2})-(?P<b>[A-Za-z]{3})-(?P<y>\d{4})")),
+    ("%b %d, %Y", re.compile(r"(?P<b>[A-Za-z]{3}) (?P<d>\d{1,2}), (?P<y>\d{4})")),
+    ("%Y/%m/%d %H:%M:%S", re.compile(r"(?P<y>\d{4})/(?P<m>\d{1,2})/(?P<d>\d{1,2}) \d{1,2}:\d{2}:\d{2}")),
+]
+
+
+def weekday_number(weekday):
+    """Turn a weekday name ("wed", "Wednesday") or number (0 = Monday) into 0-6."""
+    weekday = str(weekday).strip().lower()
+    if weekday.isdigit() and int(weekday) < 7:
+        return int(weekday)
+    for i, name in enumerate(WEEKDAYS):
+        if len(weekday) >= 3 and name.startswith(weekday):
+            return i
+    raise ValueError(f"Unknown weekday: {weekday}")
+
+
+class DateParser:
+    """Parses date strings by trying the known formats before falling back to dateutil.
+
+    Results are memoized per date string and weekdays per (year, month, day), so
+    a file of millions of lines drawn from a few thousand distinct days mostly
+    costs a dict lookup per line. ``stats`` counts how many lines each format answered.
+    """
+
+    def __init__(self, formats=KNOWN_FORMATS):
+        self.formats = list(formats)
+        self.weekdays = {}
+        self.seen = {}  # date string -> (format, weekday)
+        self.stats = {fmt: 0 for fmt, _ in self.formats}
+        self.stats["dateutil"] = 0
+        self.stats["invalid"] = 0
+
+    def weekday(self, date_str):
+        """Return the weekday (0 = Monday) of a date string, or None if it is not a date."""
+        date_str = date_str.strip()
+        if not date_str:
+            return None
+        hit = self.seen.get(date_str)
+        if hit is not None:
+            self.stats[hit[0]] += 1
+            return hit[1]
+        for fmt, pattern in self.formats:
+            match = pattern.fullmatch(date_str)
+            if match is None:
+                continue
+            parts = match.groupdict()
+            month = int(parts["m"]) if "m" in parts else MONTHS.get(parts["b"].lower())
+            key = (int(parts["y"]), month, int(parts["d"]))
+            day = self.weekdays.get(key)
+            if day is None:
+                try:
+                    day = self.weekdays[key] = date(*key).weekday()
+                except (TypeError, ValueError):
+                    break  # Looked like a known format but is not a real date
+            if len(self.seen) < MEMO_LIMIT:
+                self.seen[date_str] = (fmt, day)
+            self.stats[fmt] += 1
+            return day
+
+        try:
+            # Unknown format: let dateutil guess
+            day = parser.parse(date_str).weekday()
+        except (ValueError, OverflowError):
+            self.stats["invalid"] += 1
+            return None
+        self.stats["dateutil"] += 1
+        return day
+
+    def weekday_histogram(self, lines):
+        """Count the dates in an iterable of lines per weekday in a single pass."""
+        counts = [0] * 7
+        weekday = self.weekday
+        for line in lines:
+            day = weekday(line)
+            if day is not None:
+                counts[day] += 1
+        return counts
+
+
+def weekday_histogram(lines):
+    """Weekday counts for an iterable of date lines, keyed by weekday name."""
+    counts = DateParser().weekday_histogram(lines)
+    return dict(zip(WEEKDAYS, counts))
@@ -0,0 +1,85 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Bump when the metadata layout changes so old files are ignored
+META_VERSION = 1
+
+# Below this many changed files a thread pool costs more than it saves
+PARALLEL_THRESHOLD = 32
+
+
+def scan_markdown(docs_dir):
+    """Yield (relative_path, stat) for every .md file under docs_dir using os.scandir."""
+    stack = [docs_dir]
+    while stack:
+        current = stack.pop()
+        with os.scandir(current) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(".md") and entry.is_file():
+                    yield os.path.relpath(entry.path, docs_dir), entry.stat()
+
+
+def first_h1(file_path):
+    """Return the text of the first H1 header in a Markdown file, or None."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("# "):
+                return line[2:].strip()
+    return None
+
+
+def load_meta(meta_path):
+    """Load the per-file metadata written by the previous run, if it is usable."""
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if meta.get("version") != META_VERSION:
+        return {}
+    return meta.get("files", {})
+
+
+def build_index(docs_dir, meta_path, workers=8, full=False):
+    """Update the H1 index of docs_dir, rereading only files that changed.
+
+    A file is reread when its (mtime, size, inode) differs from the metadata of
+    the previous run, stored at meta_path. Returns (index, stats) where index
+    maps relative paths to their first H1 header.
+    """
+    previous = {} if full else load_meta(meta_path)
+    files = {}
+    changed = []
+    for relative_path, st in scan_markdown(docs_dir):
+        signature = {"mtime": st.st_mtime_ns, "size": st.st_size, "inode": st.st_ino}
+        old = previous.get(relative_path)
+        if old is not None and all(old.get(k) == v for k, v in signature.items()):
+            files[relative_path] = old
+        else:
+            files[relative_path] = signature
+            changed.append(relative_path)
+
+    paths = [os.path.join(docs_dir, p) for p in changed]
+    if workers > 1 and len(paths) >= PARALLEL_THRESHOLD:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            titles = list(pool.map(first_h1, paths))
+    else:
+        titles = [first_h1(p) for p in paths]
+    for relative_path, title in zip(changed, titles):
+        files[relative_path]["title"] = title
+
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"version": META_VERSION, "files": files}, f)
+
+    index = {p: files[p]["title"] for p in sorted(files) if files[p].get("title") is not None}
+    stats = {
+        "files": len(files),
+        "rescanned": len(changed),
+        "reused": len(files) - len(changed),
+        "removed": len(set(previous) - set(files)),
+    }
+    return index, stats
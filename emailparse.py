@@ -0,0 +1,96 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import HeaderParser
+from email.utils import getaddresses
+
+# Tiers, cheapest first, reported back so callers can see which one answered
+TIER_HEADERS = "headers"
+TIER_REGEX = "regex"
+TIER_LLM = "llm"
+
+ADDRESS = re.compile(r"[A-Za-z0-9._%+'-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+# A From: header with its folded continuation lines
+FROM_HEADER = re.compile(r"^From:([^\n]*(?:\n[ \t][^\n]*)*)", re.IGNORECASE | re.MULTILINE)
+# The blank line that ends the header block
+HEADER_END = re.compile(r"\r?\n\r?\n")
+
+# Only this much of a message is scanned by the regex tier; headers come first
+HEADER_SCAN_BYTES = 64 * 1024
+
+_header_parser = HeaderParser()
+
+
+def sender_from_headers(content):
+    """Parse the From header with the stdlib parser. Returns an address only when
+    the header holds exactly one well-formed address."""
+    message = _header_parser.parsestr(content, headersonly=True)
+    from_values = message.get_all("From") or []
+    addresses = [addr for _, addr in getaddresses([str(v) for v in from_values]) if addr]
+    if len(addresses) == 1 and ADDRESS.fullmatch(addresses[0]):
+        return addresses[0]
+    return None
+
+
+def header_block(content):
+    """The headers of a message: the text before the first blank line (within HEADER_SCAN_BYTES)."""
+    head = content[:HEADER_SCAN_BYTES]
+    end = HEADER_END.search(head)
+    return head[:end.start()] if end else head
+
+
+def sender_from_regex(content):
+    """Pull the address off the From: header, for messages the header parser rejects.
+
+    Only the header block is searched, so a quoted "From:" in the body never
+    answers; a header naming more than one address is left to the next tier.
+    """
+    addresses = {
+        address.lower(): address
+        for match in FROM_HEADER.finditer(header_block(content))
+        for address in ADDRESS.findall(match.group(1))
+    }
+    return next(iter(addresses.values())) if len(addresses) == 1 else None
+
+
+def extract_sender(content, llm_fallback=None):
+    """Return (sender, tier) using the cheapest tier that gives a confident answer.
+
+    llm_fallback(content) is only called when neither local tier finds an
+    address; without one the result is (None, None).
+    """
+    try:
+        sender = sender_from_headers(content)
+    except Exception:
+        sender = None
+    if sender:
+        return sender, TIER_HEADERS
+    sender = sender_from_regex(content)
+    if sender:
+        return sender, TIER_REGEX
+    if llm_fallback is not None:
+        return llm_fallback(content) or None, TIER_LLM
+    return None, None
+
+
+def extract_senders(directory, llm_fallback=None, workers=8, extensions=(".eml", ".txt")):
+    """Extract senders for every message file in a directory, in parallel.
+
+    Returns {file name: {"sender": ..., "tier": ...}}; unreadable files get an
+    "error" entry instead.
+    """
+    names = sorted(
+        entry.name for entry in os.scandir(directory)
+        if entry.is_file() and entry.name.lower().endswith(extensions)
+    )
+
+    def extract(name):
+        try:
+            with open(os.path.join(directory, name), "r", encoding="utf-8", errors="replace") as f:
+                sender, tier = extract_sender(f.read(), llm_fallback)
+            return {"sender": sender, "tier": tier}
+        except Exception as e:
+            return {"error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(names, pool.map(extract, names)))
@@ -0,0 +1,172 @@
+import glob
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from lazy import lazy_import
+
+Image = lazy_import("PIL.Image")
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+
+# Records the source hash and settings behind every output, so unchanged sources are skipped
+MANIFEST_NAME = ".resize-manifest.json"
+
+DEFAULT_TEMPLATE = "{stem}-{width}x{height}.jpg"
+
+# Part of every manifest entry's settings; bump it when resize_one's output changes
+RESIZE_VERSION = 2
+
+
+def parse_sizes(text):
+    """"800x800,200x200" -> [(800, 800), (200, 200)]; raises ValueError."""
+    sizes = []
+    for part in text.split(","):
+        width, _, height = part.strip().lower().partition("x")
+        size = (int(width), int(height or width))
+        if min(size) <= 0:
+            raise ValueError(f"Invalid size: {part}")
+        sizes.append(size)
+    if not sizes:
+        raise ValueError("No sizes given.")
+    return sizes
+
+
+def find_images(pattern):
+    """Image files matching a directory (its direct children) or a glob pattern, sorted."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*")
+    return sorted(
+        path for path in glob.glob(pattern)
+        if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def output_names(src, sizes, template):
+    """File names resize_one writes for src, one per size."""
+    stem = os.path.splitext(os.path.basename(src))[0]
+    return [template.format(stem=stem, width=width, height=height) for width, height in sizes]
+
+
+def check_collisions(sources, sizes, template):
+    """Raise ValueError if two sources would write the same output file (e.g. x.jpg and x.png)."""
+    owners = {}
+    for src in sources:
+        for name in output_names(src, sizes, template):
+            owner = owners.setdefault(name, src)
+            if owner != src:
+                raise ValueError(f"{owner} and {src} would both be written to {name}; resize them separately.")
+
+
+def resize_one(src, dest_dir, sizes, quality, template, previous):
+    """Resize one image to every size; runs in a pool worker.
+
+    previous is the manifest entry of the last run, if any: when the source
+    hash and settings match and the outputs still exist, nothing is decoded.
+    Returns the new manifest entry plus "status", "bytes_in" and "bytes_out".
+    """
+    with open(src, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    settings = {"sizes": [list(s) for s in sizes], "quality": quality, "template": template, "version": RESIZE_VERSION}
+    if previous and previous.get("sha256") == digest and previous.get("settings") == settings \
+            and all(os.path.exists(os.path.join(dest_dir, name)) for name in previous.get("outputs", [])):
+        return {**previous, "status": "skipped", "bytes_in": 0, "bytes_out": 0}
+
+    outputs, bytes_out = [], 0
+    with Image.open(io.BytesIO(data)) as img:
+        # JPEG draft mode decodes straight to the smallest DCT scale (1/2, 1/4, 1/8)
+        # that still covers the widest and the tallest target box
+        img.draft("RGB", (max(w for w, _ in sizes), max(h for _, h in sizes)))
+        decoded = img.convert("RGB") if img.mode not in ("RGB", "L") else img.copy()
+        named = zip(sizes, output_names(src, sizes, template))
+        ordered = sorted(named, key=lambda item: item[0][0] * item[0][1], reverse=True)
+        current = box = None
+        for (width, height), name in ordered:
+            # A size whose box fits inside the previous box is made from the previous
+            # (smaller) result; any other one from the decoded image
+            source = current if box and width <= box[0] and height <= box[1] else decoded
+            current, box = source.copy(), (width, height)
+            current.thumbnail((width, height), Image.LANCZOS)
+            path = os.path.join(dest_dir, name)
+            tmp_path = f"{path}.tmp"
+            current.save(tmp_path, "JPEG", quality=quality, optimize=True)
+            os.replace(tmp_path, path)
+            bytes_out += os.path.getsize(path)
+            outputs.append(name)
+    return {
+        "sha256": digest, "settings": settings, "outputs": outputs,
+        "status": "resized", "bytes_in": len(data), "bytes_out": bytes_out,
+    }
+
+
+def _load_manifest(dest_dir):
+    try:
+        with open(os.path.join(dest_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(dest_dir, manifest):
+    path = os.path.join(dest_dir, MANIFEST_NAME)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(f"{path}.tmp", path)
+
+
+def resize_images(sources, dest_dir, sizes, quality=75, template=DEFAULT_TEMPLATE, workers=None):
+    """Resize images on a process pool; returns per-image results and throughput stats.
+
+    Raises ValueError, before writing anything, when two sources map to the same output name.
+    """
+    check_collisions(sources, sizes, template)
+    os.makedirs(dest_dir, exist_ok=True)
+    manifest = _load_manifest(dest_dir)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(sources) or 1))
+
+    started = time.perf_counter()
+    results = {}
+    if workers == 1:
+        for src in sources:
+            try:
+                results[src] = resize_one(src, dest_dir, sizes, quality, template, manifest.get(src))
+            except Exception as e:
+                results[src] = {"status": "failed", "error": str(e)}
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                src: pool.submit(resize_one, src, dest_dir, sizes, quality, template, manifest.get(src))
+                for src in sources
+            }
+            for src, future in futures.items():
+                try:
+                    results[src] = future.result()
+                except Exception as e:
+                    results[src] = {"status": "failed", "error": str(e)}
+    seconds = time.perf_counter() - started
+
+    for src, result in results.items():
+        if result["status"] != "failed":
+            manifest[src] = {k: result[k] for k in ("sha256", "settings", "outputs")}
+    _save_manifest(dest_dir, manifest)
+
+    counts = {"resized": 0, "skipped": 0, "failed": 0}
+    for result in results.values():
+        counts[result["status"]] += 1
+    bytes_in = sum(r.get("bytes_in", 0) for r in results.values())
+    bytes_out = sum(r.get("bytes_out", 0) for r in results.values())
+    stats = {
+        "images": len(sources),
+        **counts,
+        "bytes_in": bytes_in,
+        "bytes_out": bytes_out,
+        "bytes_saved": bytes_in - bytes_out,
+        "workers": workers,
+        "seconds": round(seconds, 4),
+        "images_per_second": round(counts["resized"] / seconds, 2) if seconds > 0 else None,
+    }
+    return results, stats
@@ -0,0 +1,420 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from contextvars import copy_context
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import requests
+from urllib3.util.retry import Retry
+
+import asyncfetch
+from contactsort import SortError, iter_json_array
+from urlguard import GuardedAdapter, GuardedSession
+
+# Page results
+FETCHED = "fetched"
+NOT_MODIFIED = "not_modified"
+
+FORMATS = ("json", "ndjson")
+
+COPY_CHUNK = 1024 * 1024
+
+
+class IngestError(Exception):
+    """Raised when a response cannot be assembled into the requested output (or, async, fetched)."""
+
+
+def with_page(url, param, number):
+    """url with its page query parameter set to number."""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != param]
+    query.append((param, str(number)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def page_number(url, param):
+    """The page query parameter of url as an int, or None."""
+    for key, value in parse_qsl(urlsplit(url).query):
+        if key == param:
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+def _array_span(path):
+    """Byte offsets of the inside of a JSON array file (between [ and ]), or None if it is not an array."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(COPY_CHUNK)
+        stripped = head.lstrip()
+        if stripped[:1] != b"[":
+            return None
+        start = len(head) - len(stripped) + 1
+        tail_start = max(0, size - COPY_CHUNK)
+        f.seek(tail_start)
+        tail = f.read().rstrip()
+    if tail[-1:] != b"]":
+        return None
+    return start, tail_start + len(tail) - 1
+
+
+def _copy_range(src, dest, start, end):
+    src.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = src.read(min(COPY_CHUNK, remaining))
+        if not chunk:
+            break
+        dest.write(chunk)
+        remaining -= len(chunk)
+
+
+class Ingester:
+    """Downloads (paginated) JSON APIs to disk without holding them in memory.
+
+    - Bodies are streamed in chunks to an on-disk page cache, never parsed
+      into one Python object.
+    - Each page's ETag / Last-Modified is kept with its body; the next run
+      sends If-None-Match / If-Modified-Since and a 304 reuses the cached body.
+      When every page is unchanged the output file is left alone.
+    - Pages are discovered from Link headers (rel="next" / rel="last") or an
+      X-Total-Pages header. When the last page number is known the remaining
+      pages are fetched concurrently, otherwise rel="next" is followed.
+    - With a UrlGuard, every request is checked against its host allowlist and
+      refused for internal addresses: the first URL, every page URL taken from
+      Link headers, and every redirect.
+    - aingest() does the same on an asyncio event loop through httpx, for the
+      ASGI server.
+    """
+
+    def __init__(self, cache_dir=None, workers=8, timeout=(5, 60), retries=2, backoff=0.5,
+                 page_param="page", max_pages=10000, http_timer=None, guard=None):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.timeout = timeout
+        self.page_param = page_param
+        self.max_pages = max_pages
+        self.retries = retries
+        self.backoff = backoff
+        self.http_timer = http_timer or nullcontext  # Context manager wrapped around each GET, given the URL
+        self.guard = guard
+        self.session = GuardedSession(guard)
+        self.async_client = None  # Created on first aingest(), on the event loop that uses it
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504))
+        adapter = GuardedAdapter(guard, pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.lock = threading.Lock()
+        self.stats = {"runs": 0, "pages": 0, FETCHED: 0, NOT_MODIFIED: 0, "bytes": 0, "written": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _key(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _paths(self, cache_dir, url):
+        key = self._key(url)
+        base = os.path.join(cache_dir, key[:2], key)
+        return f"{base}.json", f"{base}.body"
+
+    @staticmethod
+    def _read_json(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_json(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)  # Readers never see a half-written entry
+
+    def _conditional(self, url, cache_dir):
+        """(meta path, body path, cache entry or None, conditional request headers) for a page."""
+        meta_path, body_path = self._paths(cache_dir, url)
+        cached = self._read_json(meta_path) if os.path.exists(body_path) else None
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        return meta_path, body_path, cached, headers
+
+    def _fetched(self, url, meta_path, body_path, response, size):
+        """Record a downloaded page's validators and pagination links; returns its page entry."""
+        links = response.links
+        total_pages = response.headers.get("X-Total-Pages", "")
+        entry = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "next": urljoin(url, links["next"]["url"]) if "next" in links else None,
+            "last": urljoin(url, links["last"]["url"]) if "last" in links else None,
+            "total_pages": int(total_pages) if total_pages.isdigit() else None,
+        }
+        self._write_json(meta_path, entry)
+        return {**entry, "url": url, "status": FETCHED, "body": body_path, "bytes": size}
+
+    def fetch_page(self, url, cache_dir):
+        """Download one page into cache_dir; returns its cache entry plus "url", "status", "body" and "bytes"."""
+        meta_path, body_path, cached, headers = self._conditional(url, cache_dir)
+        with self.http_timer(url):
+            with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                if response.status_code == 304 and cached:
+                    return {**cached, "url": url, "status": NOT_MODIFIED, "body": body_path, "bytes": 0}
+                response.raise_for_status()
+                os.makedirs(os.path.dirname(body_path), exist_ok=True)
+                tmp_path = f"{body_path}.{threading.get_ident()}.tmp"
+                size = 0
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(COPY_CHUNK):
+                        f.write(chunk)
+                        size += len(chunk)
+                os.replace(tmp_path, body_path)
+        return self._fetched(url, meta_path, body_path, response, size)
+
+    def _remaining_pages(self, first, page_param):
+        """URLs of every page after the first when the page count is known, else None."""
+        if not first["next"]:
+            return []
+        start = page_number(first["next"], page_param)
+        last = page_number(first["last"], page_param) if first["last"] else first["total_pages"]
+        if start is None or last is None:
+            return None
+        return [with_page(first["next"], page_param, n) for n in range(start, min(last, start + self.max_pages - 2) + 1)]
+
+    def fetch_pages(self, url, cache_dir, page_param=None):
+        """Every page of a paginated response, in order."""
+        page_param = page_param or self.page_param
+        first = self.fetch_page(url, cache_dir)
+        pages = [first]
+        remaining = self._remaining_pages(first, page_param)
+        if remaining:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(remaining)))) as pool:
+                # Each page is fetched in a copy of the caller's context, so http_timer sees the caller's state
+                futures = [pool.submit(copy_context().run, self.fetch_page, u, cache_dir) for u in remaining]
+                pages.extend(future.result() for future in futures)
+        elif remaining is None:
+            seen = {url}
+            while pages[-1]["next"] and pages[-1]["next"] not in seen and len(pages) < self.max_pages:
+                seen.add(pages[-1]["next"])
+                pages.append(self.fetch_page(pages[-1]["next"], cache_dir))
+        return pages
+
+    def _async_client(self):
+        if self.async_client is None:
+            self.async_client = asyncfetch.async_client(self.guard, self.workers, self.timeout, self.retries)
+        return self.async_client
+
+    async def afetch_page(self, url, cache_dir):
+        """fetch_page() on the event loop through httpx; transport errors raise IngestError."""
+        meta_path, body_path, cached, headers = self._conditional(url, cache_dir)
+        try:
+            with self.http_timer(url):
+                response = await asyncfetch.send(
+                    self._async_client(), url, headers, self.retries, self.backoff, stream=True,
+                )
+                try:
+                    if response.status_code == 304 and cached:
+                        return {**cached, "url": url, "status": NOT_MODIFIED, "body": body_path, "bytes": 0}
+                    response.raise_for_status()
+                    os.makedirs(os.path.dirname(body_path), exist_ok=True)
+                    tmp_path = f"{body_path}.{id(response)}.tmp"
+                    size = 0
+                    with open(tmp_path, "wb") as f:
+                        async for chunk in response.aiter_bytes(COPY_CHUNK):
+                            f.write(chunk)  # Page-cache writes of one chunk; not worth a thread hop
+                            size += len(chunk)
+                    os.replace(tmp_path, body_path)
+                finally:
+                    await response.aclose()
+        except asyncfetch.httpx.HTTPError as e:
+            raise IngestError(f"Cannot fetch {url}: {e}") from None
+        return self._fetched(url, meta_path, body_path, response, size)
+
+    async def afetch_pages(self, url, cache_dir, page_param=None):
+        """fetch_pages() on the event loop, at most workers pages at a time."""
+        page_param = page_param or self.page_param
+        first = await self.afetch_page(url, cache_dir)
+        pages = [first]
+        remaining = self._remaining_pages(first, page_param)
+        if remaining:
+            slots = asyncio.Semaphore(max(1, self.workers))
+
+            async def fetch(page_url):
+                async with slots:
+                    return await self.afetch_page(page_url, cache_dir)
+
+            pages.extend(await asyncio.gather(*map(fetch, remaining)))
+        elif remaining is None:
+            seen = {url}
+            while pages[-1]["next"] and pages[-1]["next"] not in seen and len(pages) < self.max_pages:
+                seen.add(pages[-1]["next"])
+                pages.append(await self.afetch_page(pages[-1]["next"], cache_dir))
+        return pages
+
+    def ingest(self, url, output_path, fmt="json", items_key=None, page_param=None):
+        """Download url (and its further pages) into output_path; returns stats.
+
+        fmt "json" writes a single-page response as received, and the pages of a
+        paginated one as one JSON array. fmt "ndjson" writes one item per line.
+        items_key names the list inside object pages, e.g. "entries".
+        """
+        if fmt not in FORMATS:
+            raise IngestError(f"Unknown format: {fmt}")
+        started = time.perf_counter()
+        cache_dir = self.cache_dir or tempfile.mkdtemp(prefix="ingest-")
+        try:
+            pages = self.fetch_pages(url, cache_dir, page_param)
+            return self._assemble(pages, cache_dir, output_path, fmt, items_key, started)
+        finally:
+            if not self.cache_dir:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+
+    async def aingest(self, url, output_path, fmt="json", items_key=None, page_param=None):
+        """ingest() with the downloads on the event loop (needs httpx); the output is assembled on a thread."""
+        if fmt not in FORMATS:
+            raise IngestError(f"Unknown format: {fmt}")
+        started = time.perf_counter()
+        cache_dir = self.cache_dir or tempfile.mkdtemp(prefix="ingest-")
+        try:
+            pages = await self.afetch_pages(url, cache_dir, page_param)
+            return await asyncio.to_thread(self._assemble, pages, cache_dir, output_path, fmt, items_key, started)
+        finally:
+            if not self.cache_dir:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def _assemble(self, pages, cache_dir, output_path, fmt, items_key, started):
+        """Write the output from the fetched pages unless nothing changed; returns the run stats."""
+        run = {"pages": len(pages), FETCHED: 0, NOT_MODIFIED: 0, "bytes": 0}
+        for page in pages:
+            run[page["status"]] += 1
+            run["bytes"] += page["bytes"]
+
+        # Pages, settings and the output file as last written; when all match nothing is rewritten
+        signature = {
+            "pages": [[p["url"], p["etag"], p["last_modified"]] for p in pages],
+            "format": fmt,
+            "items_key": items_key,
+        }
+        state_path = os.path.join(cache_dir, "outputs", f"{self._key(os.path.abspath(output_path))}.json")
+        state = self._read_json(state_path) if self.cache_dir else None
+        unchanged = (
+            run[FETCHED] == 0 and state is not None and state.get("signature") == signature
+            and state.get("output") == self._file_state(output_path)
+        )
+        items = state.get("items") if unchanged else self._write_output(pages, output_path, fmt, items_key)
+        if not unchanged and self.cache_dir:
+            self._write_json(state_path, {
+                "signature": signature, "output": self._file_state(output_path), "items": items,
+            })
+
+        with self.lock:
+            self.stats["runs"] += 1
+            for name, value in run.items():
+                self.stats[name] += value
+            self.stats["written"] += not unchanged
+        run["written"] = not unchanged
+        run["items"] = items
+        run["seconds"] = round(time.perf_counter() - started, 4)
+        return run
+
+    @staticmethod
+    def _file_state(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+
+    def _write_output(self, pages, output_path, fmt, items_key):
+        """Assemble the page bodies into output_path; returns the item count when it was counted."""
+        tmp_path = f"{output_path}.tmp"
+        try:
+            if fmt == "ndjson":
+                count = 0
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    for page in pages:
+                        for item in self._page_items(page["body"], items_key):
+                            f.write(json.dumps(item) + "\n")
+                            count += 1
+            elif len(pages) == 1 and not items_key:
+                count = None
+                shutil.copyfile(pages[0]["body"], tmp_path)
+            elif items_key:
+                count = 0
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write("[")
+                    for page in pages:
+                        for item in self._page_items(page["body"], items_key):
+                            f.write(("," if count else "") + json.dumps(item))
+                            count += 1
+                    f.write("]")
+            else:
+                # Array pages are spliced together byte for byte, without parsing them
+                count = None
+                with open(tmp_path, "wb") as f:
+                    f.write(b"[")
+                    empty = True
+                    for page in pages:
+                        span = _array_span(page["body"])
+                        if span is None:
+                            raise IngestError(f"Page is not a JSON array (pass items_key): {page['url']}")
+                        with open(page["body"], "rb") as src:
+                            src.seek(span[0])
+                            if not src.read(min(COPY_CHUNK, span[1] - span[0])).strip():
+                                continue  # Empty page
+                            if not empty:
+                                f.write(b",")
+                            _copy_range(src, f, *span)
+                        empty = False
+                    f.write(b"]")
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return count
+
+    @staticmethod
+    def _page_items(path, items_key):
+        """Items of one page body: the elements of an array (streamed), or of the object's items_key list."""
+        try:
+            with open(path, "rb") as f:
+                start = f.read(COPY_CHUNK).lstrip()[:1]
+            if start == b"[":
+                yield from iter_json_array(path)
+                return
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (SortError, ValueError) as e:
+            raise IngestError(f"Invalid JSON response: {e}") from None
+        if items_key is None:
+            yield data  # A single object is one item
+            return
+        items = data.get(items_key) if isinstance(data, dict) else None
+        if not isinstance(items, list):
+            raise IngestError(f"Response has no list under {items_key!r}.")
+        yield from items
+
+    def close(self):
+        self.session.close()
+
+    async def aclose(self):
+        client, self.async_client = self.async_client, None
+        if client is not None:
+            await client.aclose()
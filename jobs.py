@@ -0,0 +1,186 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when a lane's queue has no room for another job."""
+
+
+class Job:
+    """A single task submission tracked by the job queue."""
+
+    def __init__(self, task_name, args, lane):
+        self.id = uuid.uuid4().hex
+        self.task_name = task_name
+        self.args = args
+        self.lane = lane
+        self.status = QUEUED
+        self.status_code = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        data = {
+            "id": self.id,
+            "task": self.task_name,
+            "lane": self.lane,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.started_at is not None:
+            data["queued_seconds"] = round(self.started_at - self.submitted_at, 6)
+        if self.finished_at is not None:
+            data["run_seconds"] = round(self.finished_at - self.started_at, 6)
+            data["status_code"] = self.status_code
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class JobQueue:
+    """Bounded in-process job queue with one worker pool per lane.
+
+    Each lane has its own queue and its own workers, so slow tasks (LLM calls,
+    subprocesses) queued on the "slow" lane never hold up the cheap file and
+    SQLite tasks on the "fast" lane. ``runner(task_name, args)`` does the
+    actual work and must return a ``(payload, status_code)`` tuple. With
+    ``executor="process"`` the runner is shipped to a process pool, so it has
+    to be a picklable module-level function.
+    """
+
+    def __init__(self, runner, lanes, queue_size=100, executor="thread", history=1000):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor type: {executor}")
+        self.runner = runner
+        self.executor = executor
+        self.lanes = dict(lanes)  # lane name -> worker count
+        self.queues = {lane: queue.Queue(maxsize=queue_size) for lane in self.lanes}
+        self.jobs = OrderedDict()
+        self.history = history
+        self.lock = threading.Lock()
+        self.completed = deque(maxlen=10000)  # (finished_at, run_seconds) of recent jobs
+        self.counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        self.pool = None
+        if executor == "process":
+            self.pool = ProcessPoolExecutor(max_workers=sum(self.lanes.values()))
+        self.threads = []
+        for lane, workers in self.lanes.items():
+            for i in range(workers):
+                t = threading.Thread(target=self._worker, args=(lane,), name=f"job-{lane}-{i}", daemon=True)
+                t.start()
+                self.threads.append(t)
+
+    def submit(self, task_name, args, lane):
+        """Queue a task and return its Job without waiting for it to run."""
+        if lane not in self.queues:
+            raise ValueError(f"Unknown lane: {lane}")
+        job = Job(task_name, args, lane)
+        with self.lock:
+            self.jobs[job.id] = job
+            self.counts[QUEUED] += 1
+            self._trim_history()
+        try:
+            self.queues[lane].put_nowait(job)
+        except queue.Full:
+            with self.lock:
+                del self.jobs[job.id]
+                self.counts[QUEUED] -= 1
+            raise QueueFullError(f"The '{lane}' job queue is full.")
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def stats(self):
+        """Queue depth per lane plus job counts and recent throughput."""
+        now = time.time()
+        with self.lock:
+            recent = [run for finished, run in self.completed if now - finished <= 60]
+            counts = dict(self.counts)
+        return {
+            "executor": self.executor,
+            "lanes": {
+                lane: {"workers": workers, "queue_depth": self.queues[lane].qsize()}
+                for lane, workers in self.lanes.items()
+            },
+            "jobs": counts,
+            "throughput_per_second": round(len(recent) / 60.0, 3),
+            "avg_run_seconds": round(sum(recent) / len(recent), 6) if recent else None,
+        }
+
+    def shutdown(self, wait=True):
+        """Stop the workers once the queued jobs have drained."""
+        for lane, workers in self.lanes.items():
+            for _ in range(workers):
+                self.queues[lane].put(None)
+        if wait:
+            for t in self.threads:
+                t.join()
+        if self.pool is not None:
+            self.pool.shutdown(wait=wait)
+
+    def _trim_history(self):
+        # Drop the oldest finished jobs once we keep more than `history` records
+        while len(self.jobs) > self.history:
+            oldest_id, oldest = next(iter(self.jobs.items()))
+            if oldest.status in (QUEUED, RUNNING):
+                break
+            del self.jobs[oldest_id]
+
+    def _worker(self, lane):
+        q = self.queues[lane]
+        while True:
+            job = q.get()
+            if job is None:
+                q.task_done()
+                return
+            with self.lock:
+                job.status = RUNNING
+                job.started_at = time.time()
+                self.counts[QUEUED] -= 1
+                self.counts[RUNNING] += 1
+            try:
+                if self.pool is not None:
+                    payload, status_code = self.pool.submit(self.runner, job.task_name, job.args).result()
+                else:
+                    payload, status_code = self.runner(job.task_name, job.args)
+                job.result = payload
+                job.status_code = status_code
+                final = DONE if status_code < 400 else FAILED
+            except Exception as e:
+                job.error = str(e)
+                job.status_code = 500
+                final = FAILED
+            with self.lock:
+                job.finished_at = time.time()
+                job.status = final
+                self.counts[RUNNING] -= 1
+                self.counts[final] += 1
+                self.completed.append((job.finished_at, job.finished_at - job.started_at))
+            q.task_done()
+
+
+def env_int(name, default):
+    """Read an integer setting from the environment."""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
@@ -0,0 +1,63 @@
+import importlib
+import threading
+
+# Every module handed out by lazy_import, by name, so warm_up can preload them
+_registry = {}
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """Stands in for a module until one of its attributes is first used.
+
+    Heavy dependencies that only one task needs (pandas, PIL, bs4, ...) are
+    imported by that task's first call instead of at startup.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """Return a lazily loaded module; the same proxy is shared by every caller."""
+    with _lock:
+        module = _registry.get(name)
+        if module is None:
+            module = _registry[name] = LazyModule(name)
+        return module
+
+
+def warm_up(names=None):
+    """Import lazily registered modules now, e.g. before forking server workers.
+
+    Returns the names that were imported; modules that fail to import are skipped.
+    """
+    with _lock:
+        modules = [m for n, m in _registry.items() if names is None or n in names]
+    loaded = []
+    for module in modules:
+        try:
+            module._load()
+            loaded.append(module._name)
+        except ImportError:
+            continue
+    return loaded
+
+
+def loaded_modules():
+    """Names of registered modules that have actually been imported."""
+    with _lock:
+        return sorted(n for n, m in _registry.items() if m._module is not None)
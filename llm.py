@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import threading
+from contextlib import nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_API_URL = "https://aiproxy.sanand.workers.dev/openai/v1/chat/completions"
+
+
+class LLMError(Exception):
+    """Raised when the AI Proxy cannot be reached or returns an unusable response."""
+
+
+class LLMClient:
+    """Chat completion client for the AI Proxy.
+
+    - One pooled requests.Session with retries and exponential backoff on
+      connection errors, 429 and 5xx responses, and connect/read timeouts.
+    - A disk cache keyed on a hash of the full payload (model, messages and
+      options), so an identical prompt is only ever paid for once.
+    - Request coalescing: concurrent callers with the same payload share the
+      one in-flight request instead of each sending their own.
+    """
+
+    def __init__(self, api_url=None, cache_dir=None, timeout=(5, 60), retries=3, backoff=0.5, pool_size=10,
+                 http_timer=None):
+        self.api_url = api_url or os.environ.get("AIPROXY_URL", DEFAULT_API_URL)
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.http_timer = http_timer or nullcontext  # Context manager wrapped around each POST, given the URL
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=None,  # Chat completions are POSTs; retry them too
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "errors": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def cache_key(payload):
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _cache_get(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _cache_put(self, key, data):
+        if not self.cache_dir:
+            return
+        path = self._cache_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)  # Readers never see a half-written entry
+
+    def _post(self, payload):
+        token = os.environ.get("AIPROXY_TOKEN")
+        if not token:
+            raise LLMError("AI Proxy token is missing.")
+        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+        with self.lock:
+            self.stats["requests"] += 1
+        try:
+            with self.http_timer(self.api_url):
+                response = self.session.post(self.api_url, json=payload, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            with self.lock:
+                self.stats["errors"] += 1
+            raise LLMError(str(e)) from e
+
+    def complete(self, payload):
+        """Return the JSON response for a chat completion payload, from cache when possible."""
+        key = self.cache_key(payload)
+        cached = self._cache_get(key)
+        if cached is not None:
+            with self.lock:
+                self.stats["cache_hits"] += 1
+            return cached
+
+        with self.lock:
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            # Another caller may have finished the same request since the first lookup
+            data = self._cache_get(key)
+            if data is None:
+                data = self._post(payload)
+                if data.get("choices"):
+                    self._cache_put(key, data)
+            future.set_result(data)
+            return data
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+
+    def chat(self, system, user, model="gpt-4o-mini", max_tokens=50):
+        """Send a system + user prompt and return the reply text."""
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            "max_tokens": max_tokens,
+        }
+        data = self.complete(payload)
+        return data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
+
+    def chat_many(self, system, users, model="gpt-4o-mini", max_tokens=50, workers=8):
+        """Run one prompt over many inputs concurrently; duplicate inputs cost one call."""
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda user: self.chat(system, user, model, max_tokens), users))
@@ -0,0 +1,37 @@
+import fnmatch
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+def most_recent_files(directory, k=10, pattern="*.log"):
+    """Return the names of the k most recently modified files matching pattern, newest first.
+
+    One os.scandir pass stats each file once and heapq keeps only k candidates,
+    so the cost stays O(n log k) however many rotated files the directory holds.
+    """
+    def candidates():
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if fnmatch.fnmatch(entry.name, pattern) and entry.is_file():
+                    yield entry.stat().st_mtime, entry.name
+
+    return [name for _, name in heapq.nlargest(k, candidates())]
+
+
+def read_first_line(path):
+    """Read the first line of a file, or describe why it could not be read."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.readline().strip()
+    except Exception as e:
+        return f"Error reading file ({str(e)})"
+
+
+def first_lines(directory, names, workers=8):
+    """Read the first line of each named file concurrently, keeping the input order."""
+    paths = [os.path.join(directory, name) for name in names]
+    if workers <= 1 or len(paths) <= 1:
+        return [read_first_line(p) for p in paths]
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        return list(pool.map(read_first_line, paths))
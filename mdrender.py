@@ -0,0 +1,195 @@
+import hashlib
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from lazy import lazy_import
+
+markdown = lazy_import("markdown")
+
+MARKDOWN_EXTENSIONS = (".md", ".markdown")
+
+# Trees with fewer pages to render than this are rendered in-process
+PARALLEL_MIN_FILES = 16
+
+_worker_md = None
+
+
+def _start_worker(extensions):
+    """Process pool initializer: one configured Markdown instance per worker."""
+    global _worker_md
+    _worker_md = markdown.Markdown(extensions=list(extensions))
+
+
+def _render_in_worker(texts):
+    return [_worker_md.reset().convert(text) for text in texts]
+
+
+class MarkdownRenderer:
+    """Markdown to HTML with reused Markdown instances and a content-hash cache.
+
+    Building a Markdown instance (and loading its extensions) costs more than
+    converting a typical page, so instances are kept in a pool and reset()
+    between documents. Rendered HTML is cached by a sha256 of the source (and
+    the extension list) in memory, and on disk when cache_dir is given, so a
+    rebuild only renders the pages that changed.
+    """
+
+    def __init__(self, extensions=(), pool_size=4, cache_dir=None, memory_entries=1024, workers=None):
+        self.extensions = tuple(extensions)
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self.workers = workers or os.cpu_count() or 1
+        self.instances = queue.LifoQueue()
+        self.pool_size = pool_size
+        self.created = 0
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"renders": 0, "memory_hits": 0, "disk_hits": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _acquire(self):
+        try:
+            return self.instances.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            create = self.created < self.pool_size
+            if create:
+                self.created += 1
+        if create:
+            return markdown.Markdown(extensions=list(self.extensions))
+        return self.instances.get()  # Wait for one to come back
+
+    def key(self, text):
+        digest = hashlib.sha256(text.encode("utf-8"))
+        digest.update(repr(self.extensions).encode())
+        return digest.hexdigest()
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.html")
+
+    def cached(self, key):
+        with self.lock:
+            html = self.memory.get(key)
+            if html is not None:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return html
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(key), "r", encoding="utf-8") as f:
+                html = f.read()
+        except OSError:
+            return None
+        with self.lock:
+            self.stats["disk_hits"] += 1
+        self._remember(key, html, persist=False)
+        return html
+
+    def _remember(self, key, html, persist=True):
+        with self.lock:
+            self.memory[key] = html
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+        if persist and self.cache_dir:
+            path = self._cache_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(html)
+            os.replace(tmp_path, path)  # Readers never see a half-written entry
+
+    def render(self, text):
+        """HTML for one Markdown document."""
+        key = self.key(text)
+        html = self.cached(key)
+        if html is not None:
+            return html
+        md = self._acquire()
+        try:
+            html = md.reset().convert(text)
+        finally:
+            self.instances.put(md)
+        with self.lock:
+            self.stats["renders"] += 1
+        self._remember(key, html)
+        return html
+
+    def render_tree(self, src_dir, out_dir):
+        """Render every Markdown file under src_dir to the same relative path (.html) under out_dir.
+
+        Only pages missing from the cache are rendered, on a process pool when
+        there are many of them; outputs whose HTML is unchanged are not rewritten.
+        """
+        started = time.perf_counter()
+        pages = []  # (source path, output path, text, key)
+        for root, dirs, files in os.walk(src_dir):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(MARKDOWN_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    with open(path, "r", encoding="utf-8") as f:
+                        text = f.read()
+                    rel = os.path.splitext(os.path.relpath(path, src_dir))[0] + ".html"
+                    pages.append((path, os.path.join(out_dir, rel), text, self.key(text)))
+
+        html_by_key = {}
+        missing = {}
+        for _, _, text, key in pages:
+            if key in html_by_key or key in missing:
+                continue
+            html = self.cached(key)
+            if html is None:
+                missing[key] = text
+            else:
+                html_by_key[key] = html
+
+        keys = list(missing)
+        if len(keys) >= PARALLEL_MIN_FILES and self.workers > 1:
+            chunk = max(1, -(-len(keys) // (self.workers * 4)))
+            groups = [keys[i:i + chunk] for i in range(0, len(keys), chunk)]
+            with ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_start_worker, initargs=(self.extensions,),
+            ) as pool:
+                for group, htmls in zip(groups, pool.map(_render_in_worker, [[missing[k] for k in g] for g in groups])):
+                    html_by_key.update(zip(group, htmls))
+        else:
+            for key in keys:
+                md = self._acquire()
+                try:
+                    html_by_key[key] = md.reset().convert(missing[key])
+                finally:
+                    self.instances.put(md)
+        for key in keys:
+            self._remember(key, html_by_key[key])
+        with self.lock:
+            self.stats["renders"] += len(keys)
+
+        written = 0
+        for _, out_path, _, key in pages:
+            html = html_by_key[key]
+            try:
+                with open(out_path, "r", encoding="utf-8") as f:
+                    if f.read() == html:
+                        continue  # Leave unchanged pages (and their mtimes) alone
+            except OSError:
+                pass
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            with open(out_path, "w", encoding="utf-8") as f:
+                f.write(html)
+            written += 1
+
+        return {
+            "pages": len(pages),
+            "rendered": len(keys),
+            "cached": len(pages) - len(keys),
+            "written": written,
+            "seconds": round(time.perf_counter() - started, 4),
+        }
@@ -0,0 +1,226 @@
+import math
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+
+# Upper bounds (seconds) of the latency histogram buckets
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf)
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def peak_rss():
+    """Peak resident set size of the process so far, in bytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT
+
+
+def thread_io():
+    """(bytes read, bytes written) by the calling thread's syscalls, or None off Linux."""
+    try:
+        with open("/proc/thread-self/io", "rb") as f:
+            fields = dict(line.split(b":", 1) for line in f.read().splitlines())
+        return int(fields[b"rchar"]), int(fields[b"wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """(le label, cumulative count) per bucket"""
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield ("+Inf" if bound == math.inf else repr(float(bound))), total
+
+
+class Span:
+    """Resource usage of one task run or endpoint call, measured on the calling thread.
+
+    CPU time and I/O bytes are per thread, so concurrent requests don't pollute
+    each other; work a task hands to a helper pool only shows up in its wall time,
+    except outbound HTTP time (see Metrics.http).
+    """
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.status = None
+        self.http_seconds = 0.0
+        self.children = []
+        self.started = time.perf_counter()
+        self.cpu_started = time.thread_time()
+        self.io_started = thread_io()
+        self.rss_started = peak_rss()
+
+    def stop(self):
+        self.wall_seconds = time.perf_counter() - self.started
+        self.cpu_seconds = time.thread_time() - self.cpu_started
+        io = thread_io()
+        if io is None or self.io_started is None:
+            self.read_bytes = self.written_bytes = 0
+        else:
+            self.read_bytes = io[0] - self.io_started[0]
+            self.written_bytes = io[1] - self.io_started[1]
+        self.rss_peak = peak_rss()
+        self.rss_growth = self.rss_peak - self.rss_started
+
+    def timing(self):
+        """One X-Timing entry: name;wall=ms;cpu=ms;http=ms;read=bytes;write=bytes;rss=bytes"""
+        return (
+            f"{self.kind}:{self.name};wall={self.wall_seconds * 1000:.2f};cpu={self.cpu_seconds * 1000:.2f}"
+            f";http={self.http_seconds * 1000:.2f};read={self.read_bytes};write={self.written_bytes}"
+            f";rss={self.rss_growth}"
+        )
+
+
+class Metrics:
+    """Per-task and per-endpoint latency, CPU, I/O and outbound HTTP metrics.
+
+    Spans nest on a stack kept in a context variable: a task run inside a /run
+    request is a child of the endpoint span, and outbound HTTP time is added to
+    every span open in the current context. Helper threads that run in a copy
+    of the caller's context (contextvars.copy_context().run) add their HTTP time
+    to the caller's spans. render() returns the Prometheus text format.
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.spans = ContextVar(f"metrics_spans_{id(self)}", default=())  # Open spans, innermost last
+        self.histograms = {}  # (metric, kind, name) -> Histogram
+        self.counters = {}  # (metric, labels) -> value
+        self.in_flight = {}  # (kind, name) -> open spans
+        self.rss_peaks = {}  # (kind, name) -> peak RSS seen at the end of a span
+
+    def _observe(self, metric, labels, value):
+        with self.lock:
+            histogram = self.histograms.get((metric, labels))
+            if histogram is None:
+                histogram = self.histograms[(metric, labels)] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def _count(self, metric, labels, value=1):
+        with self.lock:
+            self.counters[(metric, labels)] = self.counters.get((metric, labels), 0) + value
+
+    def start(self, kind, name):
+        """Open a span on this thread; close it with finish()."""
+        span = Span(kind, name)
+        self.spans.set(self.spans.get() + (span,))
+        with self.lock:
+            self.in_flight[(kind, name)] = self.in_flight.get((kind, name), 0) + 1
+        return span
+
+    def finish(self, span, status=None):
+        """Close a span and record it. Returns the span, or None if it was already closed."""
+        stack = self.spans.get()
+        if span not in stack:
+            return None
+        stack = tuple(s for s in stack if s is not span)
+        self.spans.set(stack)
+        span.stop()
+        if status is not None:
+            span.status = status
+        if stack:
+            stack[-1].children.append(span)
+
+        labels = (("kind", span.kind), ("name", span.name))
+        self._observe("duration_seconds", labels, span.wall_seconds)
+        self._observe("cpu_seconds", labels, span.cpu_seconds)
+        self._observe("http_seconds", labels, span.http_seconds)
+        self._count("read_bytes_total", labels, span.read_bytes)
+        self._count("written_bytes_total", labels, span.written_bytes)
+        code = str(span.status) if span.status is not None else "unknown"
+        self._count("requests_total", labels + (("status", code),))
+        with self.lock:
+            self.in_flight[(span.kind, span.name)] -= 1
+            self.rss_peaks[(span.kind, span.name)] = max(span.rss_peak, self.rss_peaks.get((span.kind, span.name), 0))
+        return span
+
+    @contextmanager
+    def track(self, kind, name):
+        """Record the enclosed block as a span; set span.status to label the outcome."""
+        span = self.start(kind, name)
+        try:
+            yield span
+        except BaseException:
+            self.finish(span, status="error")
+            raise
+        self.finish(span)
+
+    @contextmanager
+    def http(self, url):
+        """Time an outbound HTTP call, per destination host and in every open span."""
+        started = time.perf_counter()
+        try:
+            yield url
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:  # Concurrent helper threads may share the caller's spans
+                for span in self.spans.get():
+                    span.http_seconds += elapsed
+            self._observe("outbound_http_seconds", (("host", urlsplit(url).hostname or ""),), elapsed)
+
+    def render(self, prefix="agent"):
+        """All metrics in the Prometheus text exposition format."""
+        with self.lock:
+            histograms = {k: (list(h.samples()), h.sum, h.count) for k, h in self.histograms.items()}
+            counters = dict(self.counters)
+            in_flight = dict(self.in_flight)
+            rss_peaks = dict(self.rss_peaks)
+
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        lines = []
+        for metric in sorted({m for m, _ in histograms}):
+            name = f"{prefix}_{metric}"
+            lines.append(f"# TYPE {name} histogram")
+            for (m, labels), (buckets, total, count) in sorted(histograms.items()):
+                if m != metric:
+                    continue
+                for le, cumulative in buckets:
+                    lines.append(f"{name}_bucket{label_text(labels, [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{label_text(labels)} {total}")
+                lines.append(f"{name}_count{label_text(labels)} {count}")
+        for metric in sorted({m for m, _ in counters}):
+            name = f"{prefix}_{metric}"
+            lines.append(f"# TYPE {name} counter")
+            for (m, labels), value in sorted(counters.items()):
+                if m == metric:
+                    lines.append(f"{name}{label_text(labels)} {value}")
+
+        lines.append(f"# TYPE {prefix}_in_flight gauge")
+        for (kind, name), value in sorted(in_flight.items()):
+            lines.append(f"{prefix}_in_flight{label_text([('kind', kind), ('name', name)])} {value}")
+        lines.append(f"# TYPE {prefix}_peak_rss_bytes gauge")
+        for (kind, name), value in sorted(rss_peaks.items()):
+            lines.append(f"{prefix}_peak_rss_bytes{label_text([('kind', kind), ('name', name)])} {value}")
+        lines.append("# TYPE process_peak_rss_bytes gauge")
+        lines.append(f"process_peak_rss_bytes {peak_rss()}")
+        return "\n".join(lines) + "\n"
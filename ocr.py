@@ -0,0 +1,237 @@
+import importlib.util
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from lazy import lazy_import
+
+Image = lazy_import("PIL.Image")
+
+# Tesseract's C API, resident in each worker and imported there on first use;
+# without it each batch is one run of the tesseract CLI
+tesserocr = lazy_import("tesserocr")
+HAS_TESSEROCR = importlib.util.find_spec("tesserocr") is not None
+
+# Where datagen.a8_credit_card_image draws the number on its 1012x638 card,
+# as fractions of the image size so scaled scans crop the same way
+NUMBER_REGION = (0.03, 0.37, 0.97, 0.56)
+
+# The number is drawn in a small bitmap font; Tesseract wants glyphs ~30px tall
+UPSCALE = 4
+
+DIGITS = "0123456789"
+TESSERACT_OPTIONS = ["--psm", "7", "-c", f"tessedit_char_whitelist={DIGITS}"]  # One line of digits
+
+# Binarization thresholds tried in turn (offsets from Otsu's) until a read passes the Luhn check
+THRESHOLD_OFFSETS = (0, -40, 40)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+
+class OcrError(Exception):
+    """Raised when Tesseract is missing or fails on a batch."""
+
+
+def luhn_valid(number):
+    """Luhn checksum of a card number given as a string of digits."""
+    if not 12 <= len(number) <= 19 or not number.isdigit():
+        return False
+    total = 0
+    for i, digit in enumerate(reversed(number)):
+        value = int(digit)
+        if i % 2:
+            value = value * 2 - 9 if value > 4 else value * 2
+        total += value
+    return total % 10 == 0
+
+
+def otsu_threshold(histogram):
+    """Gray level that best separates a 256-bin histogram into two classes."""
+    total = sum(histogram)
+    weighted_total = sum(i * count for i, count in enumerate(histogram))
+    best, best_variance = 127, -1.0
+    background = weighted_background = 0
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += level * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best, best_variance = level, variance
+    return best
+
+
+def prepare(image, region=NUMBER_REGION, upscale=UPSCALE, offset=0):
+    """Crop to the number, enlarge it and binarize to dark text on a white background."""
+    width, height = image.size
+    box = (int(region[0] * width), int(region[1] * height), int(region[2] * width), int(region[3] * height))
+    gray = image.crop(box).convert("L")
+    gray = gray.resize((gray.width * upscale, gray.height * upscale), Image.LANCZOS)
+    histogram = gray.histogram()
+    threshold = min(254, max(1, otsu_threshold(histogram) + offset))
+    # The text is the minority class; make it black whether the card is dark or light
+    light_text = sum(histogram[threshold + 1:]) < sum(histogram[:threshold + 1])
+    table = [(0 if light_text else 255) if level > threshold else (255 if light_text else 0) for level in range(256)]
+    return gray.point(table)
+
+
+class _CliEngine:
+    """Reads a batch of images with one tesseract process (an image list as input)."""
+
+    def __init__(self, command, timeout=120):
+        self.command = command
+        self.timeout = timeout
+
+    def read(self, images):
+        with tempfile.TemporaryDirectory(prefix="ocr-") as tmp_dir:
+            paths = []
+            for i, image in enumerate(images):
+                path = os.path.join(tmp_dir, f"{i}.png")
+                image.save(path)
+                paths.append(path)
+            list_path = os.path.join(tmp_dir, "images.txt")
+            with open(list_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(paths) + "\n")
+            try:
+                result = subprocess.run(
+                    [self.command, list_path, "stdout", *TESSERACT_OPTIONS],
+                    capture_output=True, text=True, timeout=self.timeout,
+                )
+            except FileNotFoundError:
+                raise OcrError(f"Tesseract is not installed ({self.command}).") from None
+            except subprocess.TimeoutExpired:
+                raise OcrError("Tesseract timed out.") from None
+        if result.returncode != 0:
+            raise OcrError(result.stderr.strip() or "Tesseract failed.")
+        pages = result.stdout.split("\f")  # Tesseract ends every page with a form feed
+        return (pages + [""] * len(images))[:len(images)]
+
+
+class _ApiEngine:
+    """Reads images through a resident tesserocr API object."""
+
+    def __init__(self):
+        self.api = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.SINGLE_LINE)
+        self.api.SetVariable("tessedit_char_whitelist", DIGITS)
+
+    def read(self, images):
+        texts = []
+        for image in images:
+            self.api.SetImage(image)
+            texts.append(self.api.GetUTF8Text())
+        return texts
+
+
+_engine = None
+
+
+def _start_worker(command):
+    """Process pool initializer: set up the OCR engine once per worker."""
+    global _engine
+    _engine = _ApiEngine() if HAS_TESSEROCR else _CliEngine(command)
+
+
+def read_batch(paths, region=NUMBER_REGION, upscale=UPSCALE):
+    """OCR the card number of every image in paths; runs inside a pool worker.
+
+    Images are read together, then the ones that fail the Luhn check are read
+    again at the next binarization threshold.
+    """
+    if _engine is None:
+        _start_worker(os.environ.get("TESSERACT_CMD", "tesseract"))
+    results, images = {}, {}
+    for path in paths:
+        try:
+            with Image.open(path) as image:
+                image.load()
+                images[path] = image.convert("RGB")
+        except OSError as e:
+            results[path] = {"number": None, "valid": False, "error": str(e)}
+
+    pending = list(images)
+    for attempt, offset in enumerate(THRESHOLD_OFFSETS, start=1):
+        if not pending:
+            break
+        texts = _engine.read([prepare(images[p], region, upscale, offset) for p in pending])
+        retry = []
+        for path, text in zip(pending, texts):
+            number = re.sub(r"\D", "", text)
+            valid = luhn_valid(number)
+            # Keep the first non-empty read unless a later threshold gives a valid one
+            if valid or path not in results or not results[path]["number"]:
+                results[path] = {"number": number, "valid": valid}
+            results[path]["attempts"] = attempt
+            if not valid:
+                retry.append(path)
+        pending = retry
+    return results
+
+
+class OcrPool:
+    """Warm worker processes that read card numbers from batches of images.
+
+    The pool starts on first use and keeps its workers (and their Tesseract
+    engines) until close(); images are split into batches of batch_size so
+    each worker pays Tesseract's start-up once per batch, not once per image.
+    """
+
+    def __init__(self, workers=None, batch_size=16, command=None, region=NUMBER_REGION, upscale=UPSCALE):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.command = command or os.environ.get("TESSERACT_CMD", "tesseract")
+        self.region = region
+        self.upscale = upscale
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def available(self):
+        return HAS_TESSEROCR or shutil.which(self.command) is not None
+
+    def _pool(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_start_worker, initargs=(self.command,),
+                )
+            return self.executor
+
+    def read_cards(self, paths):
+        """{path: {"number", "valid", "attempts"}} for every image; raises OcrError."""
+        if not self.available():
+            raise OcrError(f"Tesseract is not installed ({self.command}).")
+        paths = list(paths)
+        # Spread small jobs over all workers, large ones in batches of batch_size
+        size = max(1, min(self.batch_size, -(-len(paths) // self.workers)))
+        batches = [paths[i:i + size] for i in range(0, len(paths), size)]
+        results = {}
+        futures = [self._pool().submit(read_batch, batch, self.region, self.upscale) for batch in batches]
+        for future in futures:
+            results.update(future.result())
+        return results
+
+    def read_card(self, path):
+        return self.read_cards([path])[path]
+
+    def close(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def card_images(directory):
+    """Image files directly inside a directory, sorted by name."""
+    return sorted(
+        entry.path for entry in os.scandir(directory)
+        if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)
+    )
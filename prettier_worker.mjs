@@ -0,0 +1,56 @@
+// Long-lived Prettier worker for prettierpool.py.
+//
+// Reads one JSON request per line on stdin: {"id", "filepath", "source"}
+// and writes one JSON response per line on stdout: {"id", "formatted"} or
+// {"id", "error"}. Prettier is loaded once, so each request only pays for
+// the formatting itself.
+import fs from "node:fs";
+import path from "node:path";
+import readline from "node:readline";
+import { pathToFileURL } from "node:url";
+
+async function loadPrettier() {
+  if (process.env.PRETTIER_MODULE) {
+    return import(pathToFileURL(path.resolve(process.env.PRETTIER_MODULE)).href);
+  }
+  try {
+    return await import("prettier");
+  } catch {
+    // Under `npx -p prettier@x` the package is not importable by name, but its
+    // node_modules/.bin directory is on PATH.
+  }
+  for (const dir of (process.env.PATH || "").split(path.delimiter)) {
+    if (dir.endsWith(path.join("node_modules", ".bin"))) {
+      const candidate = path.join(dir, "..", "prettier", "index.mjs");
+      if (fs.existsSync(candidate)) {
+        return import(pathToFileURL(candidate).href);
+      }
+    }
+  }
+  throw new Error("Cannot find the prettier package.");
+}
+
+const prettier = await loadPrettier();
+
+// Announce readiness so the Python side can time out on a broken install
+process.stdout.write(JSON.stringify({ ready: true, version: prettier.version }) + "\n");
+
+const rl = readline.createInterface({ input: process.stdin, terminal: false });
+for await (const line of rl) {
+  if (!line.trim()) continue;
+  let request;
+  try {
+    request = JSON.parse(line);
+  } catch (err) {
+    process.stdout.write(JSON.stringify({ id: null, error: `Invalid request: ${err.message}` }) + "\n");
+    continue;
+  }
+  try {
+    // Same config resolution and parser inference as `prettier --write <file>`
+    const options = (await prettier.resolveConfig(request.filepath)) || {};
+    const formatted = await prettier.format(request.source, { ...options, filepath: request.filepath });
+    process.stdout.write(JSON.stringify({ id: request.id, formatted }) + "\n");
+  } catch (err) {
+    process.stdout.write(JSON.stringify({ id: request.id, error: String(err.message || err) }) + "\n");
+  }
+}
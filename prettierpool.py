@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+PRETTIER_VERSION = "3.4.2"
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prettier_worker.mjs")
+DEFAULT_COMMAND = ["npx", "-y", "-p", f"prettier@{PRETTIER_VERSION}", "node", WORKER_SCRIPT]
+
+# Results of format_file
+FORMATTED = "formatted"
+UNCHANGED = "unchanged"
+SKIPPED = "skipped"
+
+
+class FormatterError(Exception):
+    """Raised when a Prettier worker cannot be started or stops responding."""
+
+
+class PrettierWorker:
+    """One resident Node process running prettier_worker.mjs.
+
+    Requests and responses are single JSON lines over stdin/stdout. A reader
+    thread moves response lines onto a queue so every wait can time out.
+    """
+
+    def __init__(self, command, startup_timeout=120, request_timeout=30):
+        self.request_timeout = request_timeout
+        self.stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self.stderr,
+            text=True, encoding="utf-8", bufsize=1,
+        )
+        self.lines = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+        self.next_id = 0
+        ready = self._receive(startup_timeout)
+        if not ready.get("ready"):
+            self.close()
+            raise FormatterError("Prettier worker did not start.")
+        self.version = ready.get("version")
+
+    def _read(self):
+        for line in self.proc.stdout:
+            self.lines.put(line)
+        self.lines.put(None)  # Process exited
+
+    def _receive(self, timeout):
+        try:
+            line = self.lines.get(timeout=timeout)
+        except queue.Empty:
+            self.close()
+            raise FormatterError("Prettier worker timed out.")
+        if line is None:
+            self.stderr.seek(0)
+            details = self.stderr.read().decode("utf-8", errors="replace").strip()
+            raise FormatterError(f"Prettier worker exited. {details}".strip())
+        return json.loads(line)
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def format(self, filepath, source):
+        """Format source as Prettier would format the file at filepath."""
+        self.next_id += 1
+        request = {"id": self.next_id, "filepath": filepath, "source": source}
+        try:
+            self.proc.stdin.write(json.dumps(request) + "\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise FormatterError(f"Prettier worker is gone: {e}")
+        response = self._receive(self.request_timeout)
+        if response.get("id") != request["id"]:
+            self.close()
+            raise FormatterError("Prettier worker answered out of order.")
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response["formatted"]
+
+    def close(self):
+        if self.proc.poll() is None:
+            self.proc.stdin.close()
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        self.stderr.close()
+
+
+class PrettierPool:
+    """A pool of resident Prettier workers that formats files in place.
+
+    Workers start on first use. A file is skipped when its content hash equals
+    the hash of what this pool last wrote to it, since formatting an already
+    formatted file is wasted work (and Prettier is not always idempotent).
+    """
+
+    def __init__(self, command=None, size=2):
+        self.command = command or DEFAULT_COMMAND
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.slots = threading.Semaphore(size)
+        self.hashes = {}  # path -> sha256 of the content we last wrote
+        self.lock = threading.Lock()
+
+    def _checkout(self):
+        self.slots.acquire()
+        try:
+            while True:
+                try:
+                    worker = self.idle.get_nowait()
+                except queue.Empty:
+                    return PrettierWorker(self.command)
+                if worker.alive():
+                    return worker
+                worker.close()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def _checkin(self, worker, healthy):
+        if healthy and worker.alive():
+            self.idle.put(worker)
+        else:
+            worker.close()
+        self.slots.release()
+
+    def format_source(self, filepath, source):
+        worker = self._checkout()
+        healthy = True
+        try:
+            return worker.format(filepath, source)
+        except FormatterError:
+            healthy = False
+            raise
+        finally:
+            self._checkin(worker, healthy)
+
+    def format_file(self, path):
+        """Format one file in place. Returns FORMATTED, UNCHANGED or SKIPPED."""
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        with self.lock:
+            if self.hashes.get(path) == digest:
+                return SKIPPED
+        formatted = self.format_source(path, source)
+        if formatted != source:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(formatted)
+        with self.lock:
+            self.hashes[path] = hashlib.sha256(formatted.encode("utf-8")).hexdigest()
+        return FORMATTED if formatted != source else UNCHANGED
+
+    def format_files(self, paths):
+        """Format many files across the pool. Returns {path: result or "error: ..."}."""
+        def run(path):
+            try:
+                return self.format_file(path)
+            except FormatterError:
+                raise
+            except Exception as e:
+                return f"error: {e}"
+
+        with ThreadPoolExecutor(max_workers=self.size) as pool:
+            return dict(zip(paths, pool.map(run, paths)))
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
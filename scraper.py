@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from contextvars import copy_context
+from urllib.parse import urlsplit
+
+import requests
+from urllib3.util.retry import Retry
+
+import asyncfetch
+from lazy import lazy_import
+from urlguard import GuardedAdapter, GuardedSession
+
+bs4 = lazy_import("bs4")
+
+# lxml builds the tree in C; html.parser is the pure-Python fallback
+PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+# Page results
+FETCHED = "fetched"
+NOT_MODIFIED = "not_modified"
+FAILED = "failed"
+
+
+def parse_titles(html, tag="h1"):
+    """Text of every <tag> element; only those elements are built into the tree."""
+    soup = bs4.BeautifulSoup(html, PARSER, parse_only=bs4.SoupStrainer(tag))
+    return [element.get_text().strip() for element in soup.find_all(tag)]
+
+
+class Scraper:
+    """Fetches many pages concurrently and extracts their <h1> titles.
+
+    - A bounded thread pool shares one requests.Session; urllib3 keeps a
+      connection pool per host, so pages on the same site reuse connections.
+    - Every response's ETag / Last-Modified is stored in an on-disk cache with
+      the extracted titles. The next fetch sends If-None-Match /
+      If-Modified-Since, and a 304 reuses the titles without downloading or parsing.
+    - With a UrlGuard, every request (redirects included) is checked against
+      its host allowlist and refused for internal addresses.
+    - ascrape() does the same on an asyncio event loop through httpx, for the
+      ASGI server; the cache and stats are shared with scrape().
+    """
+
+    def __init__(self, cache_dir=None, workers=16, timeout=(5, 30), retries=2, backoff=0.5, http_timer=None,
+                 guard=None):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.http_timer = http_timer or nullcontext  # Context manager wrapped around each GET, given the URL
+        self.guard = guard
+        self.session = GuardedSession(guard)
+        self.async_client = None  # Created on first ascrape(), on the event loop that uses it
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504))
+        adapter = GuardedAdapter(guard, pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.lock = threading.Lock()
+        self.stats = {"pages": 0, FETCHED: 0, NOT_MODIFIED: 0, FAILED: 0, "bytes": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _cache_get(self, url):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _cache_put(self, url, entry):
+        if not self.cache_dir:
+            return
+        path = self._cache_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)  # Readers never see a half-written entry
+
+    def _conditional(self, url):
+        """(cache entry or None, If-None-Match / If-Modified-Since headers) for a URL."""
+        cached = self._cache_get(url)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        return cached, headers
+
+    def _fetched(self, url, response_headers, content, titles):
+        if response_headers.get("ETag") or response_headers.get("Last-Modified"):
+            self._cache_put(url, {
+                "etag": response_headers.get("ETag"),
+                "last_modified": response_headers.get("Last-Modified"),
+                "titles": titles,
+            })
+        return {"url": url, "status": FETCHED, "titles": titles, "bytes": len(content)}
+
+    def fetch(self, url):
+        """{"url", "status", "titles"[, "error"]} for one page."""
+        if urlsplit(url).scheme not in ("http", "https"):
+            return {"url": url, "status": FAILED, "titles": [], "error": "Only http(s) URLs can be scraped."}
+        cached, headers = self._conditional(url)
+        try:
+            with self.http_timer(url):
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cached:
+                return {"url": url, "status": NOT_MODIFIED, "titles": cached["titles"]}
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            return {"url": url, "status": FAILED, "titles": [], "error": str(e)}
+
+        titles = parse_titles(response.content)  # bs4 detects the encoding from the bytes
+        return self._fetched(url, response.headers, response.content, titles)
+
+    def scrape(self, urls):
+        """Fetch every URL (bounded by workers); returns (results in URL order, run stats)."""
+        started = time.perf_counter()
+        if len(urls) == 1:
+            results = [self.fetch(urls[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(urls)))) as pool:
+                # Each fetch runs in a copy of the caller's context, so http_timer sees the caller's state
+                futures = [pool.submit(copy_context().run, self.fetch, url) for url in urls]
+                results = [future.result() for future in futures]
+        return results, self._run_stats(results, time.perf_counter() - started)
+
+    def _async_client(self):
+        if self.async_client is None:
+            self.async_client = asyncfetch.async_client(self.guard, self.workers, self.timeout, self.retries)
+        return self.async_client
+
+    async def afetch(self, url):
+        """fetch() on the event loop: no thread waits on the server, only parsing runs on one."""
+        if urlsplit(url).scheme not in ("http", "https"):
+            return {"url": url, "status": FAILED, "titles": [], "error": "Only http(s) URLs can be scraped."}
+        cached, headers = self._conditional(url)
+        try:
+            with self.http_timer(url):
+                response = await asyncfetch.send(self._async_client(), url, headers, self.retries, self.backoff)
+            if response.status_code == 304 and cached:
+                return {"url": url, "status": NOT_MODIFIED, "titles": cached["titles"]}
+            response.raise_for_status()
+        except (asyncfetch.httpx.HTTPError, requests.exceptions.RequestException) as e:
+            return {"url": url, "status": FAILED, "titles": [], "error": str(e)}
+
+        titles = await asyncio.to_thread(parse_titles, response.content)
+        return self._fetched(url, response.headers, response.content, titles)
+
+    async def ascrape(self, urls):
+        """scrape() on the event loop, at most workers fetches at a time; needs httpx."""
+        started = time.perf_counter()
+        slots = asyncio.Semaphore(max(1, self.workers))
+
+        async def fetch(url):
+            async with slots:
+                return await self.afetch(url)
+
+        results = await asyncio.gather(*map(fetch, urls))
+        return results, self._run_stats(results, time.perf_counter() - started)
+
+    def _run_stats(self, results, seconds):
+        run = {"pages": len(results), FETCHED: 0, NOT_MODIFIED: 0, FAILED: 0, "bytes": 0}
+        for result in results:
+            run[result["status"]] += 1
+            run["bytes"] += result.get("bytes", 0)
+        with self.lock:
+            for name, value in run.items():
+                self.stats[name] += value
+        run["seconds"] = round(seconds, 4)
+        run["pages_per_second"] = round(len(results) / seconds, 2) if seconds > 0 else None
+        return run
+
+    def close(self):
+        self.session.close()
+
+    async def aclose(self):
+        client, self.async_client = self.async_client, None
+        if client is not None:
+            await client.aclose()
@@ -0,0 +1,98 @@
+# Production entry point.
+#
+#   python serve.py --workers 4 --threads 8            # gunicorn, threaded WSGI workers
+#   python serve.py --asgi --workers 4                 # uvicorn, ASGI (see asgi.py)
+#
+# The app module is imported once before the workers fork (--preload, on by
+# default), so heavy imports are paid once and shared copy-on-write. On SIGTERM
+# the server stops accepting connections, lets in-flight requests finish within
+# --graceful-timeout, then each worker drains its background job queue.
+#
+# Heavy task dependencies (pandas, PIL, ...) are imported lazily by app.py; the
+# server imports them up front (PRELOAD_MODULES=1) unless --no-warm-up is given,
+# so the first request of each task doesn't pay for the import.
+import argparse
+import multiprocessing
+import os
+import sys
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the automation agent.")
+    parser.add_argument("--bind", default="0.0.0.0:8000", help="host:port to listen on")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="worker processes")
+    parser.add_argument("--threads", type=int, default=8, help="request threads per WSGI worker")
+    parser.add_argument("--keepalive", type=int, default=5, help="seconds to hold idle keep-alive connections")
+    parser.add_argument("--timeout", type=int, default=120, help="seconds before a silent worker is restarted")
+    parser.add_argument("--graceful-timeout", type=int, default=30, help="seconds to finish in-flight work on shutdown")
+    parser.add_argument("--max-requests", type=int, default=0, help="recycle a worker after this many requests (0 = never)")
+    parser.add_argument("--no-preload", action="store_true", help="import the app in each worker instead of once")
+    parser.add_argument("--no-warm-up", action="store_true", help="leave heavy task dependencies to first use")
+    parser.add_argument("--asgi", action="store_true", help="serve asgi:application with uvicorn")
+    return parser.parse_args(argv)
+
+
+def worker_exit(server, worker):
+    """gunicorn hook: the worker has stopped serving, drain what it still owns."""
+    import app
+    app.shutdown()
+
+
+def serve_wsgi(args):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        sys.exit("gunicorn is not installed: pip install gunicorn")
+
+    class AgentApplication(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": args.bind,
+                "workers": args.workers,
+                "threads": args.threads,
+                "worker_class": "gthread",
+                "keepalive": args.keepalive,
+                "timeout": args.timeout,
+                "graceful_timeout": args.graceful_timeout,
+                "max_requests": args.max_requests,
+                "max_requests_jitter": args.max_requests // 10,
+                "preload_app": not args.no_preload,
+                "worker_exit": worker_exit,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import app
+            return app
+
+    AgentApplication().run()
+
+
+def serve_asgi(args):
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("uvicorn is not installed: pip install uvicorn")
+
+    host, _, port = args.bind.rpartition(":")
+    uvicorn.run(
+        "asgi:application",
+        host=host or "0.0.0.0",
+        port=int(port),
+        workers=args.workers,
+        timeout_keep_alive=args.keepalive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        limit_max_requests=args.max_requests or None,
+        lifespan="on",
+    )
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    if not arguments.no_warm_up:
+        os.environ.setdefault("PRELOAD_MODULES", "1")
+    if arguments.asgi:
+        serve_asgi(arguments)
+    else:
+        serve_wsgi(arguments)
@@ -0,0 +1,152 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Rows fetched per fetchmany() call when streaming results
+FETCH_SIZE = 1000
+
+# Prepared statements kept per connection
+STATEMENT_CACHE_SIZE = 256
+
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+AGGREGATES = {"sum": "SUM", "count": "COUNT", "avg": "AVG", "min": "MIN", "max": "MAX", "total": "TOTAL"}
+
+
+class ConnectionPool:
+    """Reusable SQLite connections for the databases under the data directory.
+
+    Each database gets a bounded set of connections. A thread checks one out for
+    the duration of a query, so connection setup and the prepared statement cache
+    survive between requests. Connections are replaced if the database file
+    itself is replaced (datagen rebuilds ticket-sales.db).
+
+    WAL mode is opt-in per database (connection(path, wal=True)): it is stored in
+    the file and adds -wal / -shm files next to it that every tool copying or
+    replacing the database must then handle, so it is only for databases the app
+    owns. Other databases keep the journal mode they have.
+    """
+
+    def __init__(self, size=8):
+        self.size = size
+        self.pools = {}  # db path -> (inode, queue of idle connections)
+        self.lock = threading.Lock()
+
+    def _connect(self, db_path, wal=False):
+        conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        if wal:
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            except sqlite3.Error:
+                pass  # Read-only files keep their journal mode
+        conn.execute("PRAGMA mmap_size=268435456")
+        return conn
+
+    def _idle_queue(self, db_path):
+        inode = os.stat(db_path).st_ino
+        with self.lock:
+            entry = self.pools.get(db_path)
+            if entry is None or entry[0] != inode:
+                if entry is not None:
+                    self._close_idle(entry[1])
+                entry = (inode, queue.LifoQueue(maxsize=self.size))
+                self.pools[db_path] = entry
+            return entry[1]
+
+    @staticmethod
+    def _close_idle(idle):
+        while True:
+            try:
+                idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    @contextmanager
+    def connection(self, db_path, wal=False):
+        """Check out a connection to db_path, returning it to the pool afterwards; wal=True switches it to WAL mode."""
+        idle = self._idle_queue(db_path)
+        try:
+            conn = idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect(db_path, wal)
+        try:
+            yield conn
+        except BaseException:
+            conn.close()  # Never hand a connection in an unknown state to the next caller
+            raise
+        try:
+            idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        with self.lock:
+            for _, idle in self.pools.values():
+                self._close_idle(idle)
+            self.pools.clear()
+
+
+def iter_rows(cursor, fetch_size=FETCH_SIZE):
+    """Yield the rows of an executed cursor in fetchmany() batches."""
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def table_columns(conn, table):
+    """Column names of a table, or an empty list if it does not exist."""
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+
+def aggregate_sql(conn, table, agg, expr="*", filters=None, group_by=None):
+    """Build a parameterized aggregate query from untrusted request values.
+
+    Table, column and group-by names must be real identifiers of the table, and
+    expr may only combine its columns, numbers and + - * / ( ). Filter values
+    are always bound as parameters. Returns (sql, params).
+    """
+    if not IDENTIFIER.fullmatch(table or ""):
+        raise ValueError("Invalid table name.")
+    columns = table_columns(conn, table)
+    if not columns:
+        raise ValueError(f"Table '{table}' not found.")
+    if agg not in AGGREGATES:
+        raise ValueError(f"Unsupported aggregate '{agg}'. Use one of: {', '.join(AGGREGATES)}.")
+
+    tokens = re.findall(r"[A-Za-z_][A-Za-z0-9_]*|\d+(?:\.\d+)?|[-+*/()]|\S", expr or "*")
+    for token in tokens:
+        if IDENTIFIER.fullmatch(token):
+            if token not in columns:
+                raise ValueError(f"Column '{token}' not found.")
+        elif token == "*" and len(tokens) == 1:
+            if agg != "count":
+                raise ValueError("Only count can aggregate '*'.")
+        elif not re.fullmatch(r"\d+(?:\.\d+)?|[-+*/()]", token):
+            raise ValueError(f"Invalid token '{token}' in expression.")
+    expression = " ".join(f'"{t}"' if IDENTIFIER.fullmatch(t) else t for t in tokens)
+
+    where = []
+    params = []
+    for column, value in (filters or {}).items():
+        if column not in columns:
+            raise ValueError(f"Column '{column}' not found.")
+        where.append(f'"{column}" = ?')
+        params.append(value)
+
+    select = f"{AGGREGATES[agg]}({expression})"
+    if group_by:
+        if group_by not in columns:
+            raise ValueError(f"Column '{group_by}' not found.")
+        select = f'"{group_by}", {select}'
+    sql = f'SELECT {select} FROM "{table}"'
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if group_by:
+        sql += f' GROUP BY "{group_by}"'
+    return sql, params
@@ -0,0 +1,114 @@
+import os
+import threading
+
+# Default read size for chunked processing
+CHUNK_SIZE = 1024 * 1024
+
+# Every how many lines the sparse line index records a byte offset
+LINE_INDEX_STEP = 10000
+
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE, start=0, length=None):
+    """Yield raw byte chunks of a file, optionally limited to a byte range."""
+    remaining = length
+    with open(path, "rb") as f:
+        f.seek(start)
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            chunk = f.read(size)
+            if not chunk:
+                return
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def iter_lines(path, encoding="utf-8", chunk_size=CHUNK_SIZE, start=0):
+    """Yield the lines of a file without line endings, reading fixed-size chunks.
+
+    Only one chunk plus the partial line carried over from the previous chunk is
+    held in memory at a time, however large the file is.
+    """
+    tail = b""
+    for chunk in iter_chunks(path, chunk_size, start):
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line.rstrip(b"\r").decode(encoding, errors="replace")
+    if tail:
+        yield tail.rstrip(b"\r").decode(encoding, errors="replace")
+
+
+def read_byte_range(path, offset, length, encoding="utf-8"):
+    """Read `length` bytes from `offset`. Returns (text, next_offset, file_size).
+
+    Raises ValueError for a negative length.
+    """
+    if length < 0:
+        raise ValueError("length must not be negative.")
+    size = os.path.getsize(path)
+    offset = min(max(offset, 0), size)
+    data = b"".join(iter_chunks(path, start=offset, length=length))
+    return data.decode(encoding, errors="replace"), offset + len(data), size
+
+
+class LineIndex:
+    """Sparse map from line numbers to byte offsets, so line pages can be served
+    without rescanning a large file from the start on every request.
+
+    Offsets are recorded every LINE_INDEX_STEP lines and are thrown away when the
+    file's (mtime, size) changes.
+    """
+
+    def __init__(self, step=LINE_INDEX_STEP):
+        self.step = step
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def _index_for(self, path):
+        st = os.stat(path)
+        fingerprint = (st.st_mtime_ns, st.st_size)
+        with self.lock:
+            cached = self.indexes.get(path)
+            if cached is not None and cached[0] == fingerprint:
+                return cached[1]
+        offsets = [0]  # offsets[i] is the byte offset of line i * step
+        position = 0
+        line_no = 0
+        tail = 0
+        for chunk in iter_chunks(path):
+            start = 0
+            while True:
+                newline = chunk.find(b"\n", start)
+                if newline == -1:
+                    break
+                line_no += 1
+                if line_no % self.step == 0:
+                    offsets.append(position + newline + 1)
+                start = newline + 1
+            position += len(chunk)
+            tail = len(chunk) - start
+        total = line_no + (1 if tail else 0)
+        with self.lock:
+            self.indexes[path] = (fingerprint, (offsets, total))
+        return offsets, total
+
+    def read_lines(self, path, start_line, count, encoding="utf-8"):
+        """Return (lines, total_lines) for `count` lines starting at `start_line` (0-based).
+
+        Raises ValueError for a negative count.
+        """
+        if count < 0:
+            raise ValueError("count must not be negative.")
+        offsets, total = self._index_for(path)
+        start_line = max(start_line, 0)
+        block = min(start_line // self.step, len(offsets) - 1)
+        skip = start_line - block * self.step
+        lines = []
+        for i, line in enumerate(iter_lines(path, encoding, start=offsets[block])):
+            if i < skip:
+                continue
+            if len(lines) >= count:
+                break
+            lines.append(line)
+        return lines, total
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+from stubs import start_server
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def stub_server():
+    """Start loopback servers for handler classes; each call returns a base URL."""
+    servers = []
+
+    def start(handler):
+        server, url = start_server(handler)
+        servers.append(server)
+        return url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
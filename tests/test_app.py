@@ -0,0 +1,51 @@
+import importlib
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def app_module(tmp_path_factory):
+    """The app, imported with its data, cache and tenant directories under a temporary directory."""
+    root = tmp_path_factory.mktemp("app")
+    (root / "data").mkdir()
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        app = importlib.import_module("app")
+    finally:
+        os.chdir(cwd)
+    yield app
+    app.shutdown()
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize("body", ["[]", '"x"', "null", "{}", '{"tasks": "count_wednesdays"}', '{"tasks": []}'])
+def test_run_batch_rejects_malformed_bodies(client, body):
+    response = client.post("/run_batch", data=body, content_type="application/json")
+
+    assert response.status_code == 400
+    assert "tasks" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("query", ["length=-1", "lines=-5", "offset=-1", "start_line=-2", "length=x"])
+def test_read_rejects_negative_or_invalid_ranges(app_module, client, query):
+    with open(os.path.join(app_module.DATA_DIR, "lines.txt"), "w", encoding="utf-8") as f:
+        f.write("one\ntwo\nthree\n")
+
+    response = client.get(f"/read?path=lines.txt&{query}")
+
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Invalid range parameters."
+
+
+def test_read_pages_by_lines_and_bytes(app_module, client):
+    with open(os.path.join(app_module.DATA_DIR, "lines.txt"), "w", encoding="utf-8") as f:
+        f.write("one\ntwo\nthree\n")
+
+    assert client.get("/read?path=lines.txt&start_line=1&lines=1").get_json()["lines"] == ["two"]
+    assert client.get("/read?path=lines.txt&offset=4&length=3").get_json()["content"] == "two"
@@ -0,0 +1,51 @@
+import os
+import sqlite3
+
+import pytest
+
+import datagen
+from sqlitepool import ConnectionPool
+from tickets import ticket_sales
+
+
+@pytest.fixture
+def data_root(tmp_path, monkeypatch):
+    monkeypatch.setitem(datagen.config, "root", str(tmp_path))
+    monkeypatch.setitem(datagen.config, "scale", 1)
+    return tmp_path
+
+
+def generate_tickets(email):
+    datagen.config["email"] = email
+    datagen.a10_ticket_sales()
+
+
+def direct_total(db_path, ticket_type):
+    conn = sqlite3.connect(db_path)
+    try:
+        total = conn.execute("SELECT SUM(units * price) FROM tickets WHERE type = ?", (ticket_type,)).fetchone()[0]
+    finally:
+        conn.close()
+    return round(total, 2)
+
+
+@pytest.mark.parametrize("wal", [False, True])
+def test_rebuild_while_the_pool_is_open(data_root, wal):
+    db_path = str(data_root / "ticket-sales.db")
+    pool = ConnectionPool(size=2)
+    generate_tickets("first@example.com")
+    with pool.connection(db_path, wal=wal) as conn:
+        before = ticket_sales(conn, db_path, "Gold")
+        # Leave committed pages in the WAL, as a busy database would have
+        conn.execute("INSERT INTO tickets VALUES ('Gold', 1, 1.0)")
+        conn.commit()
+
+    generate_tickets("second@example.com")
+
+    with pool.connection(db_path, wal=wal) as conn:
+        after = ticket_sales(conn, db_path, "Gold")
+    pool.close()
+    assert after == direct_total(db_path, "Gold")
+    assert after != before
+    assert datagen.sqlite_wal_mode(db_path) == wal
+    assert not any(name.endswith(".tmp") for name in os.listdir(data_root))
@@ -0,0 +1,50 @@
+from emailparse import TIER_HEADERS, TIER_LLM, TIER_REGEX, extract_sender
+
+
+def llm(content):
+    llm.calls.append(content)
+    return "llm@example.com"
+
+
+def message(from_header, body="Hello"):
+    return f"To: me@example.com\nSubject: Hi\n{from_header}\n\n{body}\n"
+
+
+def setup_function():
+    llm.calls = []
+
+
+def test_a_well_formed_header_answers_first():
+    assert extract_sender(message("From: Alice <alice@example.com>"), llm) == ("alice@example.com", TIER_HEADERS)
+    assert llm.calls == []
+
+
+def test_a_header_the_parser_rejects_falls_back_to_the_regex():
+    content = message("From: Alice alice@example.com (via list)")
+
+    assert extract_sender(content, llm) == ("alice@example.com", TIER_REGEX)
+
+
+def test_a_quoted_from_line_in_the_body_is_ignored():
+    body = "See below.\n\n---------- Forwarded message ----------\nFrom: spoof@evil.com\nSubject: Hi"
+    content = message("From: undisclosed-recipients:;", body)
+
+    assert extract_sender(content, llm) == ("llm@example.com", TIER_LLM)
+    assert llm.calls == [content]
+
+
+def test_several_addresses_are_left_to_the_llm():
+    content = message("From: a@x.com, b@y.com")
+
+    assert extract_sender(content, llm) == ("llm@example.com", TIER_LLM)
+
+
+def test_folded_from_headers_are_read():
+    content = message("From: a@x.com,\n b@y.com")
+
+    assert extract_sender(content, llm) == ("llm@example.com", TIER_LLM)
+    assert extract_sender(message("From: Alice Example\n alice@example.com"), llm)[0] == "alice@example.com"
+
+
+def test_no_sender_without_a_fallback():
+    assert extract_sender("Subject: Hi\n\nFrom: spoof@evil.com\n") == (None, None)
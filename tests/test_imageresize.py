@@ -0,0 +1,35 @@
+import os
+
+import pytest
+from PIL import Image
+
+from imageresize import find_images, resize_images
+
+
+def write_image(path, size=(400, 300)):
+    Image.new("RGB", size, (200, 40, 40)).save(path)
+    return str(path)
+
+
+def test_each_source_gets_its_own_outputs(tmp_path):
+    sources = [write_image(tmp_path / "a.jpg"), write_image(tmp_path / "b.png")]
+    dest_dir = str(tmp_path / "out")
+
+    results, stats = resize_images(sources, dest_dir, [(200, 200), (100, 50)], workers=1)
+
+    assert stats["resized"] == 2
+    assert sorted(name for name in os.listdir(dest_dir) if not name.startswith(".")) == [
+        "a-100x50.jpg", "a-200x200.jpg", "b-100x50.jpg", "b-200x200.jpg",
+    ]
+    with Image.open(os.path.join(dest_dir, "a-100x50.jpg")) as img:
+        assert img.size == (67, 50)
+
+
+def test_sources_with_the_same_stem_are_rejected(tmp_path):
+    write_image(tmp_path / "x.jpg")
+    write_image(tmp_path / "x.png", (300, 400))
+    dest_dir = tmp_path / "out"
+
+    with pytest.raises(ValueError, match="x-200x200.jpg"):
+        resize_images(find_images(str(tmp_path)), str(dest_dir), [(200, 200)], workers=1)
+    assert not dest_dir.exists()
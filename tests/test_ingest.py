@@ -0,0 +1,227 @@
+import asyncio
+import json
+import socket
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+import requests
+
+from ingest import FETCHED, NOT_MODIFIED, IngestError, Ingester
+from metrics import Metrics
+from stubs import StubHandler
+from urlguard import UrlGuard
+
+PAGES = 3
+
+
+def api_handler():
+    """A stub paginated API.
+
+    /items?page=<n>: JSON arrays with ETags and Link rel=next / rel=last.
+    /entries?page=<n>: {"entries": [...]} objects with an X-Total-Pages header.
+    /chain?page=<n>: arrays linked by rel=next only.
+    /leak: links its next page to localhost, which is not allowlisted.
+    """
+
+    class Handler(StubHandler):
+        seen = []
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            page = int(dict(parse_qsl(parts.query)).get("page", 1))
+            Handler.seen.append({"path": self.path, "if_none_match": self.headers.get("If-None-Match")})
+            items = [{"page": page, "n": n} for n in range(2)]
+            headers = []
+            if parts.path == "/items":
+                etag = f'"items-{page}"'
+                if self.headers.get("If-None-Match") == etag:
+                    return self.send_body(304, headers=[("ETag", etag)])
+                headers.append(("ETag", etag))
+                if page < PAGES:
+                    headers.append(("Link", f'</items?page={page + 1}>; rel="next", </items?page={PAGES}>; rel="last"'))
+                return self.send_body(200, json.dumps(items), headers)
+            if parts.path == "/entries":
+                headers.append(("X-Total-Pages", str(PAGES)))
+                if page < PAGES:
+                    headers.append(("Link", f'</entries?page={page + 1}>; rel="next"'))
+                return self.send_body(200, json.dumps({"count": 2, "entries": items}), headers)
+            if parts.path == "/chain":
+                if page < PAGES:
+                    headers.append(("Link", f'</chain?page={page + 1}>; rel="next"'))
+                return self.send_body(200, json.dumps(items), headers)
+            if parts.path == "/leak":
+                port = self.server.server_address[1]
+                headers.append(("Link", f'<http://localhost:{port}/items?page=2>; rel="next"'))
+                return self.send_body(200, json.dumps(items), headers)
+            self.send_body(404, "missing")
+
+    return Handler
+
+
+def local_ingester(tmp_path, **kwargs):
+    kwargs.setdefault("cache_dir", str(tmp_path / "ingest"))
+    kwargs.setdefault("guard", UrlGuard("127.0.0.1", allow_private=True))
+    return Ingester(workers=4, retries=0, **kwargs)
+
+
+def all_items():
+    return [{"page": page, "n": n} for page in range(1, PAGES + 1) for n in range(2)]
+
+
+def test_link_pages_are_joined_into_one_array(stub_server, tmp_path):
+    handler = api_handler()
+    url = stub_server(handler)
+    output = tmp_path / "out.json"
+
+    run = local_ingester(tmp_path).ingest(f"{url}/items", str(output))
+
+    assert json.loads(output.read_text()) == all_items()
+    assert (run["pages"], run[FETCHED], run["written"]) == (PAGES, PAGES, True)
+    assert sorted(r["path"] for r in handler.seen) == ["/items", "/items?page=2", "/items?page=3"]
+
+
+def test_unchanged_pages_are_not_rewritten(stub_server, tmp_path):
+    handler = api_handler()
+    url = stub_server(handler)
+    output = tmp_path / "out.json"
+
+    local_ingester(tmp_path).ingest(f"{url}/items", str(output))
+    run = local_ingester(tmp_path).ingest(f"{url}/items", str(output))  # The page cache is on disk
+
+    assert (run[FETCHED], run[NOT_MODIFIED], run["written"]) == (0, PAGES, False)
+    assert all(r["if_none_match"] for r in handler.seen[PAGES:])
+    assert json.loads(output.read_text()) == all_items()
+
+
+def test_a_changed_output_is_rewritten(stub_server, tmp_path):
+    url = stub_server(api_handler())
+    output = tmp_path / "out.json"
+
+    local_ingester(tmp_path).ingest(f"{url}/items", str(output))
+    output.write_text("[]")
+    run = local_ingester(tmp_path).ingest(f"{url}/items", str(output))
+
+    assert (run[NOT_MODIFIED], run["written"]) == (PAGES, True)
+    assert json.loads(output.read_text()) == all_items()
+
+
+def test_ndjson_writes_one_item_per_line(stub_server, tmp_path):
+    url = stub_server(api_handler())
+    output = tmp_path / "out.ndjson"
+
+    run = local_ingester(tmp_path).ingest(f"{url}/items", str(output), fmt="ndjson")
+
+    assert [json.loads(line) for line in output.read_text().splitlines()] == all_items()
+    assert run["items"] == len(all_items())
+
+
+def test_items_key_and_total_pages_header(stub_server, tmp_path):
+    handler = api_handler()
+    url = stub_server(handler)
+    output = tmp_path / "out.json"
+
+    run = local_ingester(tmp_path).ingest(f"{url}/entries", str(output), items_key="entries")
+
+    assert json.loads(output.read_text()) == all_items()
+    assert run["pages"] == PAGES
+
+
+def test_next_links_are_followed_without_a_last_page(stub_server, tmp_path):
+    url = stub_server(api_handler())
+    output = tmp_path / "out.json"
+
+    run = local_ingester(tmp_path, cache_dir=None).ingest(f"{url}/chain", str(output))
+
+    assert json.loads(output.read_text()) == all_items()
+    assert run["pages"] == PAGES
+
+
+def test_object_pages_need_items_key(stub_server, tmp_path):
+    url = stub_server(api_handler())
+    output = tmp_path / "out.json"
+
+    with pytest.raises(IngestError):
+        local_ingester(tmp_path).ingest(f"{url}/entries", str(output))
+    assert not output.exists()
+
+
+def test_missing_pages_raise(stub_server, tmp_path):
+    url = stub_server(api_handler())
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        local_ingester(tmp_path).ingest(f"{url}/nope", str(tmp_path / "out.json"))
+
+
+def test_link_urls_are_checked_against_the_allowlist(stub_server, tmp_path):
+    handler = api_handler()
+    url = stub_server(handler)
+
+    with pytest.raises(requests.exceptions.InvalidURL, match="allowlist"):
+        local_ingester(tmp_path).ingest(f"{url}/leak", str(tmp_path / "out.json"))
+    assert [r["path"] for r in handler.seen] == ["/leak"]
+
+
+def test_internal_addresses_are_refused_by_default(stub_server, tmp_path):
+    handler = api_handler()
+    url = stub_server(handler)
+
+    with pytest.raises(requests.exceptions.InvalidURL, match="non-public"):
+        local_ingester(tmp_path, guard=UrlGuard("*")).ingest(f"{url}/items", str(tmp_path / "out.json"))
+    assert handler.seen == []
+
+
+def test_the_connected_address_is_checked_too(stub_server, tmp_path):
+    handler = api_handler()
+    url = stub_server(handler).replace("127.0.0.1", "localhost")
+
+    def getaddrinfo(host, port, proto=0):  # The guard's own lookup answers a public address
+        return [(socket.AF_INET, socket.SOCK_STREAM, proto, "", ("93.184.216.34", port))]
+
+    ingester = local_ingester(tmp_path, guard=UrlGuard("localhost", resolver=getaddrinfo))
+    with pytest.raises(requests.exceptions.InvalidURL, match="connected to a non-public address"):
+        ingester.ingest(f"{url}/items", str(tmp_path / "out.json"))
+    assert handler.seen == []
+
+
+def test_fetch_time_reaches_the_callers_span(stub_server, tmp_path):
+    url = stub_server(api_handler())
+    metrics = Metrics()
+
+    with metrics.track("task", "ingest") as span:
+        local_ingester(tmp_path, http_timer=metrics.http).ingest(f"{url}/items", str(tmp_path / "out.json"))
+
+    assert span.http_seconds > 0
+
+
+def test_aingest_matches_ingest(stub_server, tmp_path):
+    pytest.importorskip("httpx")
+    handler = api_handler()
+    url = stub_server(handler)
+    output = tmp_path / "out.json"
+
+    async def run_twice():
+        ingester = local_ingester(tmp_path)
+        try:
+            return [await ingester.aingest(f"{url}/items", str(output)) for _ in range(2)]
+        finally:
+            await ingester.aclose()
+
+    first, second = asyncio.run(run_twice())
+
+    assert json.loads(output.read_text()) == all_items()
+    assert (first[FETCHED], second[NOT_MODIFIED], second["written"]) == (PAGES, PAGES, False)
+
+
+def test_aingest_checks_link_urls(stub_server, tmp_path):
+    pytest.importorskip("httpx")
+    url = stub_server(api_handler())
+
+    async def run():
+        ingester = local_ingester(tmp_path)
+        try:
+            await ingester.aingest(f"{url}/leak", str(tmp_path / "out.json"))
+        finally:
+            await ingester.aclose()
+
+    with pytest.raises(requests.exceptions.InvalidURL, match="allowlist"):
+        asyncio.run(run())
@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+
+import pytest
+
+from llm import LLMClient, LLMError
+from stubs import StubHandler
+
+
+def proxy_handler(failures=0, gate=None):
+    """A stub AI Proxy that answers with the last user message reversed.
+
+    The first `failures` requests get a 503; when gate is given, replies wait
+    until it is set.
+    """
+
+    class Handler(StubHandler):
+        requests = []
+
+        def do_POST(self):
+            payload = json.loads(self.read_body())
+            Handler.requests.append({"payload": payload, "authorization": self.headers.get("Authorization")})
+            if len(Handler.requests) <= failures:
+                return self.send_body(503, "busy")
+            if gate is not None:
+                gate.wait(10)
+            reply = payload["messages"][-1]["content"][::-1]
+            body = {"choices": [{"message": {"role": "assistant", "content": reply}}]}
+            self.send_body(200, json.dumps(body), [("Content-Type", "application/json")])
+
+    return Handler
+
+
+@pytest.fixture(autouse=True)
+def token(monkeypatch):
+    monkeypatch.setenv("AIPROXY_TOKEN", "test-token")
+
+
+def client_for(url, tmp_path, **kwargs):
+    return LLMClient(api_url=f"{url}/v1/chat/completions", cache_dir=str(tmp_path / "llm"), backoff=0, **kwargs)
+
+
+def test_chat_sends_token_and_returns_reply(stub_server, tmp_path):
+    handler = proxy_handler()
+    client = client_for(stub_server(handler), tmp_path)
+
+    assert client.chat("system", "hello") == "olleh"
+    assert handler.requests[0]["authorization"] == "Bearer test-token"
+    assert handler.requests[0]["payload"]["messages"][0] == {"role": "system", "content": "system"}
+
+
+def test_identical_prompts_are_served_from_the_disk_cache(stub_server, tmp_path):
+    handler = proxy_handler()
+    url = stub_server(handler)
+    client = client_for(url, tmp_path)
+
+    assert client.chat("system", "hello") == "olleh"
+    assert client.chat("system", "hello") == "olleh"
+    assert client.chat("system", "other") == "rehto"
+    assert len(handler.requests) == 2
+    assert client.stats["cache_hits"] == 1
+
+    # The cache outlives the client
+    assert client_for(url, tmp_path).chat("system", "hello") == "olleh"
+    assert len(handler.requests) == 2
+
+
+def test_concurrent_identical_prompts_share_one_request(stub_server, tmp_path):
+    gate = threading.Event()
+    handler = proxy_handler(gate=gate)
+    client = client_for(stub_server(handler), tmp_path)
+    callers = 8
+    replies = []
+
+    threads = [threading.Thread(target=lambda: replies.append(client.chat("system", "same"))) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 10
+    while client.stats["coalesced"] < callers - 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    gate.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert replies == ["emas"] * callers
+    assert len(handler.requests) == 1
+    assert client.stats["coalesced"] == callers - 1
+
+
+def test_chat_many_pays_once_per_distinct_input(stub_server, tmp_path):
+    handler = proxy_handler()
+    client = client_for(stub_server(handler), tmp_path)
+
+    assert client.chat_many("system", ["ab", "cd", "ab", "ab"], workers=4) == ["ba", "dc", "ba", "ba"]
+    assert len(handler.requests) == 2
+
+
+def test_server_errors_are_retried(stub_server, tmp_path):
+    handler = proxy_handler(failures=2)
+    client = client_for(stub_server(handler), tmp_path, retries=3)
+
+    assert client.chat("system", "retry") == "yrter"
+    assert len(handler.requests) == 3
+
+
+def test_exhausted_retries_raise_and_are_not_cached(stub_server, tmp_path):
+    handler = proxy_handler(failures=10)
+    client = client_for(stub_server(handler), tmp_path, retries=1)
+
+    with pytest.raises(LLMError):
+        client.chat("system", "down")
+    assert len(handler.requests) == 2
+    assert client.stats["errors"] == 1
+    assert not list((tmp_path / "llm").rglob("*.json"))
+
+
+def test_missing_token_raises_without_a_request(stub_server, tmp_path, monkeypatch):
+    monkeypatch.delenv("AIPROXY_TOKEN")
+    handler = proxy_handler()
+    client = client_for(stub_server(handler), tmp_path)
+
+    with pytest.raises(LLMError, match="token"):
+        client.chat("system", "hello")
+    assert handler.requests == []
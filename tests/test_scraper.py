@@ -0,0 +1,260 @@
+import asyncio
+import socket
+
+import pytest
+import requests
+
+from metrics import Metrics
+from scraper import FAILED, FETCHED, NOT_MODIFIED, Scraper
+from stubs import StubHandler
+from urlguard import UrlGuard
+
+
+def site_handler():
+    """A fixture site: /page/<n> with ETags, /dated with Last-Modified, /moved redirects, anything else 404s."""
+
+    class Handler(StubHandler):
+        seen = []
+
+        def do_GET(self):
+            Handler.seen.append({
+                "path": self.path,
+                "if_none_match": self.headers.get("If-None-Match"),
+                "if_modified_since": self.headers.get("If-Modified-Since"),
+            })
+            if self.path.startswith("/page/"):
+                etag = f'"{self.path}"'
+                if self.headers.get("If-None-Match") == etag:
+                    return self.send_body(304, headers=[("ETag", etag)])
+                number = self.path.rsplit("/", 1)[1]
+                html = f"<html><h1> Title {number} </h1><p>text</p><h1>Second {number}</h1></html>"
+                return self.send_body(200, html, [("Content-Type", "text/html"), ("ETag", etag)])
+            if self.path == "/dated":
+                modified = "Wed, 01 Jan 2025 00:00:00 GMT"
+                if self.headers.get("If-Modified-Since") == modified:
+                    return self.send_body(304)
+                return self.send_body(200, "<h1>Dated</h1>", [("Content-Type", "text/html"), ("Last-Modified", modified)])
+            if self.path == "/moved":
+                port = self.server.server_address[1]
+                return self.send_body(302, headers=[("Location", f"http://localhost:{port}/page/1")])
+            self.send_body(404, "missing")
+
+    return Handler
+
+
+def local_scraper(tmp_path, **kwargs):
+    kwargs.setdefault("guard", UrlGuard("127.0.0.1", allow_private=True))
+    return Scraper(cache_dir=str(tmp_path / "scrape"), workers=4, retries=0, **kwargs)
+
+
+def test_fetch_extracts_every_h1(stub_server, tmp_path):
+    url = stub_server(site_handler())
+    result = local_scraper(tmp_path).fetch(f"{url}/page/1")
+
+    assert result["status"] == FETCHED
+    assert result["titles"] == ["Title 1", "Second 1"]
+
+
+def test_unchanged_pages_are_revalidated_with_etag(stub_server, tmp_path):
+    handler = site_handler()
+    url = stub_server(handler)
+    scraper = local_scraper(tmp_path)
+
+    scraper.fetch(f"{url}/page/2")
+    result = scraper.fetch(f"{url}/page/2")
+
+    assert result["status"] == NOT_MODIFIED
+    assert result["titles"] == ["Title 2", "Second 2"]
+    assert handler.seen[1]["if_none_match"] == '"/page/2"'
+
+
+def test_unchanged_pages_are_revalidated_with_last_modified(stub_server, tmp_path):
+    handler = site_handler()
+    url = stub_server(handler)
+
+    local_scraper(tmp_path).fetch(f"{url}/dated")
+    result = local_scraper(tmp_path).fetch(f"{url}/dated")  # The cache is on disk
+
+    assert result["status"] == NOT_MODIFIED
+    assert result["titles"] == ["Dated"]
+    assert handler.seen[1]["if_modified_since"] == "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+def test_missing_pages_fail_and_are_not_cached(stub_server, tmp_path):
+    handler = site_handler()
+    url = stub_server(handler)
+    scraper = local_scraper(tmp_path)
+
+    first = scraper.fetch(f"{url}/nope")
+    second = scraper.fetch(f"{url}/nope")
+
+    assert first["status"] == second["status"] == FAILED
+    assert "404" in first["error"]
+    assert handler.seen[1]["if_none_match"] is None
+
+
+def test_scrape_keeps_url_order_and_counts(stub_server, tmp_path):
+    url = stub_server(site_handler())
+    scraper = local_scraper(tmp_path)
+    urls = [f"{url}/page/{n}" for n in range(6)] + [f"{url}/nope"]
+
+    scraper.scrape(urls[:3])
+    results, run = scraper.scrape(urls)
+
+    assert [r["url"] for r in results] == urls
+    assert [r["titles"][0] for r in results[:6]] == [f"Title {n}" for n in range(6)]
+    assert (run["pages"], run[FETCHED], run[NOT_MODIFIED], run[FAILED]) == (7, 3, 3, 1)
+    assert scraper.stats[FETCHED] == 6
+
+
+def test_fetch_time_reaches_the_callers_span(stub_server, tmp_path):
+    url = stub_server(site_handler())
+    metrics = Metrics()
+    scraper = local_scraper(tmp_path, http_timer=metrics.http)
+
+    with metrics.track("task", "scrape") as single:
+        scraper.scrape([f"{url}/page/1"])
+    with metrics.track("task", "scrape") as many:
+        scraper.scrape([f"{url}/page/{n}" for n in range(2, 6)])
+
+    assert single.http_seconds > 0
+    assert many.http_seconds > 0
+
+
+def test_ascrape_matches_scrape(stub_server, tmp_path):
+    pytest.importorskip("httpx")
+    handler = site_handler()
+    url = stub_server(handler)
+    urls = [f"{url}/page/{n}" for n in range(4)] + [f"{url}/nope", f"{url}/moved"]
+
+    async def run_twice():
+        scraper = local_scraper(tmp_path)
+        try:
+            return [await scraper.ascrape(urls) for _ in range(2)]
+        finally:
+            await scraper.aclose()
+
+    (first, _), (second, run) = asyncio.run(run_twice())
+
+    assert [r["url"] for r in second] == urls
+    assert [r["titles"][0] for r in first[:4]] == [f"Title {n}" for n in range(4)]
+    assert [r["status"] for r in second] == [NOT_MODIFIED] * 4 + [FAILED, FAILED]
+    assert "allowlist" in second[5]["error"]  # The redirect to localhost is refused
+    assert (run[NOT_MODIFIED], run[FAILED]) == (4, 2)
+
+
+def test_internal_addresses_are_refused_by_default(stub_server, tmp_path):
+    handler = site_handler()
+    url = stub_server(handler)
+    scraper = local_scraper(tmp_path, guard=UrlGuard("*"))
+
+    result = scraper.fetch(f"{url}/page/1")
+
+    assert result["status"] == FAILED
+    assert "non-public" in result["error"]
+    assert handler.seen == []
+
+
+def rebinding_guard():
+    """A guard whose own lookup of localhost answers a public address, as a rebinding DNS server would."""
+
+    def getaddrinfo(host, port, proto=0):
+        return [(socket.AF_INET, socket.SOCK_STREAM, proto, "", ("93.184.216.34", port))]
+
+    return UrlGuard("localhost", resolver=getaddrinfo)
+
+
+def test_the_connected_address_is_checked_too(stub_server, tmp_path):
+    handler = site_handler()
+    url = stub_server(handler).replace("127.0.0.1", "localhost")
+
+    result = local_scraper(tmp_path, guard=rebinding_guard()).fetch(f"{url}/page/1")
+
+    assert result["status"] == FAILED
+    assert "connected to a non-public address" in result["error"]
+    assert handler.seen == []
+
+
+def test_afetch_checks_the_connected_address(stub_server, tmp_path):
+    pytest.importorskip("httpx")
+    handler = site_handler()
+    url = stub_server(handler).replace("127.0.0.1", "localhost")
+
+    async def run():
+        scraper = local_scraper(tmp_path, guard=rebinding_guard())
+        try:
+            return await scraper.afetch(f"{url}/page/1")
+        finally:
+            await scraper.aclose()
+
+    result = asyncio.run(run())
+
+    assert result["status"] == FAILED
+    assert "connected to a non-public address" in result["error"]
+    assert handler.seen == []
+
+
+def test_redirects_are_checked_too(stub_server, tmp_path):
+    handler = site_handler()
+    url = stub_server(handler)
+
+    result = local_scraper(tmp_path).fetch(f"{url}/moved")  # To localhost, which is not allowlisted
+
+    assert result["status"] == FAILED
+    assert "allowlist" in result["error"]
+    assert [r["path"] for r in handler.seen] == ["/moved"]
+
+
+def test_non_http_urls_are_refused(tmp_path):
+    assert local_scraper(tmp_path).fetch("file:///etc/passwd")["status"] == FAILED
+
+
+@pytest.fixture
+def resolver():
+    """A fake getaddrinfo over a fixed table of host -> addresses."""
+    table = {}
+
+    def getaddrinfo(host, port, proto=0):
+        if host not in table:
+            raise socket.gaierror("unknown host")
+        return [(socket.AF_INET, socket.SOCK_STREAM, proto, "", (address, port)) for address in table[host]]
+
+    getaddrinfo.table = table
+    return getaddrinfo
+
+
+def test_guard_allowlist_patterns(resolver):
+    resolver.table.update({"api.example.com": ["93.184.216.34"], "example.com": ["93.184.216.34"],
+                           "deep.api.example.com": ["93.184.216.34"], "example.org": ["93.184.216.34"],
+                           "api.example.com.": ["93.184.216.34"]})
+    guard = UrlGuard("api.example.com, *.api.example.com", resolver=resolver)
+
+    assert guard.check("https://api.example.com/x") == "https://api.example.com/x"
+    assert guard.check("http://deep.api.example.com:8080/x")
+    assert guard.check("https://API.example.com./x")
+    for url in ("https://example.com/", "https://example.org/", "https://badapi.example.com/"):
+        with pytest.raises(ValueError, match="allowlist"):
+            guard.check(url)
+
+
+@pytest.mark.parametrize("address", [
+    "127.0.0.1", "10.1.2.3", "172.16.0.1", "192.168.1.1", "169.254.169.254", "100.64.0.1",
+    "0.0.0.0", "224.0.0.1", "::1", "fe80::1", "fc00::1", "::ffff:127.0.0.1",
+])
+def test_guard_refuses_non_public_addresses(resolver, address):
+    resolver.table["internal.example.com"] = ["93.184.216.34", address]  # Any bad address refuses the host
+    guard = UrlGuard("*", resolver=resolver)
+
+    with pytest.raises(ValueError, match="non-public"):
+        guard.check("http://internal.example.com/")
+    assert UrlGuard("*", allow_private=True, resolver=resolver).check("http://internal.example.com/")
+
+
+def test_guard_refuses_other_schemes_and_unresolvable_hosts(resolver):
+    guard = UrlGuard("*", resolver=resolver)
+
+    for url in ("ftp://example.com/", "file:///etc/passwd", "http:///path"):
+        with pytest.raises(ValueError):
+            guard.check(url)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        guard.check("http://unknown.example.com/")
@@ -0,0 +1,52 @@
+import os
+import sqlite3
+
+from sqlitepool import ConnectionPool
+
+
+def make_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE tickets (type TEXT, units INTEGER, price REAL)")
+    conn.execute("INSERT INTO tickets VALUES ('Gold', 2, 10.5)")
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+def test_databases_keep_their_journal_mode(tmp_path):
+    db_path = make_db(tmp_path / "data.db")
+    pool = ConnectionPool(size=2)
+
+    with pool.connection(db_path) as conn:
+        assert conn.execute("SELECT SUM(units * price) FROM tickets").fetchone()[0] == 21.0
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    pool.close()
+
+    assert sorted(os.listdir(tmp_path)) == ["data.db"]
+
+
+def test_wal_is_opt_in(tmp_path):
+    db_path = make_db(tmp_path / "owned.db")
+    pool = ConnectionPool(size=2)
+
+    with pool.connection(db_path, wal=True) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    pool.close()
+
+
+def test_replaced_files_get_new_connections(tmp_path):
+    db_path = make_db(tmp_path / "data.db")
+    pool = ConnectionPool(size=2)
+    with pool.connection(db_path) as conn:
+        conn.execute("SELECT 1")
+
+    new_path = make_db(tmp_path / "new.db")
+    conn = sqlite3.connect(new_path)
+    conn.execute("UPDATE tickets SET units = 4")
+    conn.commit()
+    conn.close()
+    os.replace(new_path, db_path)
+
+    with pool.connection(db_path) as conn:
+        assert conn.execute("SELECT SUM(units * price) FROM tickets").fetchone()[0] == 42.0
+    pool.close()
@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import threading
+
+# Per-type totals kept current by triggers on tickets. Sales are stored in
+# integer cents so inserts and deletes never accumulate floating point error.
+SCHEMA = [
+    """
+    CREATE TABLE ticket_totals (
+        type TEXT PRIMARY KEY,
+        tickets INTEGER NOT NULL,
+        units INTEGER NOT NULL,
+        sales_cents INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TRIGGER ticket_totals_insert AFTER INSERT ON tickets BEGIN
+        INSERT INTO ticket_totals (type, tickets, units, sales_cents)
+        VALUES (NEW.type, 1, NEW.units, CAST(ROUND(NEW.units * NEW.price * 100) AS INTEGER))
+        ON CONFLICT (type) DO UPDATE SET
+            tickets = tickets + 1,
+            units = units + excluded.units,
+            sales_cents = sales_cents + excluded.sales_cents;
+    END
+    """,
+    """
+    CREATE TRIGGER ticket_totals_delete AFTER DELETE ON tickets BEGIN
+        UPDATE ticket_totals SET
+            tickets = tickets - 1,
+            units = units - OLD.units,
+            sales_cents = sales_cents - CAST(ROUND(OLD.units * OLD.price * 100) AS INTEGER)
+        WHERE type = OLD.type;
+    END
+    """,
+    """
+    CREATE TRIGGER ticket_totals_update AFTER UPDATE OF type, units, price ON tickets BEGIN
+        UPDATE ticket_totals SET
+            tickets = tickets - 1,
+            units = units - OLD.units,
+            sales_cents = sales_cents - CAST(ROUND(OLD.units * OLD.price * 100) AS INTEGER)
+        WHERE type = OLD.type;
+        INSERT INTO ticket_totals (type, tickets, units, sales_cents)
+        VALUES (NEW.type, 1, NEW.units, CAST(ROUND(NEW.units * NEW.price * 100) AS INTEGER))
+        ON CONFLICT (type) DO UPDATE SET
+            tickets = tickets + 1,
+            units = units + excluded.units,
+            sales_cents = sales_cents + excluded.sales_cents;
+    END
+    """,
+]
+
+SCHEMA_OBJECTS = {"ticket_totals", "ticket_totals_insert", "ticket_totals_delete", "ticket_totals_update"}
+
+_ready = set()  # (db path, inode) pairs whose aggregate table is known to be in place
+_ready_lock = threading.Lock()
+
+
+def ensure_ticket_totals(conn, db_path):
+    """Create and backfill the ticket_totals table and its triggers if they are missing.
+
+    Returns False when the database cannot be written to, in which case the
+    caller should fall back to aggregating the tickets table directly.
+    """
+    key = (db_path, os.stat(db_path).st_ino)
+    with _ready_lock:
+        if key in _ready:
+            return True
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE name LIKE 'ticket_totals%'")}
+        if existing != SCHEMA_OBJECTS:
+            try:
+                # One write transaction so no insert can slip between the backfill and the triggers
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DROP TABLE IF EXISTS ticket_totals")
+                for name in ("ticket_totals_insert", "ticket_totals_delete", "ticket_totals_update"):
+                    conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                conn.execute(
+                    """
+                    INSERT INTO ticket_totals (type, tickets, units, sales_cents)
+                    SELECT type, COUNT(*), SUM(units), SUM(CAST(ROUND(units * price * 100) AS INTEGER))
+                    FROM tickets GROUP BY type
+                    """
+                )
+                conn.execute("COMMIT")
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                if "readonly" in str(e) or not os.access(db_path, os.W_OK):
+                    return False
+                raise
+        _ready.add(key)
+        return True
+
+
+def ticket_sales(conn, db_path, ticket_type):
+    """Total sales (units * price) for one ticket type, read from the aggregate table."""
+    if not ensure_ticket_totals(conn, db_path):
+        return conn.execute("SELECT SUM(units * price) FROM tickets WHERE type = ?", (ticket_type,)).fetchone()[0] or 0
+    row = conn.execute("SELECT sales_cents FROM ticket_totals WHERE type = ?", (ticket_type,)).fetchone()
+    return row[0] / 100 if row else 0
@@ -0,0 +1,154 @@
+import ipaddress
+import socket
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class UrlNotAllowed(requests.exceptions.InvalidURL):
+    """Raised for a URL the server must not fetch on a caller's behalf."""
+
+
+class AddressNotAllowed(ValueError):
+    """Raised inside urllib3 when a connection reached a non-public address.
+
+    Not an OSError, so urllib3 neither retries nor wraps it; GuardedSession
+    turns it into UrlNotAllowed.
+    """
+
+
+def parse_hosts(text):
+    """"api.example.com, *.example.org" -> ("api.example.com", "*.example.org")"""
+    return tuple(host.strip().lower().rstrip(".") for host in (text or "").split(",") if host.strip())
+
+
+def public_address(text):
+    """Whether an IP address (as getaddrinfo returns it) is reachable on the public internet."""
+    address = ipaddress.ip_address(text.split("%", 1)[0])  # Drop an IPv6 zone index
+    if address.version == 6 and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+class UrlGuard:
+    """Decides which URLs taken from requests the server may fetch.
+
+    - Only http(s) URLs.
+    - The host must be in allowed_hosts: exact names, "*.example.com" for a
+      domain and its subdomains, or "*" for any host.
+    - Every address the host resolves to must be public: loopback, private,
+      link-local, reserved and multicast addresses are refused unless
+      allow_private is set (e.g. for a stub server in development).
+    - The HTTP clients resolve the host again when they connect, so a host
+      whose DNS answer changes between the two (DNS rebinding) would get past
+      check() alone. GuardedSession and asyncfetch's client therefore also
+      check the address each new connection actually reached (check_peer).
+      Requests sent through a proxy are checked by URL only.
+    """
+
+    def __init__(self, allowed_hosts=(), allow_private=False, resolver=socket.getaddrinfo):
+        self.allowed_hosts = parse_hosts(allowed_hosts) if isinstance(allowed_hosts, str) else tuple(allowed_hosts)
+        self.allow_private = allow_private
+        self.resolver = resolver
+
+    def host_allowed(self, host):
+        host = host.lower().rstrip(".")
+        for pattern in self.allowed_hosts:
+            if pattern == "*" or pattern == host:
+                return True
+            if pattern.startswith("*.") and (host == pattern[2:] or host.endswith(pattern[1:])):
+                return True
+        return False
+
+    def check(self, url):
+        """Return url if it may be fetched; raises UrlNotAllowed."""
+        parts = urlsplit(url)
+        if parts.scheme not in DEFAULT_PORTS:
+            raise UrlNotAllowed(f"Only http(s) URLs can be fetched: {url}")
+        host = parts.hostname
+        if not host:
+            raise UrlNotAllowed(f"URL has no host: {url}")
+        if not self.host_allowed(host):
+            raise UrlNotAllowed(f"Host is not in the allowlist: {host}")
+        if self.allow_private:
+            return url
+        try:
+            infos = self.resolver(host, parts.port or DEFAULT_PORTS[parts.scheme], proto=socket.IPPROTO_TCP)
+        except (socket.gaierror, UnicodeError) as e:
+            raise requests.exceptions.ConnectionError(f"Cannot resolve {host}: {e}") from None
+        for info in infos:
+            if not public_address(info[4][0]):
+                raise UrlNotAllowed(f"{host} resolves to a non-public address ({info[4][0]}).")
+        return url
+
+    def check_peer(self, host, address, error=UrlNotAllowed):
+        """Raise error unless address, the peer a connection to host reached, may be fetched from."""
+        if not self.allow_private and not public_address(address):
+            raise error(f"{host} connected to a non-public address ({address}).")
+
+
+class _PeerCheckedConnection:
+    """Mixin for urllib3 connections: checks the peer address of every new socket against guard."""
+
+    guard = None
+
+    def _new_conn(self):
+        sock = super()._new_conn()
+        try:
+            self.guard.check_peer(self.host, sock.getpeername()[0], AddressNotAllowed)
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+
+class GuardedAdapter(HTTPAdapter):
+    """An HTTPAdapter whose direct connections are checked with guard.check_peer once connected."""
+
+    def __init__(self, guard=None, **kwargs):
+        self.guard = guard
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        if self.guard is None:
+            return
+        pools = {}
+        for scheme, pool_cls, conn_cls in (
+            ("http", HTTPConnectionPool, HTTPConnection),
+            ("https", HTTPSConnectionPool, HTTPSConnection),
+        ):
+            checked = type(conn_cls.__name__, (_PeerCheckedConnection, conn_cls), {"guard": self.guard})
+            pools[scheme] = type(pool_cls.__name__, (pool_cls,), {"ConnectionCls": checked})
+        self.poolmanager.pool_classes_by_scheme = pools
+
+    def __setstate__(self, state):
+        self.guard = None
+        super().__setstate__(state)
+
+
+class GuardedSession(requests.Session):
+    """A requests.Session that checks every request it sends, redirects included, against a UrlGuard.
+
+    Mount GuardedAdapter(guard, ...) in place of HTTPAdapter to keep the peer
+    address check when configuring pools or retries.
+    """
+
+    def __init__(self, guard=None):
+        super().__init__()
+        self.guard = guard
+        self.mount("http://", GuardedAdapter(guard))
+        self.mount("https://", GuardedAdapter(guard))
+
+    def send(self, request, **kwargs):
+        if self.guard is not None:
+            self.guard.check(request.url)
+        try:
+            return super().send(request, **kwargs)
+        except AddressNotAllowed as e:
+            raise UrlNotAllowed(str(e)) from None